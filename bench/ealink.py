@@ -1,21 +1,26 @@
 import argparse
+import json
 from datetime import datetime
 import logging
 import os
 import sys
 import time
+from typing import Any, Dict, List, Tuple
 
 import pandas as pd
 
 from bench import data_gen
+from bench import evaluation
+from bench import repos
+from bench.matrix import DEFAULT_CONFIG, ExperimentConfig, load_matrix
+from bench.store import ResultStore
 from src import issue_wrapper
+from src.issue_wrapper import IssueFetcher
 from src.anchor.anchor import GitAnchor
 from src.anchor.extractor import Extractor, GitSourceType
+from src.anchor import replay
+from src import trace
 from src.anchor.metrics import Metrics
-from src.schema.code import TOOLS as CODE_TOOLS
-from src.schema.control import TOOLS as CONTROL_TOOLS
-from src.schema.git import TOOLS as GIT_TOOLS
-from src.schema.issue import TOOLS as ISSUE_TOOLS
 
 # Configure logging
 logging.basicConfig(
@@ -43,25 +48,15 @@ def ensure_dataset_available():
         data_gen.prepare_ealink_dataset()
 
 
-def ensure_repositories_cloned():
-    # Check if <data_dir>/ealink/repos directory exists
-    if os.path.exists(repos_dir):
-        logger.info("EALink target repositories already available.")
-    else:
-        os.makedirs(repos_dir, exist_ok=True)
-        # for all csv file in <ealink/csv> directory, print its name
-        for csv_file in os.listdir(csv_dir):
-            if csv_file.endswith(".csv"):
-                logger.info(f"Cloning repositories for {csv_file}")
-                data = pd.read_csv(os.path.join(csv_dir, csv_file))
-                for repo_url in data["repo_url"].unique():
-                    repo_name = repo_url.split("/")[-1].replace(".git", "")
-                    repo_path = os.path.join(repos_dir, repo_name)
-                    if not os.path.exists(repo_path):
-                        os.system(f"git clone {repo_url} {repo_path}")
-                        logger.info(f"Cloned {repo_name} to {repo_path}")
-                    else:
-                        logger.info(f"{repo_name} already cloned at {repo_path}")
+def ensure_repositories_cloned(
+    jobs: int = repos.DEFAULT_JOBS, filter: str | None = repos.DEFAULT_FILTER
+):
+    repo_urls = []
+    for csv_file in sorted(os.listdir(csv_dir)):
+        if csv_file.endswith(".csv"):
+            data = pd.read_csv(os.path.join(csv_dir, csv_file))
+            repo_urls.extend(data["repo_url"].unique())
+    repos.provision_repositories(repo_urls, repos_dir, jobs, filter)
 
 
 def calculate_issue_age(extractor: Extractor):
@@ -81,12 +76,23 @@ def extractor_for_repo(repo_url: str, metrics: Metrics) -> Extractor:
     return e
 
 
-def run_bench(bench_name: str = "", count: int = 100):
+def config_results_dir(config: ExperimentConfig) -> str:
+    # keep the results of the default configuration where they always were
+    if config.id == DEFAULT_CONFIG.id:
+        return results_dir
+    return os.path.join(results_dir, "matrix", config.id)
+
+
+def run_bench(
+    bench_name: str = "", count: int = 100, config: ExperimentConfig = DEFAULT_CONFIG
+):
+    results_dir = config_results_dir(config)
     os.makedirs(results_dir, exist_ok=True)
     all_token_used = 0
 
     metrics = Metrics()
     extractors: dict[str, Extractor] = {}
+    fetcher = IssueFetcher(metrics=metrics)
 
     for csv_file in os.listdir(csv_dir):
         metrics.drop()
@@ -96,34 +102,53 @@ def run_bench(bench_name: str = "", count: int = 100):
         if csv_file.endswith(".csv"):
             logger.info(f"Running benchmark for {csv_file}")
             data = pd.read_csv(os.path.join(csv_dir, csv_file))
+            store = ResultStore(os.path.join(results_dir, f"{csv_file}.jsonl"))
+
+            # resume from the rows that are already stored
+            done = store.done()
+            pending = data.iloc[: count + 1]
+            pending = pending[~pending.index.isin(done)]
+            logger.info(f"{len(done)} rows already done, {len(pending)} rows to run")
+
             batch_size = 10
-            for i, (index, row) in enumerate(data.iterrows()):
-                if i > count:
-                    break
+            fetcher.prefetch(pending["issue_url"].iloc[:batch_size])
+            for i, (index, row) in enumerate(pending.iterrows()):
                 if i % batch_size == 0:
-                    data.to_csv(os.path.join(results_dir, csv_file), index=False)
-                    logger.info(f"results saved up to {index} rows")
+                    # fetch the issues of the next batch while this one is being processed
+                    fetcher.prefetch(
+                        pending["issue_url"].iloc[i + batch_size : i + 2 * batch_size]
+                    )
                     metrics.dump(os.path.join(results_dir, f"metrics-{csv_file}.json"))
                     logger.info(f"metrics saved up to {index} rows")
 
-                tokens = bench_single_row(
-                    row, index, data, extractors, metrics, csv_file
+                tokens, record = bench_single_row(
+                    row, index, extractors, metrics, csv_file, fetcher, config
                 )
+                store.append(record)
                 all_token_used += tokens
 
-                if all_token_used > 2000 * 1000:
+                if all_token_used > 2000 * 1000 and not replay.replaying():
                     logger.info("Token limit reached, cooling down for 30 seconds.")
                     time.sleep(30)
                     all_token_used = 0
-            data.to_csv(os.path.join(results_dir, csv_file), index=False)
+            store.compact(data, os.path.join(results_dir, csv_file))
             metrics.dump(os.path.join(results_dir, f"metrics-{csv_file}.json"))
+            metrics.dump_openmetrics(os.path.join(results_dir, f"metrics-{csv_file}.txt"))
             logger.info(f"results saved to {os.path.join(results_dir, csv_file)}")
 
 
-def repair(bench_name):
+def run_matrix(bench_name: str, count: int, configs: List[ExperimentConfig]):
+    for config in configs:
+        logger.info(f"Running configuration {config.id}")
+        run_bench(bench_name, count, config)
+
+
+def repair(bench_name, config: ExperimentConfig = DEFAULT_CONFIG):
+    results_dir = config_results_dir(config)
     all_token_used = 0
     metrics = Metrics()
     extractors: dict[str, Extractor] = {}
+    fetcher = IssueFetcher(metrics=metrics)
 
     for csv_file in os.listdir(results_dir):
         metrics.drop()
@@ -132,28 +157,42 @@ def repair(bench_name):
 
         if csv_file.endswith(".csv"):
             logger.info(f"Running repair for {csv_file}")
-            data = pd.read_csv(os.path.join(results_dir, csv_file))
-            for index, row in data.iterrows():
-                if pd.isna(data.loc[index, "error"]):
-                    continue
-
+            store = ResultStore(os.path.join(results_dir, f"{csv_file}.jsonl"))
+            # pick up rows stored after the last compaction
+            data = store.compact(
+                pd.read_csv(os.path.join(results_dir, csv_file)),
+                os.path.join(results_dir, csv_file),
+            )
+            failed = data[data["error"].fillna("") != ""]
+            fetcher.prefetch(failed["issue_url"])
+            for index, row in failed.iterrows():
                 logger.info(f"Repairing {index}'th row...")
 
-                tokens = bench_single_row(
-                    row, index, data, extractors, metrics, csv_file
+                tokens, record = bench_single_row(
+                    row, index, extractors, metrics, csv_file, fetcher, config
                 )
+                store.append(record)
                 all_token_used += tokens
-                if all_token_used > 2000 * 1000:
+                if all_token_used > 2000 * 1000 and not replay.replaying():
                     logger.info("Token limit reached, cooling down for 30 seconds.")
                     time.sleep(30)
                     all_token_used = 0
 
-                data.to_csv(os.path.join(results_dir, csv_file))
-                logger.info(f"results saved to {os.path.join(results_dir, csv_file)}")
+            store.compact(data, os.path.join(results_dir, csv_file))
+            logger.info(f"results saved to {os.path.join(results_dir, csv_file)}")
 
 
-def bench_single_row(row, index, data, extractors, metrics, project_name) -> int:
+def bench_single_row(
+    row,
+    index,
+    extractors,
+    metrics,
+    project_name,
+    fetcher,
+    config: ExperimentConfig = DEFAULT_CONFIG,
+) -> Tuple[int, Dict[str, Any]]:
     tokens = 0
+    record: Dict[str, Any] = {"row": int(index), "config_id": config.id}
     issue_url: str = row["issue_url"]  # type: ignore
     repo_url: str = row["repo_url"]  # type: ignore
     expected_commit: str = row["commit_hash"]  # type: ignore
@@ -161,16 +200,19 @@ def bench_single_row(row, index, data, extractors, metrics, project_name) -> int
         extractors[repo_url] = extractor_for_repo(repo_url, metrics)
 
     extractor: Extractor = extractors.get(repo_url)  # type: ignore
-    extractor.issue_wrapper = issue_wrapper.wrapper_for(issue_url)
-    ga = GitAnchor(extractor)
-    ga.register_tools(GIT_TOOLS)
-    ga.register_tools(CODE_TOOLS)
-    ga.register_tools(ISSUE_TOOLS)
-    ga.register_tools(CONTROL_TOOLS)
+    ga = GitAnchor(
+        extractor,
+        model=config.model,
+        batch_size=config.batch_size,
+        cascade=config.cascade,
+        inline_digests=config.inline_digests,
+        session_token_budget=config.session_token_budget,
+    )
+    ga.register_tools(config.tool_classes())
 
     logger.info(f"Processing {index}'th row...")
     try:
-        ga.extractor.issue_wrapper = issue_wrapper.wrapper_for(issue_url)
+        ga.extractor.issue_wrapper = issue_wrapper.wrapper_for(issue_url, fetcher)
 
         start_time = datetime.now()
         commit_hash, tokens = ga.find_link()
@@ -179,15 +221,17 @@ def bench_single_row(row, index, data, extractors, metrics, project_name) -> int
 
         metrics.flush()
 
-        data.at[index, "result"] = commit_hash
-        data.at[index, "error"] = ""
-        data.at[index, "old"] = calculate_issue_age(ga.extractor).days > 365
-        data.at[index, "time"] = elapsed_time.total_seconds()
-        data.at[index, "tokens"] = tokens
+        record["result"] = commit_hash
+        record["error"] = ""
+        record["old"] = calculate_issue_age(ga.extractor).days > 365
+        record["time"] = elapsed_time.total_seconds()
+        record["tokens"] = tokens
+        # usage of each model of the cascade, see evaluation.summarize_tiers
+        record["tiers"] = json.dumps([usage.model_dump() for usage in ga.agent.usage])
         if not ga.extractor.has_commit(commit_hash):
-            data.at[index, "error"] = f"Commit not found {commit_hash}"
+            record["error"] = f"Commit not found {commit_hash}"
             metrics.reset()
-            return tokens
+            return tokens, record
         issue_key = ga.extractor.issue_key()
         # ISIS issue keys have various formats, some of which being:
         # 1. CAUSEWAY-<NUM>
@@ -195,7 +239,7 @@ def bench_single_row(row, index, data, extractors, metrics, project_name) -> int
         # But this format is not consistent with the commits as they mostly use the second format.
         if "isis" in project_name:
             issue_key = issue_key.split("-")[1]
-        data.at[index, "issue_key_present"] = (
+        record["issue_key_present"] = (
             issue_key in ga.extractor.commit_metadata(commit_hash).message
         )
         # when the expected commit in dataset is not present in the repo
@@ -203,44 +247,55 @@ def bench_single_row(row, index, data, extractors, metrics, project_name) -> int
             expected_commit = commit_hash
 
         distance = ga.extractor.ancestral_distance(commit_hash, expected_commit)
-        data.at[index, "ancestral_distance"] = distance
+        record["ancestral_distance"] = distance
     except Exception as e:
         logger.error(f"Error processing {issue_url}: {e}")
-        data.at[index, "error"] = str(e)
+        record["error"] = str(e)
     finally:
         metrics.reset()
-    return tokens
-
-
-def eval(bench_name, count):
-    for csv_file in os.listdir(results_dir):
-        if bench_name not in csv_file:
-            continue
+    return tokens, record
+
+
+def eval(
+    bench_name,
+    count,
+    configs: List[ExperimentConfig] = [DEFAULT_CONFIG],
+    baseline: str | None = None,
+):
+    data = pd.concat(
+        [
+            evaluation.load_results(
+                config_results_dir(config), bench_name, count, config.id
+            )
+            for config in configs
+        ],
+        ignore_index=True,
+    )
+    if data.empty:
+        print("No results found.")
+        return
+
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print("=" * 50)
+        print("Results per project:")
+        print(evaluation.summarize(data, ["config_id", "project"]).to_string())
+        print("=" * 50)
+        print("Results per configuration:")
+        print(evaluation.summarize(data, ["config_id"]).to_string())
+
+        tiers = evaluation.summarize_tiers(data)
+        if not tiers.empty:
+            print("=" * 50)
+            print("Usage per model:")
+            print(tiers.to_string())
 
-        if csv_file.endswith(".csv"):
+        baseline = baseline or configs[0].id
+        for config in configs:
+            if config.id == baseline:
+                continue
             print("=" * 50)
-            data = pd.read_csv(os.path.join(results_dir, csv_file))
-
-            correct = 0
-            total_time = 0
-            total_tokens = 0
-            for i, (_, row) in enumerate(data.iterrows()):
-                if i > count:
-                    break
-                if (
-                    row["commit_hash"] == row["result"]
-                    or row["ancestral_distance"] <= 2
-                    or row["issue_key_present"] == True
-                ):
-                    correct += 1
-                total_time += row["time"]
-                total_tokens += row["tokens"]
-
-            base = min(len(data), count)
-            print(f"Results for {csv_file}:")
-            print(f"{"Percision:".ljust(15)} {correct / base}")
-            print(f"{"Token usage:".ljust(15)} {total_tokens / base}")
-            print(f"{"Time:".ljust(15)} {total_time / base}")
+            print(f"Paired comparison of {config.id} against {baseline}:")
+            print(evaluation.paired_comparison(data, baseline, config.id).to_string())
 
 
 parser = argparse.ArgumentParser(description="EALink benchmark script")
@@ -254,17 +309,64 @@ parser.add_argument(
 parser.add_argument(
     "--count", "-c", type=int, help="number of rows to process", default=sys.maxsize
 )
+parser.add_argument(
+    "--issue-snapshot",
+    help="serve issues from a snapshot created by bench.snapshot instead of the network",
+)
+parser.add_argument(
+    "--record",
+    help="record the completions of the LLM into this directory",
+)
+parser.add_argument(
+    "--replay",
+    help="replay completions recorded with --record from this directory, or from the replay stub at this URL",
+)
+parser.add_argument(
+    "--matrix",
+    "-m",
+    help="JSON file with a list of configurations to run or evaluate (see bench/matrix.py)",
+)
+parser.add_argument(
+    "--baseline",
+    help="id of the configuration other configurations are compared against (defaults to the first one)",
+)
+parser.add_argument(
+    "--trace",
+    help="write a trace of the sessions in the Chrome trace event format to this file",
+)
+parser.add_argument(
+    "--clone-jobs",
+    type=int,
+    help="number of repositories cloned in parallel",
+    default=repos.DEFAULT_JOBS,
+)
+parser.add_argument(
+    "--clone-filter",
+    help="object filter of repository clones, an empty value makes full clones",
+    default=repos.DEFAULT_FILTER,
+)
 args = parser.parse_args()
+configs = load_matrix(args.matrix) if args.matrix else [DEFAULT_CONFIG]
+
+if args.issue_snapshot:
+    os.environ[issue_wrapper.SNAPSHOT_ENV] = args.issue_snapshot
+if args.record:
+    os.environ[replay.RECORD_ENV] = args.record
+if args.replay:
+    os.environ[replay.REPLAY_ENV] = args.replay
+if args.trace:
+    trace.enable(args.trace)
 
 ensure_dataset_available()
-ensure_repositories_cloned()
+ensure_repositories_cloned(args.clone_jobs, args.clone_filter)
 
 
 if args.repair:
     # run repair twice to account for any rate limit issues posed by OpenAI API
-    repair(args.bench_name)
-    repair(args.bench_name)
+    for config in configs:
+        repair(args.bench_name, config)
+        repair(args.bench_name, config)
 elif args.eval:
-    eval(args.bench_name, args.count)
+    eval(args.bench_name, args.count, configs, args.baseline)
 else:
-    run_bench(args.bench_name, args.count)
+    run_matrix(args.bench_name, args.count, configs)
@@ -0,0 +1,164 @@
+import json
+import math
+import os
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+QUANTILES = [0.5, 0.95, 0.99]
+
+
+def column(data: pd.DataFrame, name: str) -> pd.Series:
+    """
+    Return the given column, or an all-NaN column if no row has produced it yet.
+    """
+    if name in data:
+        return data[name]
+    return pd.Series(np.nan, index=data.index)
+
+
+def is_correct(data: pd.DataFrame) -> pd.Series:
+    """
+    A link is correct if it is the expected commit, a close relative of it,
+    or a commit that mentions the issue key.
+    """
+    return (
+        (column(data, "commit_hash") == column(data, "result"))
+        | (column(data, "ancestral_distance") <= 2)
+        | (column(data, "issue_key_present") == True)  # noqa: E712
+    )
+
+
+def load_results(
+    results_dir: str, bench_name: str = "", count: int | None = None, config_id: str = "default"
+) -> pd.DataFrame:
+    """
+    Load the result CSVs of all projects in a directory into a single frame
+    with `project`, `row` and `config_id` columns.
+    """
+    frames = []
+    for csv_file in sorted(os.listdir(results_dir)):
+        if bench_name not in csv_file or not csv_file.endswith(".csv"):
+            continue
+        data = pd.read_csv(os.path.join(results_dir, csv_file))
+        if count is not None:
+            data = data.head(count)
+        frames.append(
+            data.assign(
+                project=csv_file.removesuffix(".csv"),
+                row=data.index,
+                config_id=config_id,
+            )
+        )
+    if not frames:
+        return pd.DataFrame(columns=["project", "row", "config_id"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize(data: pd.DataFrame, by: List[str]) -> pd.DataFrame:
+    """
+    Precision together with the mean and tail percentiles of latency and token usage per group.
+    """
+    frame = data.assign(
+        correct=is_correct(data),
+        time=pd.to_numeric(column(data, "time")),
+        tokens=pd.to_numeric(column(data, "tokens")),
+    )
+    aggregations = {
+        "rows": ("correct", "size"),
+        "precision": ("correct", "mean"),
+        "tokens_mean": ("tokens", "mean"),
+        "time_mean": ("time", "mean"),
+    }
+    for metric in ["tokens", "time"]:
+        for q in QUANTILES:
+            aggregations[f"{metric}_p{round(q * 100)}"] = (
+                metric,
+                lambda s, q=q: s.quantile(q),
+            )
+    return frame.groupby(by, sort=True).agg(**aggregations)
+
+
+def summarize_tiers(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calls, tokens and latency spent on each model of a cascade per configuration,
+    and the share of sessions escalating from it.
+    """
+    usages = [
+        dict(usage, config_id=config_id)
+        for config_id, tiers in zip(data["config_id"], column(data, "tiers"))
+        if isinstance(tiers, str)
+        for usage in json.loads(tiers)
+    ]
+    if not usages:
+        return pd.DataFrame()
+    frame = pd.DataFrame(usages)
+    frame["escalated"] = frame["escalation"] != ""
+    return frame.groupby(["config_id", "model"], sort=True).agg(
+        sessions=("calls", "size"),
+        escalated=("escalated", "mean"),
+        calls_mean=("calls", "mean"),
+        tokens_mean=("tokens", "mean"),
+        tokens_total=("tokens", "sum"),
+        seconds_mean=("seconds", "mean"),
+        seconds_p95=("seconds", lambda s: s.quantile(0.95)),
+    )
+
+
+def mcnemar_p_value(only_baseline: int, only_candidate: int) -> float:
+    """
+    Exact two-sided McNemar test on the discordant pairs of two configurations.
+    """
+    n = only_baseline + only_candidate
+    if n == 0:
+        return 1.0
+    k = min(only_baseline, only_candidate)
+    tail = sum(math.comb(n, i) for i in range(k + 1)) / 2**n
+    return min(1.0, 2 * tail)
+
+
+def paired_comparison(
+    data: pd.DataFrame, baseline: str, candidate: str
+) -> pd.DataFrame:
+    """
+    Compare two configurations on the issues both of them ran, per project and overall.
+    """
+    frame = data.assign(
+        correct=is_correct(data),
+        time=pd.to_numeric(column(data, "time")),
+        tokens=pd.to_numeric(column(data, "tokens")),
+    )
+    key = ["project", "row"]
+    values = ["correct", "time", "tokens"]
+    base = frame[frame["config_id"] == baseline].set_index(key)[values]
+    cand = frame[frame["config_id"] == candidate].set_index(key)[values]
+    pairs = base.join(cand, how="inner", lsuffix="_base", rsuffix="_cand")
+
+    pairs = pairs.assign(
+        both=pairs["correct_base"] & pairs["correct_cand"],
+        only_base=pairs["correct_base"] & ~pairs["correct_cand"],
+        only_cand=~pairs["correct_base"] & pairs["correct_cand"],
+        precision_delta=pairs["correct_cand"].astype(float)
+        - pairs["correct_base"].astype(float),
+        time_delta=pairs["time_cand"] - pairs["time_base"],
+        tokens_delta=pairs["tokens_cand"] - pairs["tokens_base"],
+    ).reset_index()
+
+    aggregations = {
+        "pairs": ("both", "size"),
+        "both": ("both", "sum"),
+        "only_base": ("only_base", "sum"),
+        "only_cand": ("only_cand", "sum"),
+        "precision_delta": ("precision_delta", "mean"),
+        "time_delta_p50": ("time_delta", "median"),
+        "tokens_delta_p50": ("tokens_delta", "median"),
+    }
+    per_project = pairs.groupby("project").agg(**aggregations)
+    overall = pairs.assign(project="ALL").groupby("project").agg(**aggregations)
+    table = pd.concat([per_project, overall])
+    table["p_value"] = [
+        mcnemar_p_value(int(b), int(c))
+        for b, c in zip(table["only_base"], table["only_cand"])
+    ]
+    return table
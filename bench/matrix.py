@@ -0,0 +1,60 @@
+import json
+from typing import List
+
+from pydantic import BaseModel, Field
+
+from src import prompt
+from src.anchor.agent import DEFAULT_MODEL
+from src.anchor.cascade import Cascade
+from src.schema.code import TOOLS as CODE_TOOLS
+from src.schema.control import TOOLS as CONTROL_TOOLS
+from src.schema.git import TOOLS as GIT_TOOLS
+from src.schema.issue import TOOLS as ISSUE_TOOLS
+
+# tools that can be toggled by a configuration, control tools are always enabled
+TOOLS = {tool.__name__: tool for tool in GIT_TOOLS + CODE_TOOLS + ISSUE_TOOLS}
+
+
+class ExperimentConfig(BaseModel):
+    """A single configuration of the experiment matrix"""
+
+    id: str = Field(..., description="unique id used to store and compare results")
+    model: str = Field(DEFAULT_MODEL, description="OpenAI model used by the agent")
+    batch_size: int = Field(
+        prompt.COMMIT_BATCH_SIZE, description="number of commits shown in each batch"
+    )
+    tools: List[str] | None = Field(
+        None, description="names of the enabled tools, all tools when not given"
+    )
+    cascade: Cascade | None = Field(
+        None, description="models tried from cheapest to strongest, overrides model"
+    )
+    inline_digests: bool = Field(
+        False, description="show the digests of the commits with each batch"
+    )
+    session_token_budget: int | None = Field(
+        None, description="maximum number of tokens of a session, unlimited if not given"
+    )
+
+    def tool_classes(self) -> list:
+        names = self.tools if self.tools is not None else list(TOOLS)
+        unknown = [name for name in names if name not in TOOLS]
+        if unknown:
+            raise ValueError(f"unknown tools in configuration {self.id}: {unknown}")
+        return [TOOLS[name] for name in names] + CONTROL_TOOLS
+
+
+DEFAULT_CONFIG = ExperimentConfig(id="default")
+
+
+def load_matrix(path: str) -> List[ExperimentConfig]:
+    """
+    Load the experiment matrix from a JSON file containing a list of configurations.
+    """
+    with open(path) as f:
+        configs = [ExperimentConfig.model_validate(c) for c in json.load(f)]
+
+    ids = [config.id for config in configs]
+    if len(ids) != len(set(ids)):
+        raise ValueError(f"configuration ids are not unique: {ids}")
+    return configs
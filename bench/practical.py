@@ -3,12 +3,18 @@ import logging
 import os
 import sys
 import time
+from typing import Any, Dict, Tuple
 
 import pandas as pd
 
+from bench import repos
+from bench.store import ResultStore
 from src import issue_wrapper
+from src.issue_wrapper import IssueFetcher
 from src.anchor.anchor import GitAnchor
 from src.anchor.extractor import Extractor, GitSourceType
+from src.anchor import replay
+from src import trace
 from src.anchor.metrics import Metrics
 from src.schema.code import TOOLS as CODE_TOOLS
 from src.schema.control import TOOLS as CONTROL_TOOLS
@@ -43,22 +49,11 @@ def ensure_dataset_available():
     )
 
 
-def ensure_repositories_cloned():
-    # Check if <data_dir>/practical/repos directory exists
-    if os.path.exists(repos_dir):
-        logger.info("target repositories already available.")
-        return
-
-    os.makedirs(repos_dir, exist_ok=True)
+def ensure_repositories_cloned(
+    jobs: int = repos.DEFAULT_JOBS, filter: str | None = repos.DEFAULT_FILTER
+):
     data = pd.read_csv(csv_file)
-    for repo_url in data["repo_url"].unique():
-        repo_name = repo_url.split("/")[-1].replace(".git", "")
-        repo_path = os.path.join(repos_dir, repo_name)
-        if not os.path.exists(repo_path):
-            os.system(f"git clone {repo_url} {repo_path}")
-            logger.info(f"Cloned {repo_name} to {repo_path}")
-        else:
-            logger.info(f"{repo_name} already cloned at {repo_path}")
+    repos.provision_repositories(data["repo_url"].unique(), repos_dir, jobs, filter)
 
 
 def extractor_for_repo(repo_url: str, metrics: Metrics) -> Extractor:
@@ -78,58 +73,83 @@ def run_bench(count: int = 100):
 
     metrics = Metrics()
     extractors: dict[str, Extractor] = {}
+    fetcher = IssueFetcher(metrics=metrics)
 
     logger.info("Running practical benchmark")
     data = pd.read_csv(csv_file)
-    for i, (index, row) in enumerate(data.iterrows()):
-        if i > count:
-            break
-        tokens = bench_single_row(row, index, data, extractors, metrics)
+    store = ResultStore(os.path.join(results_dir, "practical.csv.jsonl"))
+
+    # resume from the rows that are already stored
+    done = store.done()
+    pending = data.iloc[: count + 1]
+    pending = pending[~pending.index.isin(done)]
+    logger.info(f"{len(done)} rows already done, {len(pending)} rows to run")
+
+    batch_size = 10
+    for i, (index, row) in enumerate(pending.iterrows()):
+        if i % batch_size == 0:
+            # fetch the issues of this and the next batch while rows are being processed
+            fetcher.prefetch(pending["issue_url"].iloc[i : i + 2 * batch_size])
+        tokens, record = bench_single_row(row, index, extractors, metrics, fetcher)
+        store.append(record)
         all_token_used += tokens
 
-        data.to_csv(os.path.join(results_dir, "practical.csv"), index=False)
         logger.info(f"results saved up to {index} rows")
         metrics.dump(os.path.join(results_dir, "metrics.json"))
         logger.info(f"metrics saved up to {index} rows")
 
+    store.compact(data, os.path.join(results_dir, "practical.csv"))
+    metrics.dump(os.path.join(results_dir, "metrics.json"))
+    metrics.dump_openmetrics(os.path.join(results_dir, "metrics.txt"))
+
 
 def repair():
     all_token_used = 0
     metrics = Metrics()
     extractors: dict[str, Extractor] = {}
+    fetcher = IssueFetcher(metrics=metrics)
 
     for csv_file in os.listdir(results_dir):
         metrics.drop()
 
         if csv_file.endswith(".csv"):
             logger.info(f"Running repair for {csv_file}")
-            data = pd.read_csv(os.path.join(results_dir, csv_file))
-            for index, row in data.iterrows():
-                if pd.isna(data.loc[index, "error"]):
-                    continue
-
+            store = ResultStore(os.path.join(results_dir, f"{csv_file}.jsonl"))
+            # pick up rows stored after the last compaction
+            data = store.compact(
+                pd.read_csv(os.path.join(results_dir, csv_file)),
+                os.path.join(results_dir, csv_file),
+            )
+            failed = data[data["error"].fillna("") != ""]
+            fetcher.prefetch(failed["issue_url"])
+            for index, row in failed.iterrows():
                 logger.info(f"Repairing {index}'th row...")
 
-                tokens = bench_single_row(row, index, data, extractors, metrics)
+                tokens, record = bench_single_row(
+                    row, index, extractors, metrics, fetcher
+                )
+                store.append(record)
                 all_token_used += tokens
-                if all_token_used > 2000 * 1000:
+                if all_token_used > 2000 * 1000 and not replay.replaying():
                     logger.info("Token limit reached, cooling down for 30 seconds.")
                     time.sleep(30)
                     all_token_used = 0
 
-            data.to_csv(os.path.join(results_dir, csv_file))
+            store.compact(data, os.path.join(results_dir, csv_file))
             logger.info(f"results saved to {os.path.join(results_dir, csv_file)}")
 
 
-def bench_single_row(row, index, data, extractors, metrics) -> int:
+def bench_single_row(
+    row, index, extractors, metrics, fetcher
+) -> Tuple[int, Dict[str, Any]]:
     tokens = 0
+    record: Dict[str, Any] = {"row": int(index)}
     issue_url: str = row["issue_url"]  # type: ignore
     repo_url: str = row["repo_url"]  # type: ignore
     if repo_url not in extractors:
         extractors[repo_url] = extractor_for_repo(repo_url, metrics)
 
     extractor: Extractor = extractors.get(repo_url)  # type: ignore
-    extractor.issue_wrapper = issue_wrapper.wrapper_for(issue_url)
     ga = GitAnchor(extractor)
     ga.register_tools(GIT_TOOLS)
     ga.register_tools(CODE_TOOLS)
@@ -138,18 +158,18 @@ def bench_single_row(row, index, data, extractors, metrics) -> int:
 
     logger.info(f"Processing {index}'th row...")
     try:
-        ga.extractor.issue_wrapper = issue_wrapper.wrapper_for(issue_url)
+        ga.extractor.issue_wrapper = issue_wrapper.wrapper_for(issue_url, fetcher)
         commit_hash, tokens = ga.find_link()
         metrics.flush()
 
-        data.at[index, "result"] = commit_hash
-        data.at[index, "error"] = ""
+        record["result"] = commit_hash
+        record["error"] = ""
     except Exception as e:
         logger.error(f"Error processing {issue_url}: {e}")
-        data.at[index, "error"] = str(e)
+        record["error"] = str(e)
     finally:
         metrics.reset()
-    return tokens
+    return tokens, record
 
 
 parser = argparse.ArgumentParser(description="practical benchmark script")
@@ -159,10 +179,46 @@ parser.add_argument(
 parser.add_argument(
     "--count", "-c", type=int, help="number of rows to process", default=sys.maxsize
 )
+parser.add_argument(
+    "--issue-snapshot",
+    help="serve issues from a snapshot created by bench.snapshot instead of the network",
+)
+parser.add_argument(
+    "--record",
+    help="record the completions of the LLM into this directory",
+)
+parser.add_argument(
+    "--replay",
+    help="replay completions recorded with --record from this directory, or from the replay stub at this URL",
+)
+parser.add_argument(
+    "--trace",
+    help="write a trace of the sessions in the Chrome trace event format to this file",
+)
+parser.add_argument(
+    "--clone-jobs",
+    type=int,
+    help="number of repositories cloned in parallel",
+    default=repos.DEFAULT_JOBS,
+)
+parser.add_argument(
+    "--clone-filter",
+    help="object filter of repository clones, an empty value makes full clones",
+    default=repos.DEFAULT_FILTER,
+)
 args = parser.parse_args()
 
+if args.issue_snapshot:
+    os.environ[issue_wrapper.SNAPSHOT_ENV] = args.issue_snapshot
+if args.record:
+    os.environ[replay.RECORD_ENV] = args.record
+if args.replay:
+    os.environ[replay.REPLAY_ENV] = args.replay
+if args.trace:
+    trace.enable(args.trace)
+
 ensure_dataset_available()
-ensure_repositories_cloned()
+ensure_repositories_cloned(args.clone_jobs, args.clone_filter)
 
 
 if args.repair:
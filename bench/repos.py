@@ -0,0 +1,179 @@
+# provisioning of the repositories referenced by benchmark datasets
+
+import logging
+import os
+import re
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# history and trees are cloned upfront, blobs are fetched from the remote
+# on demand (e.g. by `git diff` or a checkout in the code tools)
+DEFAULT_FILTER = "blob:none"
+DEFAULT_JOBS = 4
+
+# suffix of clones that are still in progress
+PARTIAL_SUFFIX = ".partial"
+
+
+def repo_name(repo_url: str) -> str:
+    return repo_url.rstrip("/").split("/")[-1].replace(".git", "")
+
+
+def normalize_url(repo_url: str) -> str:
+    """
+    `host/path` of a repository URL, the same for the URLs of a repository that
+    only differ by scheme, credentials, a `.git` suffix, a trailing slash or case,
+    e.g. `https://github.com/a/b.git`, `http://github.com/A/b` and `git@github.com:a/b`.
+    """
+    url = repo_url.strip().lower()
+    url = re.sub(r"^[a-z+]+://", "", url)
+    # scp-like syntax of ssh URLs: `user@host:path`
+    url = re.sub(r"^([^/@]+@)?([^/:]+):(?!\d+/)", r"\2/", url)
+    url = re.sub(r"^[^/@]+@", "", url)
+    url = url.rstrip("/")
+    return url.removesuffix(".git").rstrip("/")
+
+
+def git(*args: str, cwd: str | None = None) -> subprocess.CompletedProcess:
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    return subprocess.run(
+        ["git", *args], cwd=cwd, env=env, capture_output=True, text=True
+    )
+
+
+def has_head(path: str) -> bool:
+    """
+    Check whether the repository at `path` has a resolvable HEAD commit.
+    """
+    result = git("rev-parse", "--verify", "--quiet", "HEAD^{commit}", cwd=path)
+    return result.returncode == 0
+
+
+def origin_url(path: str) -> str:
+    return git("config", "--get", "remote.origin.url", cwd=path).stdout.strip()
+
+
+def verify_clone(path: str, repo_url: str) -> bool:
+    """
+    Check that `path` is a complete clone of `repo_url`.
+    """
+    if not os.path.isdir(os.path.join(path, ".git")):
+        return False
+    if not has_head(path):
+        return False
+    return normalize_url(origin_url(path)) == normalize_url(repo_url)
+
+
+def clone_repository(
+    repo_url: str, repos_dir: str, filter: str | None = DEFAULT_FILTER
+) -> str:
+    """
+    Clone a repository into `repos_dir` and return the path of the clone.
+
+    The clone is made in a `.partial` directory which is renamed once the
+    work tree has been checked out, so an interrupted clone is never mistaken
+    for a finished one. A partial clone whose objects are already complete
+    only needs its work tree to be checked out again.
+
+    A clone with a HEAD is never deleted: if it is a clone of another repository
+    or `path` is not a clone at all, this fails instead. Only clones without a
+    HEAD, left by an interrupted clone, are made again.
+
+    Args:
+        repo_url (str): URL of the repository.
+        repos_dir (str): directory containing all cloned repositories.
+        filter (str | None): object filter passed to `git clone --filter`, full clone if not given.
+    """
+    path = os.path.join(repos_dir, repo_name(repo_url))
+    if os.path.exists(path):
+        if verify_clone(path, repo_url):
+            logger.info(f"{repo_name(repo_url)} already cloned at {path}")
+            return path
+        if not os.path.isdir(os.path.join(path, ".git")):
+            raise RuntimeError(f"{path} exists and is not a clone of {repo_url}")
+        if has_head(path):
+            raise RuntimeError(
+                f"{path} is a clone of {origin_url(path)}, not of {repo_url}"
+            )
+        logger.warning(f"{path} is an incomplete clone of {repo_url}, cloning again")
+        shutil.rmtree(path)
+
+    partial = path + PARTIAL_SUFFIX
+    if os.path.exists(partial) and verify_clone(partial, repo_url):
+        logger.info(f"resuming interrupted clone of {repo_url}")
+    else:
+        shutil.rmtree(partial, ignore_errors=True)
+        args = ["clone", "--no-checkout"]
+        if filter:
+            args.append(f"--filter={filter}")
+        logger.info(f"Cloning {repo_url} to {path}")
+        result = git(*args, repo_url, partial)
+        if result.returncode != 0:
+            shutil.rmtree(partial, ignore_errors=True)
+            raise RuntimeError(f"failed to clone {repo_url}: {result.stderr.strip()}")
+
+    result = git("reset", "--hard", "HEAD", cwd=partial)
+    if result.returncode != 0:
+        raise RuntimeError(f"failed to check out {repo_url}: {result.stderr.strip()}")
+
+    os.rename(partial, path)
+    logger.info(f"Cloned {repo_name(repo_url)} to {path}")
+    return path
+
+
+def provision_repositories(
+    repo_urls: Iterable[str],
+    repos_dir: str,
+    jobs: int = DEFAULT_JOBS,
+    filter: str | None = DEFAULT_FILTER,
+) -> Dict[str, str]:
+    """
+    Clone all given repositories with at most `jobs` clones running at once.
+    Returns the paths of the available clones keyed by repository URL.
+
+    Args:
+        repo_urls (Iterable[str]): URLs of the repositories.
+        repos_dir (str): directory containing all cloned repositories.
+        jobs (int): maximum number of concurrent clones.
+        filter (str | None): object filter passed to `git clone --filter`, full clone if not given.
+    """
+    os.makedirs(repos_dir, exist_ok=True)
+    repo_urls = list(dict.fromkeys(repo_urls))
+
+    # one job per clone directory: the URLs of the same repository share it,
+    # the URLs of other repositories with the same name can not be cloned there
+    jobs_by_path: Dict[str, List[str]] = {}
+    failed: List[str] = []
+    for url in repo_urls:
+        urls = jobs_by_path.setdefault(repo_name(url), [])
+        if urls and normalize_url(urls[0]) != normalize_url(url):
+            logger.error(f"{url} and {urls[0]} are both cloned to {repo_name(url)}")
+            failed.append(url)
+        else:
+            urls.append(url)
+
+    paths: Dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = {
+            executor.submit(clone_repository, urls[0], repos_dir, filter): urls
+            for urls in jobs_by_path.values()
+        }
+        for future in as_completed(futures):
+            urls = futures[future]
+            try:
+                path = future.result()
+                paths.update((url, path) for url in urls)
+            except Exception as e:
+                logger.error(f"Error cloning {urls[0]}: {e}")
+                failed.extend(urls)
+
+    logger.info(
+        f"{len(paths)} of {len(repo_urls)} repositories available in {repos_dir}"
+    )
+    if failed:
+        logger.warning(f"failed to clone: {failed}")
+    return paths
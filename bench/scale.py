@@ -0,0 +1,471 @@
+# this script measures how the git-wrapper and code-wrapper operations scale
+# on synthetic repositories, and compares the results against stored baselines
+#
+#   python -m bench.scale --preset small medium --save <NAME>
+#   python -m bench.scale --preset small medium --compare <NAME>
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, Field
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+data_dir = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"
+)
+repos_dir = os.path.join(data_dir, "scale", "repos")
+baselines_dir = os.path.join(data_dir, "scale", "baselines")
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S %z"
+START_DATE = datetime(2020, 1, 1, tzinfo=timezone.utc)
+EXTENSIONS = {"python": "py", "go": "go", "java": "java"}
+
+
+class ScaleSpec(BaseModel):
+    """Shape of a synthetic repository"""
+
+    name: str = Field(..., description="name used to store and compare results")
+    commits: int = Field(1000, description="number of commits on the default branch")
+    branches: int = Field(10, description="number of branches besides the default one")
+    branch_commits: int = Field(1, description="number of commits on each branch")
+    files: int = Field(100, description="number of source files")
+    rename_every: int = Field(
+        50, description="rename a file every n commits, 0 to disable"
+    )
+    languages: List[str] = Field(
+        ["python", "go", "java"], description="languages of the source files"
+    )
+    authors: int = Field(20, description="number of distinct authors")
+    seed: int = Field(0, description="seed of the generator")
+
+    def digest(self) -> str:
+        data = self.model_dump_json(exclude={"name"})
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()[:12]
+
+
+PRESETS = {
+    "small": ScaleSpec(name="small", commits=1_000, branches=10, files=100),
+    "medium": ScaleSpec(name="medium", commits=20_000, branches=200, files=1_000),
+    "large": ScaleSpec(
+        name="large", commits=200_000, branches=2_000, files=5_000, authors=500
+    ),
+}
+
+
+def source_file(language: str, index: int, revision: int) -> str:
+    """
+    Content of a source file with a class, a method and a function, changing with every revision.
+    """
+    if language == "python":
+        return (
+            f"class Widget{index}:\n"
+            f'    """Widget number {index}"""\n\n'
+            f"    def method(self):\n"
+            f"        return {revision}\n\n\n"
+            f"def helper{index}():\n"
+            f'    """Helper of widget {index}"""\n'
+            f"    return {revision}\n"
+        )
+    if language == "go":
+        return (
+            f"package widgets\n\n"
+            f"// Widget{index} is widget number {index}\n"
+            f"type Widget{index} struct{{}}\n\n"
+            f"// Method of widget {index}\n"
+            f"func (w *Widget{index}) Method() int {{\n\treturn {revision}\n}}\n\n"
+            f"// helper{index} helps widget {index}\n"
+            f"func helper{index}() int {{\n\treturn {revision}\n}}\n"
+        )
+    if language == "java":
+        return (
+            f"/** Widget number {index} */\n"
+            f"public class Widget{index} {{\n"
+            f"    /** Method of widget {index} */\n"
+            f"    public int method() {{\n        return {revision};\n    }}\n\n"
+            f"    /** Helper of widget {index} */\n"
+            f"    public static int helper{index}() {{\n"
+            f"        return {revision};\n    }}\n"
+            f"}}\n"
+        )
+    raise ValueError(f"unsupported language: {language}")
+
+
+class FastImportStream:
+    """
+    Writes a `git fast-import` stream of commits with inline file contents.
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.mark = 0
+
+    def data(self, content: str):
+        encoded = content.encode("utf-8")
+        self.out.write(b"data %d\n" % len(encoded))
+        self.out.write(encoded)
+        self.out.write(b"\n")
+
+    def commit(
+        self,
+        ref: str,
+        author: str,
+        date: datetime,
+        message: str,
+        parent: int | None,
+        modified: Dict[str, str],
+        renamed: Dict[str, str] | None = None,
+    ) -> int:
+        self.mark += 1
+        when = f"{int(date.timestamp())} +0000"
+        self.out.write(f"commit {ref}\nmark :{self.mark}\n".encode("utf-8"))
+        self.out.write(f"author {author} {when}\n".encode("utf-8"))
+        self.out.write(f"committer {author} {when}\n".encode("utf-8"))
+        self.data(message)
+        if parent is not None:
+            self.out.write(f"from :{parent}\n".encode("utf-8"))
+        for old, new in (renamed or {}).items():
+            self.out.write(f'R "{old}" "{new}"\n'.encode("utf-8"))
+        for path, content in modified.items():
+            self.out.write(f'M 100644 inline "{path}"\n'.encode("utf-8"))
+            self.data(content)
+        self.out.write(b"\n")
+        return self.mark
+
+
+def write_history(spec: ScaleSpec, out) -> Dict[str, Any]:
+    """
+    Write the history of the synthetic repository as a fast-import stream.
+    Returns facts about the generated history used to parameterise the operations.
+    """
+    rng = random.Random(spec.seed)
+    stream = FastImportStream(out)
+    authors = [f"Author {i} <author{i}@example.com>" for i in range(spec.authors)]
+    languages = [spec.languages[i % len(spec.languages)] for i in range(spec.files)]
+
+    def path_of(i: int, renames: int) -> str:
+        suffix = f"_v{renames}" if renames else ""
+        return f"src/module{i % 50}/widget{i}{suffix}.{EXTENSIONS[languages[i]]}"
+
+    paths = [path_of(i, 0) for i in range(spec.files)]
+    revisions = [0] * spec.files
+    renames = [0] * spec.files
+
+    # the first commit adds all files
+    date = START_DATE
+    parent = stream.commit(
+        "refs/heads/master",
+        authors[0],
+        date,
+        "initial commit",
+        None,
+        {path: source_file(languages[i], i, 0) for i, path in enumerate(paths)},
+    )
+    mainline = [parent]
+
+    for n in range(1, spec.commits):
+        date += timedelta(hours=1)
+        modified = {}
+        for i in rng.sample(range(spec.files), k=min(spec.files, rng.randint(1, 3))):
+            revisions[i] += 1
+            modified[paths[i]] = source_file(languages[i], i, revisions[i])
+
+        renamed = {}
+        if spec.rename_every and n % spec.rename_every == 0:
+            i = rng.randrange(spec.files)
+            renames[i] += 1
+            renamed[paths[i]] = path_of(i, renames[i])
+            # modifications of the renamed file apply to its new path
+            modified = {renamed.get(p, p): c for p, c in modified.items()}
+            paths[i] = renamed[paths[i]]
+
+        parent = stream.commit(
+            "refs/heads/master",
+            rng.choice(authors),
+            date,
+            f"change {n}: update {len(modified)} widgets",
+            parent,
+            modified,
+            renamed,
+        )
+        mainline.append(parent)
+
+    for b in range(spec.branches):
+        fork = rng.randrange(len(mainline))
+        branch_date = START_DATE + timedelta(hours=fork, minutes=30)
+        branch_parent = mainline[fork]
+        for c in range(spec.branch_commits):
+            branch_date += timedelta(minutes=1)
+            branch_parent = stream.commit(
+                f"refs/heads/branch{b}",
+                rng.choice(authors),
+                branch_date,
+                f"branch {b} change {c}",
+                branch_parent,
+                {f"branches/branch{b}.txt": f"{c}\n"},
+            )
+
+    return {
+        "start": START_DATE.strftime(DATETIME_FORMAT),
+        "end": (date + timedelta(days=1)).strftime(DATETIME_FORMAT),
+        "head_paths": paths,
+        "languages": languages,
+    }
+
+
+def git(*args: str, cwd: str | None = None, **kwargs) -> subprocess.CompletedProcess:
+    return subprocess.run(["git", *args], cwd=cwd, check=True, **kwargs)
+
+
+def generate_repo(spec: ScaleSpec) -> str:
+    """
+    Generate the repository described by `spec`, reusing a previously generated one.
+    The repository is a clone of the generated history, so all branches are remote branches.
+    Returns the path of the clone.
+    """
+    path = os.path.join(repos_dir, f"{spec.name}-{spec.digest()}")
+    facts_path = path + ".json"
+    if os.path.exists(facts_path):
+        logger.info(f"reusing synthetic repository at {path}")
+        return path
+
+    origin = path + ".origin"
+    shutil.rmtree(origin, ignore_errors=True)
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(origin)
+
+    logger.info(f"generating {spec} at {path}")
+    start = time.perf_counter()
+    git("init", "--quiet", "--bare", "--initial-branch=master", cwd=origin)
+    with subprocess.Popen(
+        ["git", "fast-import", "--quiet"], cwd=origin, stdin=subprocess.PIPE
+    ) as proc:
+        facts = write_history(spec, proc.stdin)
+        proc.stdin.close()  # type: ignore
+        if proc.wait() != 0:
+            raise RuntimeError(f"git fast-import failed for {spec.name}")
+    git("clone", "--quiet", origin, path)
+    logger.info(f"generated {spec.name} in {time.perf_counter() - start:.1f}s")
+
+    with open(facts_path, "w") as f:
+        json.dump(facts, f)
+    return path
+
+
+def current_rss_kb() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        return 0
+
+
+def peak_rss_kb() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def measure(operation: str, fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    rss_before = current_rss_kb()
+    peak_before = peak_rss_kb()
+    times = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+        size = len(result) if hasattr(result, "__len__") else 1
+    return {
+        "operation": operation,
+        "repeat": repeat,
+        "results": size,
+        "min_s": min(times),
+        "p50_s": float(np.percentile(times, 50)),
+        "p95_s": float(np.percentile(times, 95)),
+        "max_s": max(times),
+        "rss_delta_kb": current_rss_kb() - rss_before,
+        "peak_delta_kb": peak_rss_kb() - peak_before,
+    }
+
+
+def run_operations(spec: ScaleSpec, path: str, repeat: int) -> List[Dict[str, Any]]:
+    """
+    Measure all operations on the generated repository.
+    """
+    from code_wrapper import Wrapper as CodeWrapper
+    from git_wrapper import Branchless, Pagination
+
+    with open(path + ".json") as f:
+        facts = json.load(f)
+    start, end = facts["start"], facts["end"]
+    # a window of about 1% of the history, starting in its middle
+    middle = START_DATE + timedelta(hours=spec.commits // 2)
+    window_end = middle + timedelta(hours=max(10, spec.commits // 100))
+    window = (middle.strftime(DATETIME_FORMAT), window_end.strftime(DATETIME_FORMAT))
+    file_path = facts["head_paths"][0]
+    language = facts["languages"][0]
+    extension = EXTENSIONS[language]
+    method = "Widget0.Method()" if language == "go" else "Widget0.method()"
+
+    results = []
+    results.append(measure("git_startup", lambda: Branchless.from_local(path), 1))
+    results.append(measure("code_startup", lambda: CodeWrapper.from_local(path), 1))
+    git_wrapper = Branchless.from_local(path)
+    code_wrapper = CodeWrapper.from_local(path)
+
+    head = git_wrapper.list_commits(Pagination.first())[0].hash
+    everything = Pagination.all()
+    operations: Dict[str, Callable[[], Any]] = {
+        "commits_between_all": lambda: git_wrapper.commits_between(
+            start, end, everything
+        ),
+        "commits_between_window": lambda: git_wrapper.commits_between(
+            *window, everything
+        ),
+        # first batch shown to the LLM
+        "commit_cursor_first_batch": lambda: next(
+            git_wrapper.commit_cursor(start, end, 100)
+        ),
+        "list_authors": lambda: git_wrapper.list_authors((start, end)),
+        # columns of the commit store, read by NumPy without copies
+        "commits_per_author": lambda: np.bincount(np.asarray(git_wrapper.author_ids())),
+        "has_commit": lambda: git_wrapper.has_commit(head),
+        "list_files_window": lambda: git_wrapper.list_files(f".{extension}", window),
+        "commits_on_file": lambda: git_wrapper.commits_on_file(
+            file_path, (start, end), everything
+        ),
+        "fetch_definition": lambda: code_wrapper.fetch_definition(
+            method, head, file_path
+        ),
+    }
+    for name, fn in operations.items():
+        results.append(measure(name, fn, repeat))
+    return [dict(result, spec=spec.name, commits=spec.commits) for result in results]
+
+
+def run_scale(specs: List[ScaleSpec], repeat: int) -> pd.DataFrame:
+    os.makedirs(repos_dir, exist_ok=True)
+    results = []
+    for spec in specs:
+        path = generate_repo(spec)
+        # measure each repository in a fresh process to keep memory figures apart
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+            results.extend(executor.submit(run_operations, spec, path, repeat).result())
+    columns = ["spec", "commits", "operation"]
+    data = pd.DataFrame(results)
+    return data[columns + [c for c in data.columns if c not in columns]]
+
+
+def git_revision() -> str:
+    result = subprocess.run(
+        ["git", "describe", "--always", "--dirty"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout.strip()
+
+
+def save_baseline(data: pd.DataFrame, name: str) -> str:
+    os.makedirs(baselines_dir, exist_ok=True)
+    path = os.path.join(baselines_dir, f"{name}.json")
+    baseline = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "results": data.to_dict(orient="records"),
+    }
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2)
+    return path
+
+
+def compare_baseline(data: pd.DataFrame, name: str, tolerance: float) -> pd.DataFrame:
+    """
+    Compare the results with a stored baseline. An operation regresses when its
+    median latency or memory grows by more than `tolerance` (e.g. 0.2 for 20%).
+    """
+    with open(os.path.join(baselines_dir, f"{name}.json")) as f:
+        baseline = pd.DataFrame(json.load(f)["results"])
+
+    key = ["spec", "operation"]
+    values = ["p50_s", "peak_delta_kb"]
+    table = data.set_index(key)[values].join(
+        baseline.set_index(key)[values], how="inner", rsuffix="_baseline"
+    )
+    table["latency_ratio"] = table["p50_s"] / table["p50_s_baseline"]
+    # memory growth below a megabyte is noise
+    table["memory_delta_kb"] = table["peak_delta_kb"] - table["peak_delta_kb_baseline"]
+    table["regressed"] = (table["latency_ratio"] > 1 + tolerance) | (
+        (table["memory_delta_kb"] > 1024)
+        & (table["peak_delta_kb"] > (1 + tolerance) * table["peak_delta_kb_baseline"])
+    )
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="git-wrapper and code-wrapper scale benchmark"
+    )
+    parser.add_argument(
+        "--preset",
+        nargs="*",
+        choices=list(PRESETS),
+        default=["small"],
+        help="synthetic repositories to benchmark",
+    )
+    parser.add_argument(
+        "--spec",
+        help="JSON file with a list of repository specs (see ScaleSpec) used instead of presets",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="repetitions of each operation"
+    )
+    parser.add_argument("--save", help="store the results as a baseline with this name")
+    parser.add_argument(
+        "--compare", help="compare the results with the baseline of this name"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="allowed relative regression"
+    )
+    args = parser.parse_args()
+
+    if args.spec:
+        with open(args.spec) as f:
+            specs = [ScaleSpec.model_validate(spec) for spec in json.load(f)]
+    else:
+        specs = [PRESETS[name] for name in args.preset]
+
+    data = run_scale(specs, args.repeat)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(data.to_string(index=False))
+
+        if args.save:
+            logger.info(f"baseline saved to {save_baseline(data, args.save)}")
+
+        if args.compare:
+            table = compare_baseline(data, args.compare, args.tolerance)
+            print(table.to_string())
+            if table["regressed"].any():
+                logger.error(f"{int(table['regressed'].sum())} operations regressed")
+                sys.exit(1)
@@ -0,0 +1,119 @@
+# this script materialises all issues referenced by benchmark datasets into
+# a single snapshot file, so benchmarks can run without fetching issues
+
+import argparse
+import logging
+import os
+
+import pandas as pd
+
+from src import issue_wrapper
+from src.issue_wrapper import IssueFetcher, IssueSnapshot
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+data_dir = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"
+)
+default_snapshot = os.path.join(data_dir, "issues.snapshot.json.gz")
+
+# fetched batches between two saves of the snapshot
+SAVE_EVERY = 20
+
+
+def dataset_csv_files(paths):
+    """
+    Expand the given paths to dataset csv files.
+    Directories are expanded to the csv files inside them.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for file in sorted(os.listdir(path)):
+                if file.endswith(".csv"):
+                    yield os.path.join(path, file)
+        else:
+            yield path
+
+
+def export_snapshot(
+    paths, dst: str, fetcher: IssueFetcher, save_every: int = SAVE_EVERY
+):
+    """
+    Add the issues of the dataset csv files at `paths` missing from the
+    snapshot at `dst` to it.
+    Args:
+        save_every (int): number of fetched batches between two saves of the
+        snapshot, each save rewrites the whole file.
+    """
+    snapshot = IssueSnapshot.load(dst) if os.path.exists(dst) else IssueSnapshot()
+
+    urls = []
+    for csv_file in dataset_csv_files(paths):
+        data = pd.read_csv(csv_file)
+        urls.extend(data["issue_url"].unique())
+    urls = [url for url in dict.fromkeys(urls) if url not in snapshot]
+    logger.info(f"{len(snapshot)} issues already in snapshot, {len(urls)} to fetch")
+
+    batches = range(0, len(urls), fetcher.batch_size)
+    try:
+        for n, i in enumerate(batches, start=1):
+            batch = urls[i : i + fetcher.batch_size]
+            try:
+                fetcher.fetch_many(batch)
+            except Exception as e:
+                logger.warning(f"bulk fetch failed, fetching issues one by one: {e}")
+
+            for url in batch:
+                try:
+                    snapshot.add(url, issue_wrapper.wrapper_for(url, fetcher))
+                except Exception as e:
+                    logger.error(f"Error fetching {url}: {e}")
+            # persist progress now and then, an interrupted export resumes from
+            # the issues missing from the snapshot
+            if n % save_every == 0:
+                snapshot.save(dst)
+                logger.info(f"{len(snapshot)} issues saved to {dst}")
+    finally:
+        snapshot.save(dst)
+    return snapshot
+
+
+def default_datasets():
+    datasets = [
+        os.path.join(data_dir, "ealink", "csv"),
+        os.path.join(data_dir, "practical", "data.csv"),
+    ]
+    return [path for path in datasets if os.path.exists(path)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="issue snapshot exporter")
+    parser.add_argument(
+        "datasets",
+        nargs="*",
+        help="dataset csv files or directories of csv files (defaults to the ealink and practical datasets)",
+    )
+    parser.add_argument(
+        "--output", "-o", help="path of the snapshot file", default=default_snapshot
+    )
+    parser.add_argument(
+        "--save-every",
+        type=int,
+        default=SAVE_EVERY,
+        help="number of fetched batches between two saves of the snapshot",
+    )
+    args = parser.parse_args()
+
+    # make sure the exporter never reads from a previously configured snapshot
+    os.environ.pop(issue_wrapper.SNAPSHOT_ENV, None)
+    export_snapshot(
+        args.datasets or default_datasets(),
+        args.output,
+        IssueFetcher(),
+        save_every=max(1, args.save_every),
+    )
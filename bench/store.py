@@ -0,0 +1,101 @@
+import json
+import logging
+import os
+from typing import Any, Dict, List, Set
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class ResultStore:
+    """
+    Append-only store of benchmark results.
+
+    Every completed row is appended as a single JSON line, so a crash loses at
+    most the row that was running. Rows can be stored more than once (e.g. by
+    repair runs), in which case the latest record wins during compaction.
+    """
+
+    def __init__(self, path: str, key: str = "row"):
+        """Initialize the ResultStore instance.
+        Args:
+            path (str): path of the JSONL file backing the store.
+            key (str): name of the record field identifying a dataset row.
+        """
+        self.path = path
+        self.key = key
+        self.checked_tail = False
+
+    def records(self) -> List[Dict[str, Any]]:
+        """
+        Read all records in the order they were appended.
+        """
+        if not os.path.exists(self.path):
+            return []
+
+        records = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # the last line might be cut short by a crash
+                    logger.warning(f"skipping malformed record in {self.path}")
+        return records
+
+    def latest(self) -> Dict[Any, Dict[str, Any]]:
+        """
+        Return the latest record of each row.
+        """
+        return {record[self.key]: record for record in self.records()}
+
+    def done(self) -> Set[Any]:
+        """
+        Return the keys of all rows that have a record.
+        """
+        return set(self.latest())
+
+    def append(self, record: Dict[str, Any]):
+        """
+        Durably append the record of a completed row.
+        """
+        line = json.dumps(record, default=str)
+        if not self.checked_tail:
+            self.terminate_partial_line()
+            self.checked_tail = True
+
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def terminate_partial_line(self):
+        """
+        Make sure a line left unfinished by a crash does not swallow the next record.
+        """
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    def compact(self, data: pd.DataFrame, dst: str) -> pd.DataFrame:
+        """
+        Merge the latest record of each row into the dataset and write it as a CSV file.
+        Returns the merged dataset.
+        """
+        data = data.copy()
+        records = pd.DataFrame(list(self.latest().values()))
+        if not records.empty:
+            records = records.set_index(self.key)
+            records = records[records.index.isin(data.index)]
+            for column in records.columns:
+                # columns read back from CSV might be all-NaN floats
+                if column in data and data[column].dtype != records[column].dtype:
+                    data[column] = data[column].astype(object)
+                data.loc[records.index, column] = records[column]
+
+        data.to_csv(dst, index=False)
+        return data
@@ -1,4 +1,8 @@
-from typing import Any, Callable, List, Tuple
+from contextlib import nullcontext
+from itertools import chain
+from typing import Any, Callable, Iterator, List, Tuple
+import threading
+import time
 from openai.types.chat import ChatCompletionToolParam as Tool
 from openai.types.chat import ChatCompletionMessageParam as Message
 from openai.types.chat import ParsedChatCompletion
@@ -8,7 +12,12 @@ import logging
 
 from git_wrapper import CommitMeta
 from src import prompt
+from src import trace
+from src.anchor import replay
+from src.anchor.budget import IterationUsage, TokenBudget
+from src.anchor.cascade import Cascade, TierUsage
 from src.anchor.extractor import Extractor
+from src.anchor.tokens import estimate_request_tokens
 from src.term import Color
 from src import term
 from src.schema.control import Control, Finish, Next,GiveUp
@@ -16,6 +25,29 @@ from src.schema.control import Control, Finish, Next,GiveUp
 # Configure logger for this module
 logger = logging.getLogger(__name__)
 
+DEFAULT_MODEL = "gpt-4o-nano"
+
+# results of sessions stopped before the model finished
+CANCELLED = "session cancelled, another session found the commit"
+BUDGET_EXHAUSTED = "token budget exhausted, no commit hash found"
+
+# a session running low on tokens compacts its conversation, then shrinks its
+# batches, while a request takes more than this share of the tokens it has left
+BUDGET_PRESSURE = 0.25
+# tool results kept when compacting the conversation
+KEPT_RESULTS = 2
+# tokens left for the reply when checking that a request fits in the budget
+REPLY_TOKENS = 1000
+
+
+def resized(
+    batches: Iterator[List[CommitMeta]], size: int
+) -> Iterator[List[CommitMeta]]:
+    """The commits of `batches` in batches of at most `size` commits."""
+    for batch in batches:
+        for start in range(0, len(batch), size):
+            yield batch[start : start + size]
+
 
 class Agent:
     """
@@ -24,59 +56,307 @@ class Agent:
     It returns the commit hash that resolves the issue.
     """
 
-    def __init__(self, api_key: str = ""):
+    def __init__(
+        self,
+        api_key: str = "",
+        model: str = DEFAULT_MODEL,
+        batch_size: int = prompt.COMMIT_BATCH_SIZE,
+        client: openai.OpenAI | None = None,
+        cascade: Cascade | None = None,
+        inline_digests: bool = False,
+        session_token_budget: int | None = None,
+    ):
         """Initialize the Agent instance.
         Args:
             api_key (str): OpenAI API key. if not provided, the default OpenAI client will be used.
+            model (str): name of the model used for every request.
+            batch_size (int): number of commits shown to the LLM in each batch.
+            client (openai.OpenAI | None): client shared with other agents, a new one is created if not given.
+            cascade (Cascade | None): models tried from cheapest to strongest, overrides `model`.
+            inline_digests (bool): show the digests of the commits with each batch,
+            computing the digests of the next batch in the background.
+            session_token_budget (int | None): maximum number of tokens of a session,
+            unlimited if not given.
         """
-        if api_key == "":
-            self.client = openai.OpenAI()
-        else:
-            self.client = openai.OpenAI(api_key=api_key)
+        self.client = client or replay.openai_client(api_key)
+        self.cascade = cascade or Cascade.single(model)
+        self.model = self.cascade.tiers[0].model
+        self.batch_size = batch_size
+        self.inline_digests = inline_digests
+        self.session_token_budget = session_token_budget
+
+        # current tier of the cascade and the usage of each tier of the session
+        self.tier = 0
+        self.usage: List[TierUsage] = []
+        # tokens of each request of the session
+        self.iterations: List[IterationUsage] = []
+
+        # record/replay of completions, see src.anchor.replay
+        self.record_store = replay.record_store()
+        self.replay_store = replay.replay_store()
+        self.session = ""
+        self.turn = 0
 
     def communicate(
         self,
         messages: List[Message],
         tools: List[Tool] | NotGiven = NOT_GIVEN,
+        iteration: IterationUsage | None = None,
     ) -> ParsedChatCompletion:
-        """Communicate with the OpenAI API."""
-
-        return self.client.beta.chat.completions.parse(
-            model="gpt-4o-nano",
-            messages=messages,
-            tools=tools,
-        )
+        """Communicate with the OpenAI API.
+        Args:
+            iteration (IterationUsage | None): usage of the request, filled with the
+            tokens reported by the API. Estimated from the messages if not given.
+        """
+        if iteration is None:
+            iteration = IterationUsage(
+                model=self.model,
+                estimated_prompt_tokens=estimate_request_tokens(messages, tools),
+            )
+        turn = self.turn
+        self.turn += 1
+        start = time.perf_counter()
+        with trace.span("communicate", "llm", model=self.model, turn=turn) as span:
+            if self.replay_store:
+                recorded = self.replay_store.get(self.session, turn)
+                completion = replay.parse_completion(recorded, tools)
+            else:
+                completion = self.client.beta.chat.completions.parse(  # type: ignore
+                    model=self.model,
+                    messages=messages,
+                    tools=tools,
+                    extra_headers=replay.headers(self.session, turn),
+                )
+                if self.record_store:
+                    self.record_store.append(
+                        self.session, turn, replay.raw_completion(completion)
+                    )
+            if completion.usage:
+                span["tokens"] = completion.usage.total_tokens
+        if completion.usage:
+            iteration.prompt_tokens = completion.usage.prompt_tokens or 0
+            iteration.completion_tokens = completion.usage.completion_tokens or 0
+            details = completion.usage.prompt_tokens_details
+            iteration.cached_tokens = (details and details.cached_tokens) or 0
+            logger.debug(
+                f"estimated {iteration.estimated_prompt_tokens} prompt tokens, "
+                f"sent {iteration.prompt_tokens}"
+            )
+        self.iterations.append(iteration)
+        if self.usage:
+            usage = self.usage[-1]
+            usage.calls += 1
+            usage.seconds += time.perf_counter() - start
+            if completion.usage:
+                usage.tokens += completion.usage.total_tokens or 0
+                usage.prompt_tokens += iteration.prompt_tokens
+                usage.completion_tokens += iteration.completion_tokens
+                usage.cached_tokens += iteration.cached_tokens
+        return completion
 
-    def communicate_commits(
-        self, commits: List[CommitMeta], messages: List[Message], tools: List[Tool]
-    ) -> ParsedChatCompletion:
-        new_messages: List[Message] = [prompt.show_commits(commits)]
+    def with_commits(
+        self,
+        commits: List[CommitMeta],
+        messages: List[Message],
+        extractor: Extractor | None = None,
+    ) -> List[Message]:
+        """The messages of a request showing the current batch of commits."""
+        digests = None
+        if self.inline_digests and extractor is not None:
+            digests = extractor.batch_digests(commits)
+        new_messages: List[Message] = [prompt.show_commits(commits, digests)]
         new_messages.extend(messages)
-        return self.communicate(new_messages, tools)
+        return new_messages
+
+    def batches(
+        self,
+        extractor: Extractor,
+        window: Callable[[int], Iterator[List[CommitMeta]]],
+        batch_size: int | None = None,
+    ) -> Iterator[List[CommitMeta]]:
+        batches = window(batch_size or self.batch_size)
+        if self.inline_digests:
+            return extractor.prefetch_digests(batches)
+        return batches
+
+    def measure(self, extractor: Extractor, function: Any):
+        """Measure the execution of a tool if the extractor collects metrics."""
+        if extractor.metrics is None:
+            return nullcontext({})
+        return extractor.metrics.tool(type(function).__name__)
+
+    def escalation_signal(self) -> str:
+        """The signal escalating the session from the current tier, empty if none fired."""
+        tier = self.cascade.tiers[self.tier]
+        usage = self.usage[-1]
+        if tier.max_iterations is not None and usage.calls >= tier.max_iterations:
+            return "iterations"
+        if tier.max_next is not None and usage.next_calls >= tier.max_next:
+            return "next"
+        return ""
+
+    def can_escalate(self) -> bool:
+        return self.tier + 1 < len(self.cascade.tiers)
+
+    def escalate(self, signal: str):
+        """Continue the session on the next tier of the cascade."""
+        self.usage[-1].escalation = signal
+        self.tier += 1
+        self.model = self.cascade.tiers[self.tier].model
+        self.usage.append(TierUsage(model=self.model))
+        logger.info(f"escalating to {self.model} on {signal}")
+        term.log(Color.MAGENTA, f"escalating to {self.model} on {signal}")
+
+    def final_request(
+        self, messages: List[Message], tools: List[Tool]
+    ) -> Tuple[List[Message], List[Tool]]:
+        """
+        Messages and tools of the last turn of a session running out of tokens:
+        the conversation with every tool result compacted, and only `Finish` and
+        `GiveUp` to call.
+        """
+        request: List[Message] = [
+            dict(m) if isinstance(m, dict) else m for m in messages  # type: ignore
+        ]
+        prompt.compact(request, keep=0)
+        request.append(prompt.budget_exhausted())
+        final_tools = [
+            tool
+            for tool in tools
+            if tool["function"]["name"] in (Finish.__name__, GiveUp.__name__)
+        ]
+        return (request, final_tools)
+
+    def conclude(
+        self,
+        messages: List[Message],
+        tools: List[Tool],
+        extractor: Extractor,
+        budget: TokenBudget,
+    ) -> Tuple[str, int]:
+        """
+        Last turn of a session running out of tokens, see `final_request`.
+        The session stops without asking if even that request does not fit.
+        """
+        request, final_tools = self.final_request(messages, tools)
+        estimate = estimate_request_tokens(request, final_tools)
+        remaining = budget.remaining
+        if remaining is not None and estimate + REPLY_TOKENS > remaining:
+            logger.info("token budget exhausted")
+            return (BUDGET_EXHAUSTED, 0)
+
+        message = "token budget almost exhausted, asking for a final answer"
+        logger.info(message)
+        term.log(Color.MAGENTA, message)
+        completion = self.communicate(
+            request,
+            final_tools,
+            IterationUsage(model=self.model, estimated_prompt_tokens=estimate),
+        )
+        tokens = (completion.usage.total_tokens or 0) if completion.usage else 0
+        budget.spend(tokens)
+        for tool_call in completion.choices[0].message.tool_calls or []:
+            function = tool_call.function.parsed_arguments
+            if isinstance(function, Finish) or isinstance(function, GiveUp):
+                return (function(extractor), tokens)
+        return (BUDGET_EXHAUSTED, tokens)
 
     def find_link(
-        self, issue_title: str, tools: List[Tool], extractor: Extractor
+        self,
+        issue_title: str,
+        tools: List[Tool],
+        extractor: Extractor,
+        window: Callable[[int], Iterator[List[CommitMeta]]] | None = None,
+        cancel: threading.Event | None = None,
+        budget: TokenBudget | None = None,
     ) -> Tuple[str, int]:
         """Find the commit(s) that resolve(s) the issue.
         Args:
             issue_title (str): The title of the issue.
             tools (List[Tool]): List of tools to use.
             extractor (Extractor): Extractor instance to extract information for the LLM.
+            window (Callable[[int], Iterator[List[CommitMeta]]] | None): batches of commits
+            shown to the LLM, `extractor.commit_iterator` if not given.
+            cancel (threading.Event | None): stops the session between two turns when set.
+            budget (TokenBudget | None): tokens shared with concurrent sessions,
+            the session stops once it is exhausted.
+
+        The tokens of each request are estimated before sending it. When a request
+        takes a large share of the tokens left to the session, old tool results are
+        compacted, then the batches of commits shrink, and the agent is asked for a
+        final answer once a request no longer fits.
         """
 
         total_tokens = 0
 
+        self.tier = 0
+        self.model = self.cascade.tiers[0].model
+        self.usage = [TierUsage(model=self.model)]
+        self.iterations = []
+        session = TokenBudget(self.session_token_budget, parent=budget)
+        batch_size = self.batch_size
+
         messages = [
-            prompt.problem_explanation(),
+            prompt.problem_explanation(self.batch_size),
             prompt.user_initial_prompt(issue_title),
         ]
-        commits_iterator = extractor.commit_iterator()
+        window = window or extractor.commit_iterator
+        commits_iterator = self.batches(extractor, window)
         current_commits = next(commits_iterator)
+        self.session = replay.session_key(
+            self.model, tools, [prompt.show_commits(current_commits)] + messages
+        )
+        self.turn = 0
 
         for _ in range(prompt.MAX_ITERATIONS):
-            completion = self.communicate_commits(current_commits, messages, tools)
+            if cancel is not None and cancel.is_set():
+                return (CANCELLED, total_tokens)
+            if session.exhausted:
+                logger.info("token budget exhausted")
+                return (BUDGET_EXHAUSTED, total_tokens)
+            signal = ""
+
+            request = self.with_commits(current_commits, messages, extractor)
+            estimate = estimate_request_tokens(request, tools)
+            remaining = session.remaining
+            compacted = False
+            while remaining is not None and estimate > remaining * BUDGET_PRESSURE:
+                if prompt.compact(messages, KEPT_RESULTS):
+                    compacted = True
+                elif batch_size > prompt.MIN_COMMIT_BATCH_SIZE:
+                    batch_size = max(prompt.MIN_COMMIT_BATCH_SIZE, batch_size // 2)
+                    logger.info(f"shrinking batches to {batch_size} commits")
+                    commits_iterator = resized(
+                        chain([current_commits[batch_size:]], commits_iterator),
+                        batch_size,
+                    )
+                    current_commits = current_commits[:batch_size]
+                else:
+                    break
+                request = self.with_commits(current_commits, messages, extractor)
+                estimate = estimate_request_tokens(request, tools)
+            # keep enough tokens to ask for a final answer after this request
+            final = estimate_request_tokens(*self.final_request(messages, tools))
+            if (
+                remaining is not None
+                and estimate + final + 2 * REPLY_TOKENS > remaining
+            ):
+                result, tokens = self.conclude(messages, tools, extractor, session)
+                return (result, total_tokens + tokens)
+
+            completion = self.communicate(
+                request,
+                tools,
+                IterationUsage(
+                    model=self.model,
+                    estimated_prompt_tokens=estimate,
+                    batch_size=len(current_commits),
+                    compacted=compacted,
+                ),
+            )
             if completion.usage:
                 total_tokens += completion.usage.total_tokens or 0
+                session.spend(completion.usage.total_tokens or 0)
             response = completion.choices[0].message
             logger.info(f"Response: {response.content}")
 
@@ -100,6 +380,8 @@ class Agent:
             logger.info(f"{len(response.tool_calls)} tool called")
             term.log(Color.GREEN, f"{len(response.tool_calls)} tool called")
             for tool_call in response.tool_calls:
+                if cancel is not None and cancel.is_set():
+                    return (CANCELLED, total_tokens)
                 functionn = tool_call.function.parsed_arguments
                 if functionn is None:
                     logger.error(f"message that caused error: {messages[-1]}")
@@ -111,25 +393,49 @@ class Agent:
                 term.log(Color.GREEN, f"LLM calling: {function.__repr__()}")
 
                 result=""
-                if isinstance(function, Control):
-                    if isinstance(function, Finish) or isinstance(function, GiveUp):
-                        commit_hash = function(extractor)
-                        return (commit_hash, total_tokens)
-                    elif isinstance(function, Next):
+                with (
+                    trace.span(type(function).__name__, "tool"),
+                    self.measure(extractor, function) as execution,
+                ):
+                    if isinstance(function, Control):
+                        if (
+                            isinstance(function, GiveUp)
+                            and self.cascade.tiers[self.tier].escalate_on_give_up
+                            and self.can_escalate()
+                        ):
+                            signal = "give_up"
+                            result = prompt.ESCALATED_RESULT
+                        elif isinstance(function, Finish) or isinstance(function, GiveUp):
+                            commit_hash = function(extractor)
+                            return (commit_hash, total_tokens)
+                        elif isinstance(function, Next):
+                            self.usage[-1].next_calls += 1
+                            try:
+                                current_commits = next(commits_iterator)
+                                result = function(extractor)
+                            except StopIteration:
+                                term.log(Color.YELLOW, "No more commits to show")
+                                result = "iterator exhausted"
+                    else:
                         try:
-                            current_commits = next(commits_iterator)
                             result = function(extractor)
-                        except StopIteration:
-                            term.log(Color.YELLOW, "No more commits to show")
-                            result = "iterator exhausted"
-                else:
-                    try:
-                        result = function(extractor)
-                    except Exception as e:
-                        result = f"encountered the following error: {e}"
+                        except Exception as e:
+                            result = f"encountered the following error: {e}"
+                            execution["error"] = True
+                    execution["result"] = result
                 logger.debug(f"Call result: {result.__repr__()}")
                 term.log(Color.BLUE, "Call result:")
                 term.log(Color.BLUE, result)
                 messages.append(prompt.function_call_result(tool_call, result))
 
+            signal = signal or self.escalation_signal()
+            if signal and self.can_escalate():
+                self.escalate(signal)
+                if self.cascade.keep_context:
+                    messages.append(prompt.escalation())
+                else:
+                    messages = messages[:2]
+                    commits_iterator = self.batches(extractor, window, batch_size)
+                    current_commits = next(commits_iterator)
+
         return ("FFFFFFFFFFFFF", total_tokens)
@@ -1,13 +1,20 @@
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, List, Tuple
 from pydantic import BaseModel
 import openai
 import logging
-from src.anchor.agent import Agent
+import threading
+from git_wrapper import CommitMeta
+from src.anchor.agent import Agent, DEFAULT_MODEL
+from src.anchor.budget import TokenBudget
+from src.anchor.cascade import Cascade
 from src.anchor.extractor import Extractor
 from src.anchor.extractor import GitSourceType
 from src.anchor.metrics import Metrics
 from src.term import Color
 from src import term
+from src import prompt
+from src import trace
 
 
 MAX_TRIES = 3
@@ -26,15 +33,39 @@ class GitAnchor:
         issue_agent : IssueAgent instance for accessing issue data.
     """
 
-    def __init__(self, extractor: Extractor, api_key: str = ""):
+    def __init__(
+        self,
+        extractor: Extractor,
+        api_key: str = "",
+        model: str = DEFAULT_MODEL,
+        batch_size: int = prompt.COMMIT_BATCH_SIZE,
+        client: openai.OpenAI | None = None,
+        cascade: Cascade | None = None,
+        inline_digests: bool = False,
+        session_token_budget: int | None = None,
+    ):
         """Initialize the GitAnchor instance.
         Args:
             api_key (str): OpenAI API key. if not provided, the default OpenAI client will be used.
             extractor (Extractor): Extractor instance for extracting data from the issue.
+            model (str): name of the OpenAI model used by the agent.
+            batch_size (int): number of commits shown to the agent in each batch.
+            client (openai.OpenAI | None): OpenAI client to reuse instead of creating one.
+            cascade (Cascade | None): models tried from cheapest to strongest, overrides `model`.
+            inline_digests (bool): show the digests of the commits with each batch.
+            session_token_budget (int | None): maximum number of tokens of each session.
         """
         logger.info("Initializing OpenAI client...")
         term.log(Color.MAGENTA, "Initializing OpenAI client...")
-        self.agent = Agent(api_key)
+        self.agent = Agent(
+            api_key,
+            model,
+            batch_size,
+            client,
+            cascade,
+            inline_digests,
+            session_token_budget,
+        )
         logger.info("sucessfully connected to OpenAI")
         term.log(Color.GREEN, "sucessfully connected to OpenAI")
 
@@ -49,6 +80,10 @@ class GitAnchor:
         source_type: GitSourceType = GitSourceType.REMOTE,
         api_key: str = "",
         metrics: Metrics | None = None,
+        clone_filter: str | None = None,
+        cascade: Cascade | None = None,
+        inline_digests: bool = False,
+        session_token_budget: int | None = None,
     ):
         """Initialize the GitAnchor instance.
         Args:
@@ -58,16 +93,26 @@ class GitAnchor:
             source_type (GitSourceType): The type of git source (remote or local).
             when using local, the git_repo_source should be a path to the local directory.
             when using remote, the git_repo_source should be a url to the remote repository.
+            clone_filter (str | None): object filter of remote clones (e.g. "blob:none").
+            cascade (Cascade | None): models tried from cheapest to strongest.
+            inline_digests (bool): show the digests of the commits with each batch.
+            session_token_budget (int | None): maximum number of tokens of each session.
         """
         logger.info("Initializing data Extractor...")
         term.log(Color.MAGENTA, "Initializing data Extractor...")
         extractor = Extractor.new_for_issue(
-            issue_url, git_repo_source, source_type, metrics
+            issue_url, git_repo_source, source_type, metrics, clone_filter
         )
         logger.info("data source setup completed successfully")
         term.log(Color.GREEN, "data source setup completed successfully")
 
-        return cls(extractor, api_key)
+        return cls(
+            extractor,
+            api_key,
+            cascade=cascade,
+            inline_digests=inline_digests,
+            session_token_budget=session_token_budget,
+        )
 
     def register_tools(self, tools: List[type[BaseModel]]):
         """Register tools for the agent.
@@ -78,16 +123,112 @@ class GitAnchor:
             they also should implement that takes Anchor as the only argument."""
         self.tools.extend([openai.pydantic_function_tool(tool) for tool in tools])
 
-    def find_link(self) -> Tuple[str, int]:
-        """Find the commit(s) that resolve(s) the issue."""
+    def find_link(
+        self,
+        speculative: bool = False,
+        token_budget: int | None = None,
+        run_budget: TokenBudget | None = None,
+    ) -> Tuple[str, int]:
+        """Find the commit(s) that resolve(s) the issue.
+        Args:
+            speculative (bool): explore parts of the issue lifespan in concurrent sessions.
+            token_budget (int | None): maximum number of tokens of all sessions.
+            run_budget (TokenBudget | None): tokens shared with the other issues of a run.
+        """
         issue_title = self.extractor.issue_wrapper.issue_title()
-        for _ in range(0, MAX_TRIES - 1):
-            try:
-                result, tokens = self.agent.find_link(
-                    issue_title, self.tools, self.extractor
+        budget = TokenBudget(token_budget, parent=run_budget)
+        with trace.span("find_link", "session", issue=issue_title):
+            if speculative:
+                return self.find_link_speculative(issue_title, budget)
+            for _ in range(0, MAX_TRIES - 1):
+                try:
+                    result, tokens = self.agent.find_link(
+                        issue_title, self.tools, self.extractor, budget=budget
+                    )
+                    return result, tokens
+                except Exception as e:
+                    logger.error(f"Error finding link: {e}")
+            else: # Finaly found a way to use for-else!
+                return self.agent.find_link(
+                    issue_title, self.tools, self.extractor, budget=budget
                 )
-                return result, tokens
-            except Exception as e:
-                logger.error(f"Error finding link: {e}")
-        else: # Finaly found a way to use for-else!
-            return self.agent.find_link(issue_title, self.tools, self.extractor)
+
+    def find_link_speculative(
+        self, issue_title: str, budget: TokenBudget
+    ) -> Tuple[str, int]:
+        """
+        Run one session per window of `Extractor.commit_windows` concurrently.
+        The first session finishing with a commit of the repository cancels the
+        others, the agent of the winning session replaces `self.agent`.
+        Returns the result of the first window if no session found a commit.
+        """
+        windows = self.extractor.commit_windows()
+        agents = [self.agent] + [
+            Agent(
+                model=self.agent.model,
+                batch_size=self.agent.batch_size,
+                client=self.agent.client,
+                cascade=self.agent.cascade,
+                inline_digests=self.agent.inline_digests,
+                session_token_budget=self.agent.session_token_budget,
+            )
+            for _ in windows[1:]
+        ]
+        cancel = threading.Event()
+
+        def run(
+            agent: Agent,
+            window: Callable[[int], Iterator[List[CommitMeta]]],
+            extractor: Extractor,
+        ) -> Tuple[str, int]:
+            name = getattr(window, "__name__", "window")
+            with trace.span(name, "session"):
+                try:
+                    return agent.find_link(
+                        issue_title,
+                        self.tools,
+                        extractor,
+                        window,
+                        cancel,
+                        budget,
+                    )
+                except StopIteration:
+                    return (f"no commits in {name}", 0)
+                except Exception as e:
+                    logger.error(f"Error finding link in {name}: {e}")
+                    return (f"encountered the following error: {e}", 0)
+
+        # created here rather than in the sessions, so that they all share the
+        # same lock of the code wrapper
+        extractors = [self.extractor.concurrent() for _ in windows]
+        pool = ThreadPoolExecutor(
+            max_workers=len(windows), thread_name_prefix="speculative"
+        )
+        futures = {
+            pool.submit(run, agent, window, extractor): i
+            for i, (agent, window, extractor) in enumerate(
+                zip(agents, windows, extractors)
+            )
+        }
+        results: List[Tuple[str, int]] = [("", 0)] * len(windows)
+        winner = 0
+        try:
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                if self.extractor.has_commit(results[i][0]):
+                    logger.info(f"session {i} found {results[i][0]}")
+                    cancel.set()
+                    winner = i
+                    break
+        finally:
+            # the other sessions stop at their next turn, no need to wait for them
+            cancel.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+            # executions of the cancelled sessions after this point are not recorded
+            if self.extractor.metrics:
+                for extractor in extractors:
+                    self.extractor.metrics.merge(extractor.metrics)
+
+        self.agent = agents[winner]
+        return (results[winner][0], budget.spent)
@@ -0,0 +1,57 @@
+import threading
+
+from pydantic import BaseModel
+
+
+class TokenBudget:
+    """
+    Tokens spent by sessions running concurrently, capped by a shared limit.
+    Budgets can be nested, e.g. a session within an issue within a run: tokens
+    spent on a budget are spent on its parent as well, and a budget is exhausted
+    as soon as one of its ancestors is.
+    """
+
+    def __init__(self, limit: int | None = None, parent: "TokenBudget | None" = None):
+        """
+        Args:
+            limit (int | None): maximum number of tokens of all sessions, unlimited if not given.
+            parent (TokenBudget | None): budget the tokens are spent on as well.
+        """
+        self.limit = limit
+        self.parent = parent
+        self.spent = 0
+        self.lock = threading.Lock()
+
+    def spend(self, tokens: int):
+        with self.lock:
+            self.spent += tokens
+        if self.parent is not None:
+            self.parent.spend(tokens)
+
+    @property
+    def exhausted(self) -> bool:
+        if self.limit is not None and self.spent >= self.limit:
+            return True
+        return self.parent is not None and self.parent.exhausted
+
+    @property
+    def remaining(self) -> int | None:
+        remaining = None if self.limit is None else max(0, self.limit - self.spent)
+        inherited = None if self.parent is None else self.parent.remaining
+        if remaining is None or inherited is None:
+            return inherited if remaining is None else remaining
+        return min(remaining, inherited)
+
+
+class IterationUsage(BaseModel):
+    """Tokens of a request of a session, estimated before sending it and reported by the API"""
+
+    model: str
+    estimated_prompt_tokens: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # prompt tokens served from the prompt cache of the API
+    cached_tokens: int = 0
+    batch_size: int = 0
+    # old tool results were compacted before the request
+    compacted: bool = False
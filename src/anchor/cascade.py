@@ -0,0 +1,69 @@
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class Tier(BaseModel):
+    """A model of the cascade and the signals escalating a session to the next tier"""
+
+    model: str = Field(..., description="OpenAI model used on this tier")
+    max_iterations: int | None = Field(
+        None, description="escalate after this many iterations on the tier"
+    )
+    max_next: int | None = Field(
+        None, description="escalate after this many Next calls on the tier"
+    )
+    escalate_on_give_up: bool = Field(
+        True, description="escalate instead of giving up when the model calls GiveUp"
+    )
+
+
+class Cascade(BaseModel):
+    """
+    Models tried one after the other, from the cheapest to the strongest.
+    A session starts on the first tier and escalates when a tier's signal fires.
+    """
+
+    tiers: List[Tier] = Field(..., min_length=1)
+    keep_context: bool = Field(
+        True,
+        description="continue the conversation of the previous tier instead of starting over",
+    )
+
+    @classmethod
+    def single(cls, model: str) -> "Cascade":
+        return cls(tiers=[Tier(model=model)])
+
+    @classmethod
+    def parse(cls, spec: str) -> "Cascade":
+        """
+        Parse a cascade from a comma separated list of `model[:max_iterations[:max_next]]`,
+        e.g. `gpt-4o-mini:10:3,gpt-4o`.
+        """
+        tiers = []
+        for part in spec.split(","):
+            model, *limits = part.strip().split(":")
+            if len(limits) > 2:
+                raise ValueError(f"malformed tier: {part}")
+            values = [int(limit) if limit else None for limit in limits]
+            values += [None] * (2 - len(values))
+            tiers.append(
+                Tier(model=model, max_iterations=values[0], max_next=values[1])
+            )
+        return cls(tiers=tiers)
+
+
+class TierUsage(BaseModel):
+    """Usage of a tier during a session"""
+
+    model: str
+    calls: int = 0
+    tokens: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # prompt tokens served from the prompt cache of the API
+    cached_tokens: int = 0
+    seconds: float = 0.0
+    next_calls: int = 0
+    # signal that escalated the session to the next tier, empty if it did not
+    escalation: str = ""
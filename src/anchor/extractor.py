@@ -1,15 +1,26 @@
-from typing import Any, List, Iterator, Tuple
+from typing import Any, Callable, Dict, List, Iterator, Tuple
 from enum import Enum
+import logging
+import os
+import re
+import sys
+import threading
+import time
 from dateutil.parser import parse as date_parse
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 from git_wrapper import Branchless as GitWrapper, CommitMeta, Pagination
-from code_wrapper import Wrapper as CodeWrapper
+from code_wrapper import CommitDigest, Wrapper as CodeWrapper
 
 from src import issue_wrapper
 from src.issue_wrapper import Wrapper as IssueWrapper
+from src.issue_wrapper import IssueFetcher
+from src.issue_wrapper.wrapper import Pagination as IssuePagination
 from src.anchor.metrics import Metrics
+from src.anchor.identity import IdentityIndex
+from src import trace
 
+logger = logging.getLogger(__name__)
 
 class GitSourceType(Enum):
     """Enum for Git source types."""
@@ -18,6 +29,40 @@ class GitSourceType(Enum):
     LOCAL = "local"
 
 
+# when set, CommitsOnFile does not follow renames, which saves fetching blobs on
+# partial clones but stops the history of a file at its last rename
+SKIP_RENAMES_ENV = "GIT_ANCHOR_SKIP_RENAMES"
+
+# interval covering the whole history of a repository
+ALL_TIME = ("1970-01-01 00:00:00 +0000", "9999-12-31 23:59:59 +0000")
+
+
+class Serialized:
+    """
+    Proxy running the methods of a wrapper one at a time.
+    The code wrapper checks commits out in its work tree, so concurrent
+    sessions on the same repository must not interleave its calls.
+    """
+
+    # methods that only read the object store of the repository
+    CONCURRENT = {"commit_digest", "commit_digests", "fetch_many"}
+
+    def __init__(self, wrapper: Any):
+        self.wrapper = wrapper
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.wrapper, name)
+        if not callable(attr) or name in self.CONCURRENT:
+            return attr
+
+        def call(*args, **kwargs):
+            with self.lock:
+                return attr(*args, **kwargs)
+
+        return call
+
+
 class Extractor:
     def __init__(
         self,
@@ -36,6 +81,7 @@ class Extractor:
         self.git_wrapper = git_wrapper
         self.code_wrapper = code_wrapper
         self.metrics = metrics
+        self.identities: IdentityIndex | None = None
 
     @classmethod
     def new_for_issue(
@@ -44,6 +90,7 @@ class Extractor:
         git_repo_source: str,
         source_type: GitSourceType = GitSourceType.REMOTE,
         metrics: Metrics | None = None,
+        clone_filter: str | None = None,
     ):
         """Initialize the Data Extractor instance for the given issue, git repo pair.
         Args:
@@ -52,20 +99,17 @@ class Extractor:
             source_type (GitSourceType): The type of git source (remote or local).
             when using local, the git_repo_source should be a path to the local directory.
             when using remote, the git_repo_source should be a url to the remote repository.
+            clone_filter (str | None): object filter of remote clones (e.g. "blob:none"),
+            blobs filtered out are fetched when a tool needs them. full clone if not given.
         """
-        if source_type == GitSourceType.LOCAL:
-            git_wrapper = GitWrapper.from_local(git_repo_source)
-            code_wrapper = CodeWrapper.from_local(git_repo_source)
-        elif source_type == GitSourceType.REMOTE:
-            git_wrapper = GitWrapper(git_repo_source)
-            code_wrapper = CodeWrapper(git_repo_source)
-
-        return cls(
-            issue_wrapper.wrapper_for(issue_url),
-            git_wrapper,
-            code_wrapper,
-            metrics,
-        )
+        with trace.span("extractor", "setup", repo=git_repo_source, issue=issue_url):
+            extractor = cls.new_for_repo(
+                git_repo_source, source_type, metrics, clone_filter
+            )
+            with trace.span("issue_wrapper", "setup"):
+                fetcher = IssueFetcher(metrics=metrics) if metrics else None
+                extractor.issue_wrapper = issue_wrapper.wrapper_for(issue_url, fetcher)
+        return extractor
 
     @classmethod
     def new_for_repo(
@@ -73,6 +117,7 @@ class Extractor:
         git_repo_source: str,
         source_type: GitSourceType = GitSourceType.REMOTE,
         metrics: Metrics | None = None,
+        clone_filter: str | None = None,
     ):
         """Initialize the Data Extractor instance for the given issue, git repo.
         Args:
@@ -81,13 +126,21 @@ class Extractor:
             source_type (GitSourceType): The type of git source (remote or local).
             when using local, the git_repo_source should be a path to the local directory.
             when using remote, the git_repo_source should be a url to the remote repository.
+            clone_filter (str | None): object filter of remote clones (e.g. "blob:none"),
+            blobs filtered out are fetched when a tool needs them. full clone if not given.
         """
-        if source_type == GitSourceType.LOCAL:
-            git_wrapper = GitWrapper.from_local(git_repo_source)
-            code_wrapper = CodeWrapper.from_local(git_repo_source)
-        elif source_type == GitSourceType.REMOTE:
-            git_wrapper = GitWrapper(git_repo_source)
-            code_wrapper = CodeWrapper(git_repo_source)
+        with trace.span("git_wrapper", "setup", repo=git_repo_source):
+            if source_type == GitSourceType.LOCAL:
+                git_wrapper = GitWrapper.from_local(git_repo_source)
+            elif source_type == GitSourceType.REMOTE:
+                git_wrapper = GitWrapper(git_repo_source, clone_filter)
+            if os.environ.get(SKIP_RENAMES_ENV):
+                git_wrapper.set_follow_renames(False)
+        with trace.span("code_wrapper", "setup", repo=git_repo_source):
+            if source_type == GitSourceType.LOCAL:
+                code_wrapper = CodeWrapper.from_local(git_repo_source)
+            elif source_type == GitSourceType.REMOTE:
+                code_wrapper = CodeWrapper(git_repo_source, clone_filter)
 
         return cls(None, git_wrapper, code_wrapper, metrics=metrics)
 
@@ -95,19 +148,194 @@ class Extractor:
         """Deligate to underlying wrappers if avilable."""
         for wrapper in [self.git_wrapper, self.issue_wrapper, self.code_wrapper]:
             if hasattr(wrapper, name):
-                if self.metrics:
-                    self.metrics.call(name)
-                return getattr(wrapper, name)
+                attr = getattr(wrapper, name)
+                if wrapper is self.issue_wrapper or not callable(attr):
+                    return attr
+                if self.metrics or trace.enabled():
+                    cat = "git" if wrapper is self.git_wrapper else "code"
+                    return self.timed(attr, f"{cat}.{name}", cat)
+                return attr
 
-    def commit_iterator(self) -> Iterator[List[CommitMeta]]:
+    def timed(
+        self, method: Callable[..., Any], name: str, cat: str
+    ) -> Callable[..., Any]:
+        """Account the time spent in a git or code wrapper method to the metrics and trace."""
+        metrics = self.metrics
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                with trace.span(name, cat):
+                    return method(*args, **kwargs)
+            finally:
+                if metrics:
+                    metrics.rust_call(time.perf_counter() - start)
+
+        return call
+
+    def commit_iterator(self, batch_size: int = 100) -> Iterator[List[CommitMeta]]:
         (start, end) = self.issue_lifespan_safe()
-        commits: List[CommitMeta] = self.git_wrapper.commits_between(
-            start, end, Pagination.all()
+        # long lived issues were probably resolved shortly after they were created
+        oldest_first = (date_parse(end) - date_parse(start)).days > 365
+        yield from self.git_wrapper.commit_cursor(start, end, batch_size, oldest_first)
+
+    def prefetch_digests(
+        self, batches: Iterator[List[CommitMeta]]
+    ) -> Iterator[List[CommitMeta]]:
+        """
+        Batches of commits, the digests of the next batch being computed in the
+        background while the current one is explored.
+        """
+
+        def digest(commits: List[CommitMeta]):
+            try:
+                self.commit_digests([c.hash for c in commits])
+            except Exception as e:
+                logger.warning(f"failed to prefetch commit digests: {e}")
+
+        upcoming = next(batches, None)
+        while upcoming is not None:
+            current, upcoming = upcoming, next(batches, None)
+            if upcoming:
+                threading.Thread(
+                    target=digest, args=(upcoming,), name="digests", daemon=True
+                ).start()
+            yield current
+
+    def batch_digests(self, commits: List[CommitMeta]) -> List[CommitDigest] | None:
+        """digests of a batch of commits, None if they can not be computed"""
+        try:
+            return self.commit_digests([c.hash for c in commits])
+        except Exception as e:
+            logger.warning(f"failed to digest commits: {e}")
+            return None
+
+    def commit_windows(self) -> List[Callable[[int], Iterator[List[CommitMeta]]]]:
+        """
+        Split the issue lifespan for sessions exploring it concurrently: forward from
+        the creation date, backward from the close date, and the commits whose message
+        best matches the issue.
+        """
+        return [self.early_commits, self.late_commits, self.ranked_commits]
+
+    def lifespan_middle(self) -> Tuple[str, str]:
+        """end of the first half and start of the second half of the issue lifespan"""
+        (start, end) = self.issue_lifespan_safe()
+        start_date, end_date = date_parse(start), date_parse(end)
+        middle = start_date + (end_date - start_date) / 2
+        return (
+            middle.strftime("%Y-%m-%d %H:%M:%S %z"),
+            (middle + timedelta(seconds=1)).strftime("%Y-%m-%d %H:%M:%S %z"),
         )
-        if (date_parse(end) - date_parse(start)).days > 365:
-            commits.reverse()
-        for i in range(0, len(commits), 100):
-            yield commits[i : i + 100]
+
+    def early_commits(self, batch_size: int = 100) -> Iterator[List[CommitMeta]]:
+        """first half of the issue lifespan, from the creation date"""
+        (start, _) = self.issue_lifespan_safe()
+        (first_half, _) = self.lifespan_middle()
+        yield from self.git_wrapper.commit_cursor(start, first_half, batch_size, True)
+
+    def late_commits(self, batch_size: int = 100) -> Iterator[List[CommitMeta]]:
+        """second half of the issue lifespan, from the close date"""
+        (_, end) = self.issue_lifespan_safe()
+        (_, second_half) = self.lifespan_middle()
+        yield from self.git_wrapper.commit_cursor(second_half, end, batch_size, False)
+
+    def ranked_commits(self, batch_size: int = 100) -> Iterator[List[CommitMeta]]:
+        """
+        Commits of the issue lifespan mentioning the issue key or words of its title,
+        the ones mentioning most of them first.
+        """
+        (start, end) = self.issue_lifespan_safe()
+        key = self.issue_key_pattern()
+        # short words such as "a" or "in" match almost every commit
+        title = self.issue_wrapper.issue_title().lower()
+        words = {w for w in re.findall(r"\w+", title) if len(w) > 3}
+
+        def score(commit: CommitMeta) -> int:
+            message = commit.message.lower()
+            mentions_key = key.search(commit.message) is not None
+            return 10 * mentions_key + sum(w in message for w in words)
+
+        commits = self.git_wrapper.commits_between(start, end, Pagination.all())
+        scored = [(score(c), i, c) for i, c in enumerate(commits)]
+        ranked = [c for s, _, c in sorted(scored, key=lambda x: (-x[0], x[1])) if s > 0]
+        for i in range(0, len(ranked), batch_size):
+            yield ranked[i : i + batch_size]
+
+    def issue_key_pattern(self) -> re.Pattern:
+        """matches the issue key as a whole word, not as a prefix of another key"""
+        issue_key = re.escape(self.issue_wrapper.issue_key())
+        return re.compile(rf"(?<![\w-]){issue_key}(?!\w)")
+
+    def participant_activity(self) -> Dict[str, List[datetime]]:
+        """times each participant opened or commented on the issue"""
+        activity = {
+            self.issue_wrapper.issue_author(): [self.issue_wrapper.issue_created_at()]
+        }
+        comments = self.issue_wrapper.issue_comments(
+            IssuePagination(offset=0, limit=sys.maxsize)
+        )
+        for comment in comments:
+            activity.setdefault(comment.author, []).append(
+                date_parse(comment.created_at)
+            )
+        return activity
+
+    def concurrent(self) -> "Extractor":
+        """
+        extractor of the same issue and repository to use from another thread.
+        Call it from the thread owning this extractor: it wraps the code wrapper
+        in `Serialized` the first time without a lock. Its tool executions are
+        recorded apart, see `Metrics.concurrent`.
+        """
+        code_wrapper = self.code_wrapper
+        if not isinstance(code_wrapper, Serialized):
+            code_wrapper = Serialized(code_wrapper)
+            self.code_wrapper = code_wrapper
+        metrics = self.metrics.concurrent() if self.metrics else None
+        extractor = Extractor(self.issue_wrapper, self.git_wrapper, code_wrapper, metrics)
+        extractor.identities = self.identities
+        return extractor
+
+    def with_issue(self, issue_url: str, metrics: Metrics | None = None) -> "Extractor":
+        """Create an extractor for an issue of the same repository, sharing the git and code wrappers.
+        Args:
+            issue_url (str): The link to the issue in GitHub or Jira.
+            metrics (Metrics | None): metrics of the new extractor.
+        """
+        fetcher = IssueFetcher(metrics=metrics) if metrics else None
+        extractor = Extractor(
+            issue_wrapper.wrapper_for(issue_url, fetcher),
+            self.git_wrapper,
+            self.code_wrapper,
+            metrics,
+        )
+        extractor.identities = self.identities
+        return extractor
+
+    def fetch(self) -> int:
+        """
+        Fetch and index new commits of the repository, the git wrapper keeps serving
+        the previous ones until it is refreshed. Returns the number of commits added.
+        """
+        added = self.git_wrapper.fetch()
+        self.code_wrapper.refresh()
+        return added
+
+    def refresh(self) -> int:
+        """Fetch new commits of the repository. Returns the number of commits added."""
+        added = self.fetch()
+        self.git_wrapper.refresh()
+        self.identities = None
+        return added
+
+    def identity_index(self) -> IdentityIndex:
+        """Index of all git identities of the repository, built on first use."""
+        if self.identities is None:
+            self.identities = IdentityIndex(
+                self.git_wrapper.list_authors(ALL_TIME)
+            )
+        return self.identities
 
     def issue_lifespan_safe(self) -> Tuple[str, str]:
         start_date = self.issue_wrapper.issue_created_at()
@@ -0,0 +1,231 @@
+# resolution of issue tracker identities (GitHub logins, Jira display names)
+# to the git identities of a repository
+
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Set, Tuple
+
+from dateutil.parser import parse as date_parse
+from pydantic import BaseModel
+
+from git_wrapper import Author, CommitMeta
+
+# scores of the ways a participant can match a git identity, the best one wins
+EXACT_NAME = 1.0
+EMAIL_LOCAL_PART = 0.9
+NAME_TOKENS = 0.8
+INITIALS = 0.6
+CO_OCCURRENCE = 0.5
+PARTIAL = 0.4
+
+# shortest normalized participant that is matched partially
+MIN_PARTIAL_LENGTH = 4
+# most people a partial or co-occurrence match may resolve to, above that the
+# match says nothing about the participant
+MAX_AMBIGUOUS_CLUSTERS = 3
+# commits this close to an activity of a participant co-occur with it
+CO_OCCURRENCE_WINDOW = timedelta(hours=6)
+
+
+def normalize(text: str) -> str:
+    """lowercase `text` and strip accents and everything but letters and digits"""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+def tokens(text: str) -> List[str]:
+    """normalized words of a name, e.g. "Doe, John" -> ["doe", "john"]"""
+    words = re.split(r"[\s._\-,+]+", text)
+    return [w for w in (normalize(w) for w in words) if w]
+
+
+def email_local_part(email: str) -> str:
+    local = email.split("@")[0]
+    if email.endswith("users.noreply.github.com"):
+        # <id>+<login>@users.noreply.github.com
+        return local.split("+")[-1]
+    # drop the +suffix of subaddresses
+    return local.split("+")[0]
+
+
+class Identity(BaseModel):
+    """git identities of an issue participant"""
+
+    participant: str
+    authors: List[str]
+    score: float
+
+
+class IdentityIndex:
+    """
+    Matches issue tracker identities to the git authors of a repository, by
+    name and email local part first, then by co-occurrence: the authors
+    committing around the times the participant was active on the issue.
+
+    Git authors sharing an email are the same person committing under several
+    names, so they are clustered and a participant is resolved to every
+    identity of the cluster it matches. Names alone are not clustered, `root`
+    or two John Smiths are different people.
+    """
+
+    def __init__(self, authors: Iterable[Author]):
+        unique = {(a.name, a.email): a for a in authors}
+        self.authors: List[Author] = [unique[key] for key in sorted(unique)]
+        self.clusters: List[int] = self.cluster(self.authors)
+        self.positions = {(a.name, a.email): i for i, a in enumerate(self.authors)}
+
+        # lookup tables from normalized keys to author positions
+        self.by_name: Dict[str, Set[int]] = {}
+        self.by_local_part: Dict[str, Set[int]] = {}
+        self.by_tokens: Dict[Tuple[str, ...], Set[int]] = {}
+        self.by_initials: Dict[str, Set[int]] = {}
+        for i, author in enumerate(self.authors):
+            self.by_name.setdefault(normalize(author.name), set()).add(i)
+            local = normalize(email_local_part(author.email))
+            if local:
+                self.by_local_part.setdefault(local, set()).add(i)
+            words = tokens(author.name)
+            if words:
+                self.by_tokens.setdefault(tuple(sorted(words)), set()).add(i)
+            if len(words) > 1:
+                # jdoe and doej for John Doe
+                self.by_initials.setdefault(words[0][0] + words[-1], set()).add(i)
+                self.by_initials.setdefault(words[-1] + words[0][0], set()).add(i)
+
+    @staticmethod
+    def cluster(authors: List[Author]) -> List[int]:
+        """cluster of each author, authors sharing an email share a cluster"""
+        parent = list(range(len(authors)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        first: Dict[str, int] = {}
+        for i, author in enumerate(authors):
+            email = author.email.lower()
+            if not email:
+                continue
+            if email in first:
+                parent[find(i)] = find(first[email])
+            else:
+                first[email] = i
+        return [find(i) for i in range(len(authors))]
+
+    def ambiguous(self, matches: Set[int]) -> bool:
+        return len({self.clusters[i] for i in matches}) > MAX_AMBIGUOUS_CLUSTERS
+
+    def co_occurring(
+        self, activity: List[datetime], commits: List[CommitMeta]
+    ) -> Set[int]:
+        """
+        Authors of the commits made within `CO_OCCURRENCE_WINDOW` of the most
+        activities of the participant, e.g. a fix pushed shortly before a comment
+        saying it is fixed.
+        Args:
+            activity (List[datetime]): when the participant opened or commented on
+            the issue.
+            commits (List[CommitMeta]): commits to look the authors up in.
+        """
+        dated = [(date_parse(c.date), c.author) for c in commits]
+        counts: Dict[int, int] = {}
+        for time in activity:
+            near = {
+                self.clusters[self.positions[(author.name, author.email)]]
+                for date, author in dated
+                if abs(date - time) <= CO_OCCURRENCE_WINDOW
+                and (author.name, author.email) in self.positions
+            }
+            for cluster in near:
+                counts[cluster] = counts.get(cluster, 0) + 1
+        if not counts:
+            return set()
+        best = max(counts.values())
+        clusters = {cluster for cluster, count in counts.items() if count == best}
+        if len(clusters) > MAX_AMBIGUOUS_CLUSTERS:
+            return set()
+        return {i for i, cluster in enumerate(self.clusters) if cluster in clusters}
+
+    def candidates(
+        self,
+        participant: str,
+        activity: List[datetime] | None = None,
+        commits: List[CommitMeta] | None = None,
+    ) -> Tuple[float, Set[int]]:
+        """
+        best score and the authors matching the participant with it, see `matched`
+        """
+        key = normalize(participant)
+        if not key:
+            return 0.0, set()
+        if key in self.by_name:
+            return EXACT_NAME, self.by_name[key]
+        if key in self.by_local_part:
+            return EMAIL_LOCAL_PART, self.by_local_part[key]
+        words = tuple(sorted(tokens(participant)))
+        if words in self.by_tokens:
+            return NAME_TOKENS, self.by_tokens[words]
+        if key in self.by_initials:
+            return INITIALS, self.by_initials[key]
+        if activity and commits:
+            matches = self.co_occurring(activity, commits)
+            if matches:
+                return CO_OCCURRENCE, matches
+        if len(key) >= MIN_PARTIAL_LENGTH:
+            matches = {
+                i
+                for i, author in enumerate(self.authors)
+                if key in normalize(author.name)
+                or key in normalize(email_local_part(author.email))
+            }
+            if matches and not self.ambiguous(matches):
+                return PARTIAL, matches
+        return 0.0, set()
+
+    def matched(
+        self,
+        participant: str,
+        activity: List[datetime] | None = None,
+        commits: List[CommitMeta] | None = None,
+    ) -> Tuple[float, List[Author]]:
+        """
+        score of the participant's match and all identities of the matched clusters.
+        Args:
+            participant (str): GitHub login or Jira display name.
+            activity (List[datetime] | None): when the participant was active on the
+            issue, matched against the dates of `commits` if no name matches.
+            commits (List[CommitMeta] | None): commits around the issue.
+        """
+        score, matches = self.candidates(participant, activity, commits)
+        clusters = {self.clusters[i] for i in matches}
+        authors = [
+            a for i, a in enumerate(self.authors) if self.clusters[i] in clusters
+        ]
+        return score, authors
+
+    def resolve(
+        self,
+        participant: str,
+        activity: List[datetime] | None = None,
+        commits: List[CommitMeta] | None = None,
+    ) -> Identity:
+        """
+        Resolve an issue participant to git identities, see `matched`.
+
+        Args:
+            participant (str): GitHub login or Jira display name.
+        """
+        score, authors = self.matched(participant, activity, commits)
+        return self.identity(participant, score, authors)
+
+    @staticmethod
+    def identity(participant: str, score: float, authors: List[Author]) -> Identity:
+        return Identity(
+            participant=participant,
+            authors=[f"{a.name} <{a.email}>" for a in authors],
+            score=score,
+        )
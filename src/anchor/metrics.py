@@ -1,7 +1,14 @@
 import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any
 
+import numpy as np
 from pydantic import BaseModel
 
+from src.anchor.tokens import estimate_tokens
+
 
 class Pattern(BaseModel):
     tools: list[str]
@@ -13,21 +20,62 @@ class Pattern(BaseModel):
         return f"{self.tools}"
 
 
+class ToolExecution(BaseModel):
+    """A single execution of a tool by the agent"""
+
+    tool: str
+    wall_s: float
+    rust_s: float
+    bytes: int
+    tokens: int
+    error: bool = False
+
+
 class Metrics:
-    def __init__(self):
+    def __init__(self, parent: "Metrics | None" = None):
+        """
+        Args:
+            parent (Metrics | None): metrics the API calls are counted on, see `concurrent`.
+        """
+        self.parent = parent
         self.patterns: dict[Pattern, int] = {}
         self.tools: dict[str, int] = {}
+        self.api_calls: dict[str, int] = {}
         self.current_pattern: Pattern = Pattern(tools=[])
+        # tool executions of the current session and of all flushed sessions
+        self.current_executions: list[ToolExecution] = []
+        self.sessions: list[list[ToolExecution]] = []
+        # time spent in the git and code wrappers by each thread, see `rust_call`
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def concurrent(self) -> "Metrics":
+        """
+        Metrics of a session running concurrently with others on these metrics.
+        Its tool executions are kept apart until they are merged back with
+        `merge`, its API calls are counted on these metrics right away.
+        """
+        return Metrics(parent=self)
+
+    def merge(self, session: "Metrics"):
+        """ Add the tool executions of a concurrent session to the current ones"""
+        with self.lock:
+            self.current_pattern.tools.extend(session.current_pattern.tools)
+            self.current_executions.extend(session.current_executions)
 
     def reset(self):
         """ Reset the current pattern without flushing it for metric aggregation"""
         self.current_pattern = Pattern(tools=[])
+        self.current_executions = []
 
     def drop(self):
         """ Drop all metrics"""
         self.current_pattern = Pattern(tools=[])
         self.patterns = {}
         self.tools = {}
+        self.api_calls = {}
+        self.current_executions = []
+        self.sessions = []
 
     def flush(self):
         """ Flush the current pattern and aggregate metrics"""
@@ -42,17 +90,102 @@ class Metrics:
             self.patterns[key] = 0
         self.patterns[key] += 1
 
+        self.sessions.append(self.current_executions)
         self.reset()
 
     def call(self, tool: str):
         self.current_pattern.tools.append(tool)
 
+    def rust_call(self, seconds: float):
+        """
+        Account time spent in a call to the git or code wrapper to the calling
+        thread, so that calls made in the background or by other sessions are
+        not credited to the tool running on this one.
+        """
+        self.local.rust_s = self.thread_rust_s() + seconds
+
+    def thread_rust_s(self) -> float:
+        return getattr(self.local, "rust_s", 0.0)
+
+    @contextmanager
+    def tool(self, name: str):
+        """
+        Measure the execution of a tool. The body should set `result` on the
+        yielded dict to the content the tool adds to the conversation.
+        """
+        execution: dict[str, Any] = {"result": "", "error": False}
+        rust_before = self.thread_rust_s()
+        start = time.perf_counter()
+        try:
+            yield execution
+        except Exception:
+            execution["error"] = True
+            raise
+        finally:
+            # the tool result is sent to the LLM as its string representation
+            content = f"{execution['result']}"
+            tool_execution = ToolExecution(
+                tool=name,
+                wall_s=time.perf_counter() - start,
+                rust_s=self.thread_rust_s() - rust_before,
+                bytes=len(content.encode("utf-8")),
+                tokens=estimate_tokens(content),
+                error=execution["error"],
+            )
+            with self.lock:
+                self.call(name)
+                self.current_executions.append(tool_execution)
+
+    def api_call(self, kind: str):
+        """ Count a request made to an external API such as GitHub or Jira"""
+        if self.parent is not None:
+            return self.parent.api_call(kind)
+        with self.lock:
+            if kind not in self.api_calls:
+                self.api_calls[kind] = 0
+            self.api_calls[kind] += 1
+
     def report_tools(self) -> dict[str, int]:
         return self.tools
 
     def report_patterns(self) -> dict[Pattern, int]:
         return self.patterns
 
+    def report_executions(self) -> dict[str, dict[str, float]]:
+        """ Aggregate the executions of all flushed sessions per tool"""
+        by_tool: dict[str, list[ToolExecution]] = {}
+        for session in self.sessions:
+            for execution in session:
+                by_tool.setdefault(execution.tool, []).append(execution)
+
+        report = {}
+        for tool, executions in sorted(by_tool.items()):
+            wall = np.array([e.wall_s for e in executions])
+            report[tool] = {
+                "count": len(executions),
+                "errors": sum(e.error for e in executions),
+                "wall_s": float(wall.sum()),
+                "wall_p50_s": float(np.percentile(wall, 50)),
+                "wall_p95_s": float(np.percentile(wall, 95)),
+                "rust_s": sum(e.rust_s for e in executions),
+                "bytes": sum(e.bytes for e in executions),
+                "tokens": sum(e.tokens for e in executions),
+            }
+        return report
+
+    def report_sessions(self) -> list[dict[str, float]]:
+        """ Totals of each flushed session"""
+        return [
+            {
+                "executions": len(session),
+                "wall_s": sum(e.wall_s for e in session),
+                "rust_s": sum(e.rust_s for e in session),
+                "bytes": sum(e.bytes for e in session),
+                "tokens": sum(e.tokens for e in session),
+            }
+            for session in self.sessions
+        ]
+
     def dump(self, dst: str):
         # dump the metrics to a file
         with open(dst, "w") as f:
@@ -63,7 +196,45 @@ class Metrics:
                         str(pattern): val for pattern, val in self.patterns.items()
                     },
                     "tools": self.tools,
+                    "api_calls": self.api_calls,
+                    "executions": self.report_executions(),
+                    "sessions": self.report_sessions(),
                 },
                 f,
                 indent=4,
             )
+
+    def openmetrics(self) -> str:
+        """ Render the run aggregates in the OpenMetrics text format"""
+        executions = self.report_executions()
+        families = [
+            ("tool_executions", "count", "tool executions"),
+            ("tool_errors", "errors", "tool executions that failed"),
+            ("tool_wall_seconds", "wall_s", "wall time of tool executions"),
+            ("tool_rust_seconds", "rust_s", "time spent in the git and code wrappers"),
+            ("tool_result_bytes", "bytes", "size of tool results"),
+            ("tool_result_tokens", "tokens", "estimated tokens of tool results"),
+        ]
+        lines = []
+        for name, key, help in families:
+            lines.append(f"# TYPE git_anchor_{name} counter")
+            lines.append(f"# HELP git_anchor_{name} {help}")
+            for tool, report in executions.items():
+                value = report[key]
+                lines.append(f'git_anchor_{name}_total{{tool="{tool}"}} {value}')
+
+        lines.append("# TYPE git_anchor_sessions counter")
+        lines.append("# HELP git_anchor_sessions flushed sessions")
+        lines.append(f"git_anchor_sessions_total {len(self.sessions)}")
+
+        lines.append("# TYPE git_anchor_api_calls counter")
+        lines.append("# HELP git_anchor_api_calls requests made to issue trackers")
+        for kind, count in sorted(self.api_calls.items()):
+            lines.append(f'git_anchor_api_calls_total{{kind="{kind}"}} {count}')
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def dump_openmetrics(self, dst: str):
+        with open(dst, "w") as f:
+            f.write(self.openmetrics())
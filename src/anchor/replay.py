@@ -0,0 +1,224 @@
+# record/replay of LLM completions, so the agent can run end to end without
+# a live OpenAI endpoint (e.g. to benchmark and profile the tool layer).
+#
+# completions are recorded per session (one `Agent.find_link` call) in
+# `<dir>/<session>.jsonl`, one line per turn. they can be replayed in process
+# or by a local OpenAI-compatible HTTP stub:
+#
+#   python -m src.anchor.replay <dir> --port 8642
+#   GIT_ANCHOR_REPLAY=http://localhost:8642/v1 python -m bench.ealink ...
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+import openai
+from openai import NotGiven, NOT_GIVEN
+from openai.types.chat import ChatCompletion, ParsedChatCompletion
+from openai.types.chat import ChatCompletionMessageParam as Message
+from openai.types.chat import ChatCompletionToolParam as Tool
+
+logger = logging.getLogger(__name__)
+
+# when set, completions are recorded into this directory
+RECORD_ENV = "GIT_ANCHOR_RECORD"
+# when set, completions are replayed from this directory, or from the HTTP stub at this URL
+REPLAY_ENV = "GIT_ANCHOR_REPLAY"
+
+# headers identifying the recorded completion requested from the HTTP stub
+SESSION_HEADER = "X-Git-Anchor-Session"
+TURN_HEADER = "X-Git-Anchor-Turn"
+
+
+def session_key(model: str, tools: List[Tool], messages: List[Message]) -> str:
+    """
+    Identify a session by everything that is sent on its first turn.
+    """
+    payload = {
+        "model": model,
+        "tools": [tool["function"]["name"] for tool in tools],
+        "messages": messages,
+    }
+    data = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def raw_completion(completion: ChatCompletion) -> Dict[str, Any]:
+    """
+    Dump a completion as returned by the API, without the fields added by parsing.
+    """
+    data = completion.model_dump(mode="json")
+    for choice in data.get("choices", []):
+        message = choice.get("message", {})
+        message.pop("parsed", None)
+        for tool_call in message.get("tool_calls") or []:
+            tool_call.get("function", {}).pop("parsed_arguments", None)
+    return data
+
+
+def parse_completion(
+    data: Dict[str, Any], tools: List[Tool] | NotGiven = NOT_GIVEN
+) -> ParsedChatCompletion:
+    """
+    Rebuild the parsed completion the client would have returned for a recorded completion.
+    """
+    # the parsing helper of the OpenAI client is not part of its public API
+    from openai.lib._parsing import parse_chat_completion
+
+    return parse_chat_completion(
+        response_format=NOT_GIVEN,
+        input_tools=tools,
+        chat_completion=ChatCompletion.model_validate(data),
+    )
+
+
+def is_url(source: str) -> bool:
+    return source.startswith("http://") or source.startswith("https://")
+
+
+def replaying() -> bool:
+    return bool(os.environ.get(REPLAY_ENV))
+
+
+class CompletionStore:
+    """
+    Directory of recorded sessions, one JSONL file per session.
+    If a turn is recorded more than once (e.g. a retried session), the latest record wins.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.sessions: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        self.lock = threading.Lock()
+
+    def path(self, session: str) -> str:
+        return os.path.join(self.directory, f"{session}.jsonl")
+
+    def append(self, session: str, turn: int, completion: Dict[str, Any]):
+        line = json.dumps({"turn": turn, "completion": completion})
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path(session), "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.sessions.pop(session, None)
+
+    def turns(self, session: str) -> Dict[int, Dict[str, Any]]:
+        with self.lock:
+            if session not in self.sessions:
+                turns = {}
+                if os.path.exists(self.path(session)):
+                    with open(self.path(session), encoding="utf-8") as f:
+                        for line in f:
+                            record = json.loads(line)
+                            turns[record["turn"]] = record["completion"]
+                self.sessions[session] = turns
+            return self.sessions[session]
+
+    def get(self, session: str, turn: int) -> Dict[str, Any]:
+        turns = self.turns(session)
+        if turn not in turns:
+            raise ValueError(
+                f"no recorded completion for session {session} turn {turn}"
+            )
+        return turns[turn]
+
+
+def record_store() -> CompletionStore | None:
+    """
+    Store completions are recorded into, if recording is enabled.
+    """
+    directory = os.environ.get(RECORD_ENV)
+    return CompletionStore(directory) if directory else None
+
+
+def replay_store() -> CompletionStore | None:
+    """
+    Store completions are replayed from in process, if in-process replay is enabled.
+    """
+    source = os.environ.get(REPLAY_ENV)
+    return CompletionStore(source) if source and not is_url(source) else None
+
+
+def openai_client(api_key: str = "") -> openai.OpenAI | None:
+    """
+    Create the OpenAI client, pointed at the HTTP stub when replaying from a URL.
+    Returns None when completions are replayed in process.
+    """
+    source = os.environ.get(REPLAY_ENV)
+    if source and is_url(source):
+        return openai.OpenAI(api_key=api_key or "replay", base_url=source)
+    if source:
+        return None
+    if api_key == "":
+        return openai.OpenAI()
+    return openai.OpenAI(api_key=api_key)
+
+
+def headers(session: str, turn: int) -> Dict[str, str] | None:
+    """
+    Headers sent along with a request, only needed by the HTTP stub.
+    """
+    if not is_url(os.environ.get(REPLAY_ENV, "")):
+        return None
+    return {SESSION_HEADER: session, TURN_HEADER: str(turn)}
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    store: CompletionStore
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            message = f"unknown path {self.path}"
+            return self.respond(404, {"error": {"message": message}})
+
+        session = self.headers.get(SESSION_HEADER)
+        turn = self.headers.get(TURN_HEADER)
+        if session is None or turn is None:
+            message = f"missing {SESSION_HEADER} or {TURN_HEADER} header"
+            return self.respond(400, {"error": {"message": message}})
+        try:
+            self.respond(200, self.store.get(session, int(turn)))
+        except ValueError as e:
+            self.respond(404, {"error": {"message": str(e)}})
+
+    def respond(self, status: int, body: Dict[str, Any]):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def serve(
+    directory: str, host: str = "127.0.0.1", port: int = 8642
+) -> ThreadingHTTPServer:
+    """
+    Create an OpenAI-compatible HTTP server replaying the sessions recorded in `directory`.
+    """
+    handler = type("Handler", (ReplayHandler,), {"store": CompletionStore(directory)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI replay stub")
+    parser.add_argument("directory", help="directory of recorded sessions")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8642)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = serve(args.directory, args.host, args.port)
+    logger.info(f"replaying {args.directory} on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
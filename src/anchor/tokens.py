@@ -0,0 +1,75 @@
+import json
+import math
+from functools import lru_cache
+from typing import Any, Iterable
+
+# average number of characters per token of English text and code for GPT-4o models
+CHARS_PER_TOKEN = 4
+# tokens added by the chat format around each message and before the reply
+MESSAGE_OVERHEAD = 3
+REPLY_OVERHEAD = 3
+
+
+@lru_cache(maxsize=1)
+def encoding():
+    """
+    The tokenizer of the GPT-4o models if tiktoken is installed, None otherwise.
+    """
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens `text` adds to a conversation.
+    Exact if tiktoken is installed, approximated from its length otherwise.
+    """
+    enc = encoding()
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(message: Any) -> int:
+    """
+    Estimate the number of tokens of a message of a conversation, either a message
+    param (a dict) or a message returned by the API along with its tool calls.
+    """
+    if isinstance(message, dict):
+        content, tool_calls = message.get("content"), message.get("tool_calls")
+    else:
+        content, tool_calls = message.content, message.tool_calls
+    tokens = MESSAGE_OVERHEAD + estimate_tokens(content or "")
+    for call in tool_calls or []:
+        function = call["function"] if isinstance(call, dict) else call.function
+        if isinstance(function, dict):
+            name, arguments = function["name"], function["arguments"]
+        else:
+            name, arguments = function.name, function.arguments
+        tokens += estimate_tokens(name) + estimate_tokens(arguments)
+    return tokens
+
+
+def estimate_request_tokens(messages: Iterable[Any], tools: Any = None) -> int:
+    """
+    Estimate the number of prompt tokens of a request sending `messages` and the
+    JSON schemas of `tools`, before sending it.
+    """
+    tokens = REPLY_OVERHEAD + sum(estimate_message_tokens(m) for m in messages)
+    if tools:
+        tokens += estimate_tokens(json.dumps(tools, sort_keys=True))
+    return tokens
+
+
+def truncate_tokens(text: str, tokens: int) -> str:
+    """The beginning of `text` of at most `tokens` tokens."""
+    enc = encoding()
+    if enc is not None:
+        encoded = enc.encode(text, disallowed_special=())
+        return text if len(encoded) <= tokens else enc.decode(encoded[:tokens])
+    return text[: tokens * CHARS_PER_TOKEN]
@@ -0,0 +1,358 @@
+use std::fmt::Display;
+use std::path::Path;
+
+use pyo3::pyclass;
+
+use crate::objects::{blob, git};
+use crate::ts::{Lang, Symbol};
+use crate::Result;
+
+/// Changes of a commit to a file.
+#[pyclass(str, get_all)]
+#[derive(Debug, Clone, PartialEq, Eq)]
+pub struct FileDigest {
+    pub path: String,
+    /// A(dded), M(odified), D(eleted) or R(enamed)
+    pub status: String,
+    pub additions: usize,
+    pub deletions: usize,
+    /// functions and types touched by the changes, named like the targets
+    /// of `fetch_definition`
+    pub symbols: Vec<String>,
+}
+
+/// Compact summary of a commit: the files it changes, the functions and
+/// types it touches and the number of changed lines.
+#[pyclass(str, get_all)]
+#[derive(Debug, Clone, PartialEq, Eq)]
+pub struct CommitDigest {
+    pub hash: String,
+    pub additions: usize,
+    pub deletions: usize,
+    pub files: Vec<FileDigest>,
+}
+
+impl Display for FileDigest {
+    fn fmt(&self, f: &mut std::fmt::Formatter<'_>) -> std::fmt::Result {
+        write!(
+            f,
+            "{} {} (+{} -{})",
+            self.status, self.path, self.additions, self.deletions
+        )?;
+        if !self.symbols.is_empty() {
+            write!(f, ": {}", self.symbols.join(", "))?;
+        }
+        Ok(())
+    }
+}
+
+impl Display for CommitDigest {
+    fn fmt(&self, f: &mut std::fmt::Formatter<'_>) -> std::fmt::Result {
+        write!(
+            f,
+            "{} +{} -{} in {} files",
+            self.hash,
+            self.additions,
+            self.deletions,
+            self.files.len()
+        )?;
+        for file in &self.files {
+            write!(f, "\n  {file}")?;
+        }
+        Ok(())
+    }
+}
+
+// changes of a file parsed from a diff, line ranges are 1-based and inclusive
+#[derive(Debug, Default, PartialEq, Eq)]
+struct FileChange {
+    old_path: Option<String>,
+    new_path: Option<String>,
+    renamed: bool,
+    added: Vec<(usize, usize)>,
+    removed: Vec<(usize, usize)>,
+    additions: usize,
+    deletions: usize,
+}
+
+impl FileChange {
+    fn status(&self) -> &'static str {
+        match (&self.old_path, &self.new_path) {
+            (None, _) => "A",
+            (_, None) => "D",
+            _ if self.renamed => "R",
+            _ => "M",
+        }
+    }
+}
+
+// `a/path` or `/dev/null` of the `---` and `+++` lines of a diff
+fn diff_path(path: &str) -> Option<String> {
+    // git appends a tab to paths containing spaces
+    let path = path.trim_end_matches('\t');
+    if path == "/dev/null" {
+        return None;
+    }
+    let path = path.trim_matches('"');
+    Some(path.split_once('/').map_or(path, |(_, p)| p).to_string())
+}
+
+// `-start[,count]` or `+start[,count]` of a hunk header
+fn hunk_range(range: &str) -> Option<(usize, usize)> {
+    let range = &range[1..];
+    let (start, count) = match range.split_once(',') {
+        Some((start, count)) => (start.parse().ok()?, count.parse().ok()?),
+        None => (range.parse().ok()?, 1),
+    };
+    Some((start, count))
+}
+
+// parses the changes of each file out of a diff without context lines
+fn parse_diff(diff: &str) -> Vec<FileChange> {
+    let mut changes: Vec<FileChange> = Vec::new();
+    // lines of the current hunk left to skip, on the old and the new side
+    let (mut old_left, mut new_left) = (0usize, 0usize);
+    for line in diff.lines() {
+        if old_left > 0 || new_left > 0 {
+            match line.as_bytes().first() {
+                Some(b'-') => old_left = old_left.saturating_sub(1),
+                Some(b'+') => new_left = new_left.saturating_sub(1),
+                Some(b' ') => {
+                    old_left = old_left.saturating_sub(1);
+                    new_left = new_left.saturating_sub(1);
+                }
+                _ => {}
+            }
+            continue;
+        }
+        if let Some(paths) = line.strip_prefix("diff --git ") {
+            // paths with special characters are quoted
+            let paths = paths.replace('"', "");
+            let paths = paths.strip_prefix("a/").unwrap_or(&paths);
+            let (old, new) = paths.rsplit_once(" b/").unwrap_or((paths, paths));
+            changes.push(FileChange {
+                old_path: Some(old.to_string()),
+                new_path: Some(new.to_string()),
+                ..Default::default()
+            });
+            continue;
+        }
+        let Some(change) = changes.last_mut() else {
+            continue;
+        };
+        if line.starts_with("new file mode") {
+            change.old_path = None;
+        } else if line.starts_with("deleted file mode") {
+            change.new_path = None;
+        } else if let Some(path) = line.strip_prefix("rename from ") {
+            change.old_path = Some(path.to_string());
+            change.renamed = true;
+        } else if let Some(path) = line.strip_prefix("rename to ") {
+            change.new_path = Some(path.to_string());
+            change.renamed = true;
+        } else if let Some(path) = line.strip_prefix("--- ") {
+            change.old_path = diff_path(path);
+        } else if let Some(path) = line.strip_prefix("+++ ") {
+            change.new_path = diff_path(path);
+        } else if let Some(header) = line.strip_prefix("@@ ") {
+            let mut ranges = header.split(' ');
+            let old = ranges.next().and_then(hunk_range);
+            let new = ranges.next().and_then(hunk_range);
+            let (Some((old_start, old_count)), Some((new_start, new_count))) = (old, new) else {
+                continue;
+            };
+            if old_count > 0 {
+                change.removed.push((old_start, old_start + old_count - 1));
+            }
+            if new_count > 0 {
+                change.added.push((new_start, new_start + new_count - 1));
+            }
+            change.deletions += old_count;
+            change.additions += new_count;
+            (old_left, new_left) = (old_count, new_count);
+        }
+    }
+    changes
+}
+
+// innermost symbols spanning the ranges, e.g. the method rather than its class
+fn touched(symbols: &[Symbol], ranges: &[(usize, usize)]) -> Vec<String> {
+    let mut names = Vec::new();
+    for &(start, end) in ranges {
+        let overlapping: Vec<&Symbol> = symbols.iter().filter(|s| s.overlaps(start, end)).collect();
+        for symbol in &overlapping {
+            let innermost = !overlapping.iter().any(|other| symbol.contains(other));
+            if innermost && !names.contains(&symbol.name) {
+                names.push(symbol.name.clone());
+            }
+        }
+    }
+    names
+}
+
+// symbols touched in the version of `path` at `revision`, nothing if the
+// language is not supported or the file can not be read
+fn touched_at(
+    dir: &Path,
+    langs: &[Lang],
+    revision: &str,
+    path: &str,
+    ranges: &[(usize, usize)],
+) -> Vec<String> {
+    if ranges.is_empty() {
+        return Vec::new();
+    }
+    let Some(lang) = langs.iter().find(|l| l.accepts(Path::new(path))) else {
+        return Vec::new();
+    };
+    let Ok(source) = blob(dir, revision, path) else {
+        return Vec::new();
+    };
+    lang.symbols(&source)
+        .map(|symbols| touched(&symbols, ranges))
+        .unwrap_or_default()
+}
+
+/// Digest of a commit of the repository in `dir`, compared to its first parent.
+pub fn digest(dir: &Path, langs: &[Lang], commit: &str) -> Result<CommitDigest> {
+    let output = git(
+        dir,
+        &[
+            "show",
+            "--format=%H",
+            "--no-color",
+            "--no-ext-diff",
+            "-U0",
+            "-M",
+            "--diff-merges=first-parent",
+            commit,
+        ],
+    )?;
+    let (hash, diff) = output.split_once('\n').unwrap_or((&output, ""));
+    let parent = format!("{hash}^");
+
+    let mut files = Vec::new();
+    for change in parse_diff(diff) {
+        let mut symbols = Vec::new();
+        if let Some(path) = &change.new_path {
+            symbols = touched_at(dir, langs, hash, path, &change.added);
+        }
+        if let Some(path) = &change.old_path {
+            for name in touched_at(dir, langs, &parent, path, &change.removed) {
+                if !symbols.contains(&name) {
+                    symbols.push(name);
+                }
+            }
+        }
+        let path = change.new_path.as_ref().or(change.old_path.as_ref());
+        files.push(FileDigest {
+            path: path.cloned().unwrap_or_default(),
+            status: change.status().to_string(),
+            additions: change.additions,
+            deletions: change.deletions,
+            symbols,
+        });
+    }
+
+    Ok(CommitDigest {
+        hash: hash.to_string(),
+        additions: files.iter().map(|f| f.additions).sum(),
+        deletions: files.iter().map(|f| f.deletions).sum(),
+        files,
+    })
+}
+
+#[cfg(test)]
+mod test {
+    use super::*;
+
+    const DIFF: &str = "\
+diff --git a/b.bin b/b.bin
+deleted file mode 100644
+index 87ae6b6..0000000
+Binary files a/b.bin and /dev/null differ
+diff --git a/r.py b/r.py
+new file mode 100644
+index 0000000..c19a3f4
+--- /dev/null
++++ b/r.py
+@@ -0,0 +1,2 @@
++k
++--- a/fake
+diff --git a/sp ace.py b/sp ace.py
+deleted file mode 100644
+index b68fde2..0000000
+--- a/sp ace.py\t
++++ /dev/null
+@@ -1 +0,0 @@
+-k
+diff --git a/x.py b/x.py
+index de98044..6372083 100644
+--- a/x.py
++++ b/x.py
+@@ -2 +1,0 @@ a
+-b
+@@ -3,0 +3 @@ c
++d
+diff --git a/old.go b/new.go
+similarity index 90%
+rename from old.go
+rename to new.go
+";
+
+    #[test]
+    fn parse() {
+        let changes = parse_diff(DIFF);
+        let summary: Vec<_> = changes
+            .iter()
+            .map(|c| {
+                (
+                    c.old_path.as_deref(),
+                    c.new_path.as_deref(),
+                    c.status(),
+                    c.additions,
+                    c.deletions,
+                )
+            })
+            .collect();
+        assert_eq!(
+            summary,
+            vec![
+                (Some("b.bin"), None, "D", 0, 0),
+                (None, Some("r.py"), "A", 2, 0),
+                (Some("sp ace.py"), None, "D", 0, 1),
+                (Some("x.py"), Some("x.py"), "M", 1, 1),
+                (Some("old.go"), Some("new.go"), "R", 0, 0),
+            ]
+        );
+        assert_eq!(changes[1].added, vec![(1, 2)]);
+        assert_eq!(changes[3].removed, vec![(2, 2)]);
+        assert_eq!(changes[3].added, vec![(3, 3)]);
+    }
+
+    fn symbol(name: &str, start: usize, end: usize) -> Symbol {
+        Symbol {
+            name: name.into(),
+            start,
+            end,
+        }
+    }
+
+    #[test]
+    fn innermost() {
+        let symbols = vec![
+            symbol("Type", 1, 20),
+            symbol("Type.first()", 3, 8),
+            symbol("Type.second()", 10, 18),
+            symbol("function()", 22, 25),
+        ];
+        assert_eq!(touched(&symbols, &[(4, 4)]), vec!["Type.first()"]);
+        assert_eq!(
+            touched(&symbols, &[(7, 11), (24, 24)]),
+            vec!["Type.first()", "Type.second()", "function()"]
+        );
+        // changes between the methods belong to the type
+        assert_eq!(touched(&symbols, &[(9, 9)]), vec!["Type"]);
+        assert!(touched(&symbols, &[(21, 21)]).is_empty());
+    }
+}
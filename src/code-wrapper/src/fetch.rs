@@ -0,0 +1,227 @@
+use std::collections::HashMap;
+use std::fmt::Display;
+use std::path::Path;
+use std::thread;
+
+use pyo3::{pyclass, pymethods};
+
+use crate::objects::blob;
+use crate::ts::{Lang, Target};
+
+/// A definition or a range of lines of a file at a commit.
+#[pyclass(str, get_all)]
+#[derive(Debug, Clone, PartialEq, Eq)]
+pub struct FetchTarget {
+    pub commit: String,
+    pub file_path: String,
+    /// `type.function()`, `function()` or `type`
+    pub name: Option<String>,
+    /// first and last line, counted from 0 like `fetch_lines_of_file`
+    pub start: Option<usize>,
+    pub end: Option<usize>,
+}
+
+#[pymethods]
+impl FetchTarget {
+    #[new]
+    #[pyo3(signature = (commit, file_path, name=None, start=None, end=None))]
+    pub fn new(
+        commit: String,
+        file_path: String,
+        name: Option<String>,
+        start: Option<usize>,
+        end: Option<usize>,
+    ) -> Self {
+        Self {
+            commit,
+            file_path,
+            name,
+            start,
+            end,
+        }
+    }
+}
+
+impl Display for FetchTarget {
+    fn fmt(&self, f: &mut std::fmt::Formatter<'_>) -> std::fmt::Result {
+        write!(f, "{}@{}", self.file_path, self.commit)?;
+        if let Some(name) = &self.name {
+            write!(f, " {name}")?;
+        }
+        if let (Some(start), Some(end)) = (self.start, self.end) {
+            write!(f, " lines {start}-{end}")?;
+        }
+        Ok(())
+    }
+}
+
+type Fetched = std::result::Result<Vec<String>, String>;
+
+// fetches the targets of the same file at the same commit, reading and
+// parsing the file once for all of them
+fn fetch_group(
+    dir: &Path,
+    langs: &[Lang],
+    targets: &[FetchTarget],
+    group: &[usize],
+) -> Vec<(usize, Fetched)> {
+    let first = &targets[group[0]];
+    let source = match blob(dir, &first.commit, &first.file_path) {
+        Ok(source) => source,
+        Err(e) => return group.iter().map(|&i| (i, Err(e.to_string()))).collect(),
+    };
+
+    let mut results: Vec<(usize, Fetched)> = Vec::new();
+    let mut named: Vec<(usize, Target)> = Vec::new();
+    for &i in group {
+        let target = &targets[i];
+        match (&target.name, target.start, target.end) {
+            (Some(name), _, _) => match Target::parse(name) {
+                Ok(parsed) => named.push((i, parsed)),
+                Err(e) => results.push((i, Err(e.to_string()))),
+            },
+            (None, Some(start), Some(end)) if start <= end => {
+                let lines = source
+                    .lines()
+                    .skip(start)
+                    .take(end - start + 1)
+                    .map(str::to_string)
+                    .collect();
+                results.push((i, Ok(lines)));
+            }
+            _ => results.push((i, Err("expected a name or a line range".into()))),
+        }
+    }
+
+    if !named.is_empty() {
+        let lang = langs
+            .iter()
+            .find(|l| l.accepts(Path::new(&first.file_path)));
+        let parsed: Vec<&Target> = named.iter().map(|(_, t)| t).collect();
+        let found = match lang {
+            Some(lang) => lang
+                .find_all_in(&parsed, &source)
+                .map_err(|e| e.to_string()),
+            // like `fetch_definition`, files of other languages have no definitions
+            None => Ok(vec![Vec::new(); named.len()]),
+        };
+        match found {
+            Ok(found) => {
+                for ((i, _), matches) in named.iter().zip(found) {
+                    let definitions = matches.into_iter().map(|(def, _doc)| def).collect();
+                    results.push((*i, Ok(definitions)));
+                }
+            }
+            Err(e) => results.extend(named.iter().map(|(i, _)| (*i, Err(e.clone())))),
+        }
+    }
+    results
+}
+
+/// Fetch every target, the targets are grouped by file and commit and the
+/// groups are fetched in parallel.
+pub fn fetch_many(dir: &Path, langs: &[Lang], targets: &[FetchTarget]) -> Vec<Fetched> {
+    let mut groups: Vec<Vec<usize>> = Vec::new();
+    let mut group_of: HashMap<(&str, &str), usize> = HashMap::new();
+    for (i, target) in targets.iter().enumerate() {
+        let key = (
+            target.commit.as_str(),
+            target.file_path.trim_start_matches("./"),
+        );
+        let group = *group_of.entry(key).or_insert_with(|| {
+            groups.push(Vec::new());
+            groups.len() - 1
+        });
+        groups[group].push(i);
+    }
+
+    let workers = thread::available_parallelism().map_or(4, |n| n.get());
+    let chunk_size = groups.len().div_ceil(workers).max(1);
+    let mut results: Vec<Fetched> = vec![Ok(Vec::new()); targets.len()];
+    thread::scope(|s| {
+        let handles: Vec<_> = groups
+            .chunks(chunk_size)
+            .map(|chunk| {
+                s.spawn(move || {
+                    chunk
+                        .iter()
+                        .flat_map(|group| fetch_group(dir, langs, targets, group))
+                        .collect::<Vec<_>>()
+                })
+            })
+            .collect();
+        for handle in handles {
+            for (i, result) in handle.join().expect("fetch worker panicked") {
+                results[i] = result;
+            }
+        }
+    });
+    results
+}
+
+/// Combine the results of the targets into one text of at most `max_bytes`
+/// bytes, the results that do not fit are left out.
+pub fn render(targets: &[FetchTarget], results: &[Fetched], max_bytes: usize) -> String {
+    let mut text = String::new();
+    for (i, (target, result)) in targets.iter().zip(results).enumerate() {
+        let section = match result {
+            Ok(lines) if lines.is_empty() => format!("{target}: not found"),
+            Ok(lines) => format!("{target}:\n{}", lines.join("\n")),
+            Err(e) => format!("{target}: {e}"),
+        };
+        let separator = if text.is_empty() { "" } else { "\n\n" };
+        let left = max_bytes.saturating_sub(text.len() + separator.len());
+        if section.len() > left {
+            // cut the first result that does not fit rather than returning nothing
+            if text.is_empty() {
+                let mut cut = left;
+                while !section.is_char_boundary(cut) {
+                    cut -= 1;
+                }
+                text.push_str(&section[..cut]);
+            }
+            text.push_str(&format!(
+                "\n\n... {} of {} results left out, over {max_bytes} bytes",
+                targets.len() - i,
+                targets.len()
+            ));
+            break;
+        }
+        text.push_str(separator);
+        text.push_str(&section);
+    }
+    text
+}
+
+#[cfg(test)]
+mod test {
+    use super::*;
+
+    fn target(name: &str) -> FetchTarget {
+        FetchTarget::new("c".into(), "f.go".into(), Some(name.into()), None, None)
+    }
+
+    #[test]
+    fn bounded() {
+        let targets = vec![target("a()"), target("b()"), target("c()")];
+        let results: Vec<Fetched> = vec![
+            Ok(vec!["func a() {}".into()]),
+            Err("failed".into()),
+            Ok(vec!["func c() {}".into()]),
+        ];
+
+        let text = render(&targets, &results, 1000);
+        assert_eq!(
+            text,
+            "f.go@c a():\nfunc a() {}\n\nf.go@c b(): failed\n\nf.go@c c():\nfunc c() {}"
+        );
+
+        let text = render(&targets, &results, 30);
+        assert!(text.starts_with("f.go@c a():\nfunc a() {}\n\n..."));
+        assert!(text.ends_with("2 of 3 results left out, over 30 bytes"));
+
+        // the first result is cut instead of left out
+        let text = render(&targets, &results, 8);
+        assert!(text.starts_with("f.go@c a\n\n... 3 of 3"));
+    }
+}
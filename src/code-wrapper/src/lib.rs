@@ -1,4 +1,7 @@
+mod digest;
 mod error;
+mod fetch;
+mod objects;
 mod ts;
 mod wrapper;
 
@@ -11,5 +14,8 @@ use pyo3::prelude::*;
 #[pymodule]
 fn code_wrapper(m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_class::<wrapper::Wrapper>()?;
+    m.add_class::<digest::CommitDigest>()?;
+    m.add_class::<digest::FileDigest>()?;
+    m.add_class::<fetch::FetchTarget>()?;
     Ok(())
 }
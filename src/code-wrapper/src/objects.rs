@@ -0,0 +1,24 @@
+// reads of the object store of a repository, they leave its work tree alone
+// and can run concurrently with checkouts
+
+use std::path::Path;
+use std::process::Command;
+
+use crate::{CodeError, Result};
+
+pub fn git(dir: &Path, args: &[&str]) -> Result<String> {
+    let output = Command::new("git").args(args).current_dir(dir).output()?;
+    match output.status.success() {
+        false => {
+            let error_message = String::from_utf8_lossy(&output.stderr).to_string();
+            Err(CodeError::GitCommandErr(error_message))
+        }
+        true => Ok(String::from_utf8_lossy(&output.stdout).to_string()),
+    }
+}
+
+/// Content of `path` at `revision`, fetched from the remote by partial clones.
+pub fn blob(dir: &Path, revision: &str, path: &str) -> Result<String> {
+    let path = path.trim_start_matches("./");
+    git(dir, &["show", &format!("{revision}:{path}")])
+}
@@ -75,6 +75,10 @@ const TYPES: &[&str] = &[
 "#,
 ];
 
+// nodes defining the types and the functions of a file
+pub const TYPE_NODES: &[&str] = &["type_spec", "type_alias"];
+pub const FUNCTION_NODES: &[&str] = &["function_declaration", "method_declaration"];
+
 pub fn queries() -> HashMap<QueryMode, Vec<String>> {
     let mut queries = HashMap::new();
     queries.insert(
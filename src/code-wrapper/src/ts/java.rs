@@ -83,6 +83,15 @@ const TYPES: &[&str] = &[
     "#,
 ];
 
+// nodes defining the types and the functions of a file
+pub const TYPE_NODES: &[&str] = &[
+    "class_declaration",
+    "interface_declaration",
+    "enum_declaration",
+    "record_declaration",
+];
+pub const FUNCTION_NODES: &[&str] = &["method_declaration", "constructor_declaration"];
+
 pub fn queries() -> HashMap<QueryMode, Vec<String>> {
     let mut queries = HashMap::new();
     queries.insert(
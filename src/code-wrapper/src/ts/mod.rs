@@ -1,6 +1,6 @@
 mod go;
-mod python;
 mod java;
+mod python;
 #[cfg(test)]
 mod test;
 
@@ -10,7 +10,7 @@ use std::fs;
 use std::path::Path;
 use strfmt::strfmt;
 use tree_sitter::StreamingIterator;
-use tree_sitter::{Parser, Query, QueryCursor};
+use tree_sitter::{Node, Parser, Query, QueryCursor};
 
 use crate::CodeError;
 use crate::Result;
@@ -31,6 +31,8 @@ pub struct Lang {
     queries: HashMap<QueryMode, Vec<String>>,
     language_fn: tree_sitter::Language,
     file_extension: &'static str,
+    type_nodes: &'static [&'static str],
+    function_nodes: &'static [&'static str],
 }
 impl Lang {
     // Creates new instance for Go Language
@@ -39,6 +41,8 @@ impl Lang {
             queries: go::queries(),
             language_fn: tree_sitter_go::LANGUAGE.into(),
             file_extension: "go",
+            type_nodes: go::TYPE_NODES,
+            function_nodes: go::FUNCTION_NODES,
         }
     }
 
@@ -48,6 +52,8 @@ impl Lang {
             queries: python::queries(),
             language_fn: tree_sitter_python::LANGUAGE.into(),
             file_extension: "py",
+            type_nodes: python::TYPE_NODES,
+            function_nodes: python::FUNCTION_NODES,
         }
     }
 
@@ -57,6 +63,8 @@ impl Lang {
             queries: java::queries(),
             language_fn: tree_sitter_java::LANGUAGE.into(),
             file_extension: "java",
+            type_nodes: java::TYPE_NODES,
+            function_nodes: java::FUNCTION_NODES,
         }
     }
 }
@@ -64,20 +72,42 @@ impl Lang {
 impl Lang {
     // finds the definition and deocumentation of the target in the given file_path
     pub fn find_in(&self, target: &Target, file_path: &Path) -> Result<Vec<(String, String)>> {
+        let source = fs::read_to_string(file_path)?;
+        let mut matches = self.find_all_in(&[target], &source)?;
+        Ok(matches.remove(0))
+    }
+
+    // finds the definitions and documentations of each target in the source,
+    // parsing it once for all of them
+    pub fn find_all_in(
+        &self,
+        targets: &[&Target],
+        source: &str,
+    ) -> Result<Vec<Vec<(String, String)>>> {
         let mut parser = Parser::new();
         parser
             .set_language(&self.language_fn)
             .expect("Error loading language grammar");
+        let tree = parser.parse(source, None).ok_or(CodeError::TSParseError)?;
 
+        targets
+            .iter()
+            .map(|target| self.find_in_tree(target, &tree, source))
+            .collect()
+    }
+
+    fn find_in_tree(
+        &self,
+        target: &Target,
+        tree: &tree_sitter::Tree,
+        source: &str,
+    ) -> Result<Vec<(String, String)>> {
         // format the queries with values from the target
         let queries = self.queries[&target.query_mode()]
             .iter()
             .filter_map(|q_fstr| target.update_query(q_fstr).ok())
             .collect::<Vec<_>>();
 
-        let source = fs::read_to_string(file_path)?;
-        let tree = parser.parse(&source, None).ok_or(CodeError::TSParseError)?;
-
         let mut results = Vec::new();
         for q in queries {
             let query = Query::new(&self.language_fn, &q).expect("Error creating query");
@@ -109,6 +139,88 @@ impl Lang {
     pub fn accepts(&self, path: &Path) -> bool {
         path.extension().and_then(|s| s.to_str()) == Some(self.file_extension)
     }
+
+    // finds the types and functions defined in the source, sorted by their first line.
+    // functions defined in a type are named `type.function()` like the targets
+    pub fn symbols(&self, source: &str) -> Result<Vec<Symbol>> {
+        let mut parser = Parser::new();
+        parser
+            .set_language(&self.language_fn)
+            .expect("Error loading language grammar");
+        let tree = parser.parse(source, None).ok_or(CodeError::TSParseError)?;
+        let source = source.as_bytes();
+
+        let mut symbols = Vec::new();
+        // walk the tree with an explicit stack, generated files can be deeply nested
+        let mut stack: Vec<(Node, Option<String>)> = vec![(tree.root_node(), None)];
+        while let Some((node, mut receiver)) = stack.pop() {
+            let kind = node.kind();
+            let name = node
+                .child_by_field_name("name")
+                .and_then(|n| n.utf8_text(source).ok());
+            if let Some(name) = name {
+                if self.type_nodes.contains(&kind) {
+                    symbols.push(Symbol::new(name.to_string(), node));
+                    receiver = Some(name.to_string());
+                } else if self.function_nodes.contains(&kind) {
+                    let name = match receiver_of(node, source).or(receiver.clone()) {
+                        Some(receiver) => format!("{receiver}.{name}()"),
+                        None => format!("{name}()"),
+                    };
+                    symbols.push(Symbol::new(name, node));
+                }
+            }
+            let mut cursor = node.walk();
+            for child in node.children(&mut cursor) {
+                stack.push((child, receiver.clone()));
+            }
+        }
+        symbols.sort_by_key(|s| (s.start, std::cmp::Reverse(s.end)));
+        Ok(symbols)
+    }
+}
+
+// a type or function defined in a file, with the lines it spans (1-based, inclusive)
+#[derive(Debug, Clone, PartialEq, Eq)]
+pub struct Symbol {
+    pub name: String,
+    pub start: usize,
+    pub end: usize,
+}
+
+impl Symbol {
+    fn new(name: String, node: Node) -> Self {
+        Self {
+            name,
+            start: node.start_position().row + 1,
+            end: node.end_position().row + 1,
+        }
+    }
+
+    // checks if the symbol spans any line from start to end
+    pub fn overlaps(&self, start: usize, end: usize) -> bool {
+        self.start <= end && start <= self.end
+    }
+
+    // checks if the other symbol is defined within this one
+    pub fn contains(&self, other: &Symbol) -> bool {
+        self != other && self.start <= other.start && other.end <= self.end
+    }
+}
+
+// the type of the receiver of a Go method, e.g. `Mockery` for `(m *Mockery)`
+fn receiver_of(node: Node, source: &[u8]) -> Option<String> {
+    let receiver = node
+        .child_by_field_name("receiver")?
+        .utf8_text(source)
+        .ok()?;
+    // drop the type parameters of generic receivers, `(s *Stack[T])`
+    let receiver = receiver.split('[').next().unwrap_or_default();
+    receiver
+        .split(|c: char| !(c.is_alphanumeric() || c == '_'))
+        .filter(|s| !s.is_empty())
+        .last()
+        .map(str::to_string)
 }
 
 #[derive(Debug, Clone)]
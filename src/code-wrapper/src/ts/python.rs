@@ -39,6 +39,10 @@ const TYPES: &[&str] = &[
 "#,
 ];
 
+// nodes defining the types and the functions of a file
+pub const TYPE_NODES: &[&str] = &["class_definition"];
+pub const FUNCTION_NODES: &[&str] = &["function_definition"];
+
 pub fn queries() -> HashMap<QueryMode, Vec<String>> {
     let mut queries = HashMap::new();
     queries.insert(
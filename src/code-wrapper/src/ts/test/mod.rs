@@ -68,3 +68,46 @@ fn java() -> Result<()> {
     ];
     find_targets_for_lang(targets, Lang::java())
 }
+
+fn symbols_of(lang: Lang) -> Result<Vec<(String, usize)>> {
+    let file_path = format!("./src/ts/test/samples/code.{}", lang.file_extension);
+    let source = std::fs::read_to_string(file_path)?;
+    Ok(lang
+        .symbols(&source)?
+        .into_iter()
+        .map(|s| (s.name, s.start))
+        .collect())
+}
+
+#[test]
+fn symbols() -> Result<()> {
+    let expected = |symbols: &[(&str, usize)]| -> Vec<(String, usize)> {
+        symbols.iter().map(|(n, l)| (n.to_string(), *l)).collect()
+    };
+    assert_eq!(
+        symbols_of(Lang::go())?,
+        expected(&[
+            ("Struct1", 4),
+            ("Alias1", 10),
+            ("Interface1", 13),
+            ("Struct1.method1()", 19),
+            ("Struct1.method2()", 24),
+            ("staticFunction()", 29),
+        ])
+    );
+    assert_eq!(
+        symbols_of(Lang::python())?,
+        expected(&[
+            ("Type1", 4),
+            ("Type1.__init__()", 10),
+            ("Type1.method1()", 17),
+            ("Type2", 25),
+            ("Enum1", 32),
+            ("static_function()", 42),
+        ])
+    );
+    let java = symbols_of(Lang::java())?;
+    assert!(java.iter().any(|(n, _)| n == "Class1.method1()"));
+    assert!(java.iter().any(|(n, _)| n == "Class1.Class1()"));
+    Ok(())
+}
@@ -1,17 +1,27 @@
+use std::collections::HashMap;
 use std::io::BufRead;
+use std::sync::Mutex;
+use std::thread;
 use std::{fmt::Display, path::PathBuf, process::Command};
 
+use crate::digest::{self, CommitDigest};
+use crate::fetch::{self, FetchTarget};
 use crate::ts::{Lang, Target};
 
 use super::{CodeError, Result};
-use pyo3::{pyclass, pymethods};
+use pyo3::{pyclass, pymethods, Python};
 use temp_dir::TempDir;
 
+// size of the combined result of `fetch_many` when not given
+const FETCH_MANY_MAX_BYTES: usize = 16 * 1024;
+
 #[pyclass(str)]
 pub struct Wrapper {
     dir: TempDir,
     default_branch: String,
     langs: Vec<Lang>,
+    // digests by the commit hashes they were requested with
+    digests: Mutex<HashMap<String, CommitDigest>>,
 }
 
 impl Wrapper {
@@ -37,6 +47,7 @@ impl Wrapper {
                     dir,
                     default_branch,
                     langs: vec![Lang::go(), Lang::python(), Lang::java()],
+                    digests: Mutex::new(HashMap::new()),
                 })
             }
         }
@@ -45,19 +56,26 @@ impl Wrapper {
 
 #[pymethods]
 impl Wrapper {
+    /// Clone the repository into a temporary directory.
+    ///
+    /// When a `filter` (e.g. `blob:none`) is given, a partial clone is made:
+    /// only the blobs of the checked out commit are fetched, the blobs of
+    /// other commits are fetched from the remote when they are checked out.
     #[new]
-    pub fn new(repo_url: &str) -> Result<Self> {
+    #[pyo3(signature = (repo_url, filter=None))]
+    pub fn new(repo_url: &str, filter: Option<&str>) -> Result<Self> {
         let dir = TempDir::new()?;
 
         // Get the path to the temporary directory
         let dir_path = dir.path();
 
         // Run git clone command
-        let output = Command::new("git")
-            .arg("clone")
-            .arg(repo_url)
-            .arg(dir_path)
-            .output()?;
+        let mut cmd = Command::new("git");
+        cmd.arg("clone");
+        if let Some(filter) = filter {
+            cmd.arg(format!("--filter={filter}"));
+        }
+        let output = cmd.arg(repo_url).arg(dir_path).output()?;
 
         // Check if the command was successful
         if !output.status.success() {
@@ -84,6 +102,25 @@ impl Wrapper {
         Self::new_from_temp_dir(dir)
     }
 
+    /// Fetch new commits from the origin remote, their blobs are fetched when
+    /// they are checked out.
+    pub fn refresh(&self) -> Result<()> {
+        let output = Command::new("git")
+            .arg("fetch")
+            .arg("--prune")
+            .arg("origin")
+            .current_dir(self.dir.path())
+            .output()?;
+
+        match output.status.success() {
+            false => {
+                let error_message = String::from_utf8_lossy(&output.stderr).to_string();
+                Err(CodeError::GitCommandErr(error_message))
+            }
+            true => Ok(()),
+        }
+    }
+
     pub fn fetch_definition(
         &self,
         name: &str,
@@ -114,6 +151,42 @@ impl Wrapper {
         Ok(matches)
     }
 
+    /// Digest of a commit: the files it changes, the functions and types it
+    /// touches and the number of changed lines.
+    pub fn commit_digest(&self, py: Python<'_>, commit: String) -> Result<CommitDigest> {
+        let mut digests = self.commit_digests(py, vec![commit])?;
+        Ok(digests.remove(0))
+    }
+
+    /// Digests of the commits, computed in parallel and cached by commit hash.
+    /// Blobs are read from the object store, so digests do not wait for or
+    /// disturb the checkouts of the other methods.
+    pub fn commit_digests(
+        &self,
+        py: Python<'_>,
+        commits: Vec<String>,
+    ) -> Result<Vec<CommitDigest>> {
+        py.allow_threads(|| self.digests(&commits))
+    }
+
+    /// Fetch the definitions and line ranges of many targets at once and
+    /// combine them into one text of at most `max_bytes` bytes.
+    ///
+    /// Targets of the same file at the same commit share one read and parse
+    /// of the file, which is read from the object store without a checkout.
+    #[pyo3(signature = (targets, max_bytes=FETCH_MANY_MAX_BYTES))]
+    pub fn fetch_many(
+        &self,
+        py: Python<'_>,
+        targets: Vec<FetchTarget>,
+        max_bytes: usize,
+    ) -> String {
+        py.allow_threads(|| {
+            let results = fetch::fetch_many(self.dir.path(), &self.langs, &targets);
+            fetch::render(&targets, &results, max_bytes)
+        })
+    }
+
     pub fn fetch_lines_of_file(
         &self,
         commit: &str,
@@ -135,6 +208,48 @@ impl Wrapper {
 }
 
 impl Wrapper {
+    fn digests(&self, commits: &[String]) -> Result<Vec<CommitDigest>> {
+        let mut missing: Vec<&String> = {
+            let digests = self.digests.lock().unwrap();
+            commits
+                .iter()
+                .filter(|c| !digests.contains_key(*c))
+                .collect()
+        };
+        missing.sort();
+        missing.dedup();
+
+        if !missing.is_empty() {
+            let workers = thread::available_parallelism().map_or(4, |n| n.get());
+            let chunk_size = missing.len().div_ceil(workers);
+            let computed: Vec<(&String, Result<CommitDigest>)> = thread::scope(|s| {
+                let handles: Vec<_> = missing
+                    .chunks(chunk_size)
+                    .map(|chunk| {
+                        s.spawn(move || {
+                            chunk
+                                .iter()
+                                .map(|c| (*c, digest::digest(self.dir.path(), &self.langs, c)))
+                                .collect::<Vec<_>>()
+                        })
+                    })
+                    .collect();
+                handles
+                    .into_iter()
+                    .flat_map(|h| h.join().expect("digest worker panicked"))
+                    .collect()
+            });
+
+            let mut digests = self.digests.lock().unwrap();
+            for (commit, result) in computed {
+                digests.insert(commit.clone(), result?);
+            }
+        }
+
+        let digests = self.digests.lock().unwrap();
+        Ok(commits.iter().map(|c| digests[c].clone()).collect())
+    }
+
     fn checkout(&self, commit: &str) -> Result<()> {
         let output = Command::new("git")
             .arg("checkout")
@@ -198,6 +313,7 @@ mod test {
             dir,
             default_branch: String::from("master"),
             langs: vec![Lang::go(), Lang::python(), Lang::java()],
+            digests: Mutex::new(HashMap::new()),
         })
     }
 
@@ -252,4 +368,98 @@ mod test {
 
         Ok(())
     }
+
+    #[test]
+    fn digests() -> Result<()> {
+        let w = new_mock_wrapper()?;
+        let commits = vec![String::from("goodbye"), String::from("hello")];
+        let digests = w.digests(&commits)?;
+
+        let goodbye = &digests[0].files;
+        assert_eq!(goodbye.len(), 1);
+        assert_eq!(goodbye[0].path, "main.go");
+        assert_eq!(goodbye[0].status, "M");
+        assert_eq!((goodbye[0].additions, goodbye[0].deletions), (5, 0));
+        assert_eq!(goodbye[0].symbols, vec!["Mockery.SayGoodBye()"]);
+
+        let hello = &digests[1].files;
+        assert_eq!(hello[0].status, "A");
+        assert_eq!(
+            hello[0].symbols,
+            vec!["greet()", "Mockery", "Mockery.SayHello()"]
+        );
+
+        // served from the cache
+        assert_eq!(w.digests(&commits[..1])?, digests[..1]);
+        Ok(())
+    }
+
+    #[test]
+    fn fetch_many() -> Result<()> {
+        let w = new_mock_wrapper()?;
+        let target = |commit: &str, name: Option<&str>, lines: Option<(usize, usize)>| {
+            FetchTarget::new(
+                commit.into(),
+                "./main.go".into(),
+                name.map(String::from),
+                lines.map(|l| l.0),
+                lines.map(|l| l.1),
+            )
+        };
+        let targets = vec![
+            target("goodbye", Some("Mockery.SayGoodBye()"), None),
+            target("hello", None, Some((0, 1))),
+            target("hello", Some("Mockery.SayGoodBye()"), None),
+            target("hello", Some("greet()"), None),
+            target("missing", Some("greet()"), None),
+            target("hello", None, None),
+        ];
+        let results = fetch::fetch_many(w.dir.path(), &w.langs, &targets);
+
+        assert!(results[0].as_ref().unwrap()[0].contains("Bye, my name is"));
+        assert_eq!(
+            results[1].as_ref().unwrap(),
+            &vec!["package main", "import \"fmt\""]
+        );
+        assert!(results[2].as_ref().unwrap().is_empty());
+        assert!(results[3].as_ref().unwrap()[0].starts_with("func greet()"));
+        assert!(results[4].is_err());
+        assert!(results[5].is_err());
+
+        // the lines match a checkout of the commit
+        let lines = w.fetch_lines_of_file("hello", PathBuf::from("./main.go"), 0, 1)?;
+        assert_eq!(results[1].as_ref().unwrap(), &lines);
+        Ok(())
+    }
+
+    #[test]
+    fn filtered_clone() -> Result<()> {
+        let origin = new_mock_wrapper()?;
+        // allow partial clones from the mock repo
+        Command::new("git")
+            .args(["config", "uploadpack.allowFilter", "true"])
+            .current_dir(origin.dir.path())
+            .output()?;
+
+        let url = format!("file://{}", origin.dir.path().display());
+        let w = Wrapper::new(&url, Some("blob:none"))?;
+
+        // blobs of other commits are fetched when they are checked out
+        for commit in ["hello", "goodbye"] {
+            let expected = origin.fetch_lines_of_file(
+                commit,
+                PathBuf::from("./main.go"),
+                0,
+                usize::MAX >> 1,
+            )?;
+            let lines = w.fetch_lines_of_file(
+                &format!("origin/{commit}"),
+                PathBuf::from("./main.go"),
+                0,
+                usize::MAX >> 1,
+            )?;
+            assert_eq!(lines, expected);
+        }
+        Ok(())
+    }
 }
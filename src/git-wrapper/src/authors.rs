@@ -0,0 +1,192 @@
+use chrono::{DateTime, FixedOffset};
+
+use crate::store::CommitStore;
+use crate::wrapper::AuthorQuery;
+
+/// Postings of the commits of each author.
+///
+/// Authors are the ones interned by the commit store and every author keeps
+/// the positions of their commits sorted by date, so the commits of an author
+/// within a period are found with a binary search instead of a scan over all
+/// commits.
+pub struct AuthorIndex {
+    // lowercased name and email of each author, for case-insensitive matching
+    folded: Vec<(String, String)>,
+    postings: Vec<Vec<u32>>,
+}
+
+impl AuthorIndex {
+    pub fn new(commits: &CommitStore) -> Self {
+        let mut postings: Vec<Vec<u32>> = vec![Vec::new(); commits.authors().len()];
+        for (i, &id) in commits.author_ids().iter().enumerate() {
+            postings[id as usize].push(i as u32);
+        }
+        let timestamps = commits.timestamps();
+        for posting in postings.iter_mut() {
+            posting.sort_by_key(|&i| (timestamps[i as usize], i));
+        }
+        let folded = commits
+            .authors()
+            .iter()
+            .map(|a| (a.name.to_lowercase(), a.email.to_lowercase()))
+            .collect();
+
+        Self { folded, postings }
+    }
+
+    /// Authors matching the query, trying an exact match first, then a
+    /// case-insensitive match and finally a case-insensitive partial match.
+    pub fn matching(&self, commits: &CommitStore, query: &AuthorQuery) -> Vec<usize> {
+        let value = match query {
+            AuthorQuery::Name(value) | AuthorQuery::Email(value) => value.as_str(),
+        };
+        let value_folded = value.to_lowercase();
+        // the queried attribute of an author, as is and lowercased
+        let field = |id: usize| -> (&str, &str) {
+            let author = commits.author(id);
+            let (name, email) = &self.folded[id];
+            match query {
+                AuthorQuery::Name(_) => (author.name.as_str(), name.as_str()),
+                AuthorQuery::Email(_) => (author.email.as_str(), email.as_str()),
+            }
+        };
+
+        let ids = 0..self.folded.len();
+        let exact: Vec<usize> = ids.clone().filter(|&id| field(id).0 == value).collect();
+        if !exact.is_empty() {
+            return exact;
+        }
+        let folded: Vec<usize> = ids
+            .clone()
+            .filter(|&id| field(id).1 == value_folded)
+            .collect();
+        if !folded.is_empty() {
+            return folded;
+        }
+        ids.filter(|&id| field(id).1.contains(&value_folded))
+            .collect()
+    }
+
+    /// Positions of the commits of `author` within the period, in date order.
+    pub fn commits_within<'a>(
+        &'a self,
+        commits: &CommitStore,
+        author: usize,
+        from: DateTime<FixedOffset>,
+        to: DateTime<FixedOffset>,
+    ) -> &'a [u32] {
+        let timestamps = commits.timestamps();
+        let (from, to) = (from.timestamp(), to.timestamp());
+        let posting = &self.postings[author];
+        let start = posting.partition_point(|&i| timestamps[i as usize] < from);
+        let end = posting.partition_point(|&i| timestamps[i as usize] <= to);
+        &posting[start..end.max(start)]
+    }
+
+    /// Authors with at least one commit within the period.
+    pub fn active_within(
+        &self,
+        commits: &CommitStore,
+        from: DateTime<FixedOffset>,
+        to: DateTime<FixedOffset>,
+    ) -> Vec<usize> {
+        (0..self.folded.len())
+            .filter(|&id| !self.commits_within(commits, id, from, to).is_empty())
+            .collect()
+    }
+}
+
+#[cfg(test)]
+mod test {
+    use chrono::DateTime;
+
+    use super::AuthorIndex;
+    use crate::store::CommitStore;
+    use crate::wrapper::{Author, AuthorQuery, CommitMeta};
+
+    fn commit(hash: &str, name: &str, date: &str) -> CommitMeta {
+        CommitMeta {
+            hash: format!("{hash:0>40}"),
+            author: Author {
+                name: name.into(),
+                email: format!("{}@test.com", name.to_lowercase()),
+            },
+            date: DateTime::parse_from_rfc3339(date).unwrap(),
+            message: hash.into(),
+        }
+    }
+
+    fn commits() -> CommitStore {
+        // newest first, like the commits of Branchless
+        CommitStore::from_commits(vec![
+            commit("5", "User1", "2024-01-05T00:00:00+00:00"),
+            commit("4", "user2", "2024-01-04T00:00:00+00:00"),
+            commit("3", "User1", "2024-01-03T00:00:00+00:00"),
+            commit("2", "user3", "2024-01-02T00:00:00+00:00"),
+            commit("1", "User1", "2024-01-01T00:00:00+00:00"),
+        ])
+        .unwrap()
+    }
+
+    fn date(day: u32) -> DateTime<chrono::FixedOffset> {
+        DateTime::parse_from_rfc3339(&format!("2024-01-{day:02}T00:00:00+00:00")).unwrap()
+    }
+
+    fn names(commits: &CommitStore, ids: Vec<usize>) -> Vec<String> {
+        ids.into_iter()
+            .map(|id| commits.author(id).name.clone())
+            .collect()
+    }
+
+    #[test]
+    fn interned() {
+        let commits = commits();
+        let index = AuthorIndex::new(&commits);
+        let ids = index.matching(&commits, &AuthorQuery::Name("User1".into()));
+        assert_eq!(ids.len(), 1);
+        assert_eq!(
+            index.commits_within(&commits, ids[0], date(1), date(5)),
+            &[4, 2, 0]
+        );
+    }
+
+    #[test]
+    fn within_period() {
+        let commits = commits();
+        let index = AuthorIndex::new(&commits);
+        let user1 = index.matching(&commits, &AuthorQuery::Name("User1".into()))[0];
+        assert_eq!(
+            index.commits_within(&commits, user1, date(2), date(4)),
+            &[2]
+        );
+        assert!(index
+            .commits_within(&commits, user1, date(6), date(7))
+            .is_empty());
+        assert_eq!(
+            names(&commits, index.active_within(&commits, date(2), date(4))),
+            vec!["User1", "user2", "user3"]
+        );
+        assert_eq!(
+            names(&commits, index.active_within(&commits, date(4), date(5))),
+            vec!["User1", "user2"]
+        );
+    }
+
+    #[test]
+    fn matching() {
+        let commits = commits();
+        let index = AuthorIndex::new(&commits);
+        let query = |q: AuthorQuery| names(&commits, index.matching(&commits, &q));
+        assert_eq!(query(AuthorQuery::Name("user2".into())), vec!["user2"]);
+        assert_eq!(query(AuthorQuery::Name("USER1".into())), vec!["User1"]);
+        assert_eq!(
+            query(AuthorQuery::Name("user".into())),
+            vec!["User1", "user2", "user3"]
+        );
+        assert_eq!(
+            query(AuthorQuery::Email("user3@TEST.com".into())),
+            vec!["user3"]
+        );
+        assert!(query(AuthorQuery::Name("user4".into())).is_empty());
+    }
+}
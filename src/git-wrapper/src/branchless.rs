@@ -1,12 +1,17 @@
 use itertools::Itertools;
 
-use pyo3::{pyclass, pymethods};
+use pyo3::{pyclass, pymethods, Python};
 use rayon::prelude::*;
-use std::collections::HashSet;
 use std::fmt::Display;
 use std::path::{Path, PathBuf};
 use std::process::Command;
+use std::sync::{Arc, Mutex};
 
+use crate::authors::AuthorIndex;
+use crate::cursor::CommitCursor;
+use crate::diffs::{self, DiffIndex};
+use crate::search::{MessageIndex, MessageQuery};
+use crate::store::{CommitColumn, CommitStore};
 use crate::wrapper::{Author, AuthorQuery, CommitMeta, Pagination, Wrapper};
 use crate::wrapper::{PaginationExt, TimePeriodExt};
 use crate::GitError;
@@ -17,7 +22,12 @@ const DATETIME_FORMAT: &str = "%Y-%m-%d %H:%M:%S %z";
 #[pyclass(str)]
 pub struct Branchless {
     wrapper: Wrapper,
-    commits: Vec<CommitMeta>,
+    commits: Arc<CommitStore>,
+    authors: AuthorIndex,
+    messages: MessageIndex,
+    diffs: Mutex<DiffIndex>,
+    // commits and indexes built by `fetch`, swapped in by `refresh`
+    fetched: Mutex<Option<Loaded>>,
 }
 impl Display for Branchless {
     fn fmt(&self, f: &mut std::fmt::Formatter<'_>) -> std::fmt::Result {
@@ -25,12 +35,34 @@ impl Display for Branchless {
     }
 }
 
+/// Commits of the branches of a repository and their indexes.
+struct Loaded {
+    branches: Vec<String>,
+    commits: CommitStore,
+    authors: AuthorIndex,
+    messages: MessageIndex,
+}
+
+impl Loaded {
+    fn new(wrapper: &Wrapper, branches: Vec<String>) -> Result<Self> {
+        let commits =
+            CommitStore::from_commits(Branchless::commits_on_branches(wrapper, &branches)?)?;
+        let authors = AuthorIndex::new(&commits);
+        let messages = MessageIndex::new(&commits);
+        Ok(Loaded {
+            branches,
+            commits,
+            authors,
+            messages,
+        })
+    }
+}
+
 impl Branchless {
-    fn commits_on_all_branchs(wrapper: &Wrapper) -> Result<Vec<CommitMeta>> {
-        wrapper
-            .list_branches()
+    fn commits_on_branches(wrapper: &Wrapper, branches: &[String]) -> Result<Vec<CommitMeta>> {
+        branches
             .iter()
-            .map(|branch| wrapper.commits_of_branch(branch, Pagination::all()))
+            .map(|branch| wrapper.commits_of_fetched_branch(branch, Pagination::all()))
             .try_fold(Vec::new(), |acc, commits| {
                 Ok(acc
                     .into_iter()
@@ -41,6 +73,22 @@ impl Branchless {
             .map(|commits| commits.into_iter().rev().collect())
     }
 
+    fn from_wrapper(wrapper: Wrapper) -> Result<Self> {
+        let loaded = Loaded::new(&wrapper, wrapper.list_branches())?;
+        Ok(Branchless {
+            wrapper,
+            commits: Arc::new(loaded.commits),
+            authors: loaded.authors,
+            messages: loaded.messages,
+            diffs: Mutex::new(DiffIndex::new()),
+            fetched: Mutex::new(None),
+        })
+    }
+
+    fn load(&self) -> Result<Loaded> {
+        Loaded::new(&self.wrapper, self.wrapper.fetch()?)
+    }
+
     pub fn dir(&self) -> &Path {
         self.wrapper.dir()
     }
@@ -75,19 +123,50 @@ impl Branchless {
 
 #[pymethods]
 impl Branchless {
+    /// Clone the repository, see `Wrapper::new` for the meaning of `filter`.
     #[new]
-    pub fn new(repo_url: &str) -> Result<Self> {
-        let wrapper = Wrapper::new(repo_url)?;
-        let commits = Self::commits_on_all_branchs(&wrapper)?;
-
-        Ok(Branchless { wrapper, commits })
+    #[pyo3(signature = (repo_url, filter=None))]
+    pub fn new(repo_url: &str, filter: Option<&str>) -> Result<Self> {
+        let wrapper = Wrapper::new(repo_url, filter)?;
+        Self::from_wrapper(wrapper)
     }
 
     #[staticmethod]
     pub fn from_local(local_dir_path: PathBuf) -> Result<Self> {
         let wrapper = Wrapper::from_local(local_dir_path)?;
-        let commits = Self::commits_on_all_branchs(&wrapper)?;
-        Ok(Branchless { wrapper, commits })
+        Self::from_wrapper(wrapper)
+    }
+
+    /// Fetch new commits from the origin remote and index them, the commits in
+    /// use are served until `refresh` swaps the new ones in. Nothing is borrowed
+    /// mutably, so other calls keep running while it fetches.
+    /// Returns the number of commits added.
+    pub fn fetch(&self, py: Python<'_>) -> Result<usize> {
+        let loaded = py.allow_threads(|| self.load())?;
+        let added = loaded.commits.len().saturating_sub(self.commits.len());
+        *self.fetched.lock().expect("fetched commits lock poisoned") = Some(loaded);
+        Ok(added)
+    }
+
+    /// Swap in the commits of the last `fetch`, fetching them first if there are
+    /// none. Returns the number of commits added.
+    pub fn refresh(&mut self, py: Python<'_>) -> Result<usize> {
+        let fetched = self
+            .fetched
+            .get_mut()
+            .expect("fetched commits lock poisoned")
+            .take();
+        let loaded = match fetched {
+            Some(loaded) => loaded,
+            None => py.allow_threads(|| self.load())?,
+        };
+        let added = loaded.commits.len().saturating_sub(self.commits.len());
+        self.wrapper.branches = loaded.branches;
+        self.authors = loaded.authors;
+        self.messages = loaded.messages;
+        // cursors handed out before keep iterating over the previous commits
+        self.commits = Arc::new(loaded.commits);
+        Ok(added)
     }
 
     pub fn default_branch(&self) -> &str {
@@ -98,24 +177,32 @@ impl Branchless {
         self.wrapper.list_branches()
     }
 
+    /// See `Wrapper::set_follow_renames`.
+    pub fn set_follow_renames(&mut self, follow: bool) {
+        self.wrapper.set_follow_renames(follow)
+    }
+
+    pub fn follows_renames(&self) -> bool {
+        self.wrapper.follows_renames()
+    }
+
     pub fn list_authors(&self, interval: (String, String)) -> Result<Vec<Author>> {
         let (from, to) = interval;
         let from = chrono::DateTime::parse_from_str(&from, DATETIME_FORMAT)?;
         let to = chrono::DateTime::parse_from_str(&to, DATETIME_FORMAT)?;
-        let authors: HashSet<Author> = self
-            .commits
-            .iter()
-            .within_period(from, to)
-            .map(|c| c.author.clone())
-            .collect();
-        Ok(authors.into_iter().collect::<Vec<Author>>())
+        Ok(self
+            .authors
+            .active_within(&self.commits, from, to)
+            .into_iter()
+            .map(|id| self.commits.author(id).clone())
+            .sorted()
+            .collect())
     }
 
     pub fn list_commits(&self, pagination: Pagination) -> Vec<CommitMeta> {
-        self.commits
-            .iter()
+        (0..self.commits.len())
             .with_pagination(pagination)
-            .cloned()
+            .map(|i| self.commits.get(i))
             .collect()
     }
 
@@ -127,30 +214,37 @@ impl Branchless {
         self.wrapper.commit_metadata(commit_hash)
     }
 
+    /// Commits of the authors matching `author_query` within the interval.
+    /// Authors are matched exactly, then case-insensitively and finally partially.
     pub fn commits_of(
         &self,
         author_query: AuthorQuery,
         interval: (String, String),
         pagination: Pagination,
     ) -> Result<Vec<CommitMeta>> {
-        let authors = self.list_authors(interval.clone())?;
-        if !authors.iter().any(|a| match &author_query {
-            AuthorQuery::Name(name) => &a.name == name,
-            AuthorQuery::Email(email) => &a.email == email,
-        }) {
-            return Err(GitError::AuthorNotFound(format!("{:?}", author_query)));
-        }
         let (from, to) = interval;
         let from = chrono::DateTime::parse_from_str(&from, DATETIME_FORMAT)?;
         let to = chrono::DateTime::parse_from_str(&to, DATETIME_FORMAT)?;
 
-        Ok(self
-            .commits
-            .iter()
-            .within_period(from, to)
-            .filter(|c| author_query.matches(c))
+        let postings: Vec<&[u32]> = self
+            .authors
+            .matching(&self.commits, &author_query)
+            .into_iter()
+            .map(|id| self.authors.commits_within(&self.commits, id, from, to))
+            .filter(|commits| !commits.is_empty())
+            .collect();
+        if postings.is_empty() {
+            return Err(GitError::AuthorNotFound(format!("{:?}", author_query)));
+        }
+
+        // in the order of all commits, newest first
+        Ok(postings
+            .into_iter()
+            .flatten()
+            .copied()
+            .sorted()
             .with_pagination(pagination)
-            .cloned()
+            .map(|i| self.commits.get(i as usize))
             .collect())
     }
 
@@ -164,19 +258,110 @@ impl Branchless {
         let to = chrono::DateTime::parse_from_str(to, DATETIME_FORMAT)?;
         Ok(self
             .commits
-            .iter()
-            .within_period(from, to)
+            .within(from, to)
             .with_pagination(pagination)
-            .cloned()
+            .map(|i| self.commits.get(i))
             .collect())
     }
 
+    /// Commits within the interval whose message matches the query, best matches
+    /// first. Returns the number of matching commits and the page of them.
+    pub fn search_messages(
+        &self,
+        query: MessageQuery,
+        interval: (String, String),
+        pagination: Pagination,
+    ) -> Result<(usize, Vec<CommitMeta>)> {
+        let (from, to) = interval;
+        let from = chrono::DateTime::parse_from_str(&from, DATETIME_FORMAT)?;
+        let to = chrono::DateTime::parse_from_str(&to, DATETIME_FORMAT)?;
+        let ranked = self.messages.search(&self.commits, &query, from, to)?;
+        let page = ranked
+            .iter()
+            .with_pagination(pagination)
+            .map(|&i| self.commits.get(i))
+            .collect();
+        Ok((ranked.len(), page))
+    }
+
+    /// Commits within the interval whose diffs add (`added`) or remove (`removed`)
+    /// `text`, newest first. A single word is matched as a word of the changed lines,
+    /// anything longer as a part of a changed line. The diffs of the commits are
+    /// indexed the first time a search covers them, which fetches their blobs from
+    /// the remote on partial clones (see `DiffIndex`).
+    /// Returns the number of matching commits and the page of them.
+    #[pyo3(signature = (text, interval, pagination, added=true, removed=true))]
+    pub fn search_diffs(
+        &self,
+        py: Python<'_>,
+        text: &str,
+        interval: (String, String),
+        pagination: Pagination,
+        added: bool,
+        removed: bool,
+    ) -> Result<(usize, Vec<CommitMeta>)> {
+        let (from, to) = interval;
+        let from = chrono::DateTime::parse_from_str(&from, DATETIME_FORMAT)?;
+        let to = chrono::DateTime::parse_from_str(&to, DATETIME_FORMAT)?;
+        let selected: Vec<usize> = self.commits.within(from, to).collect();
+        let hashes: Vec<String> = selected.iter().map(|&i| self.commits.hash(i)).collect();
+        let found = py.allow_threads(|| {
+            diffs::search(&self.diffs, self.dir(), &hashes, text, added, removed)
+        })?;
+        let page = found
+            .iter()
+            .with_pagination(pagination)
+            .map(|&i| self.commits.get(selected[i]))
+            .collect();
+        Ok((found.len(), page))
+    }
+
+    /// Iterate over the commits between `from` and `to` in batches of `batch_size`,
+    /// newest first unless `oldest_first` is set.
+    /// Commits are only converted when their batch is requested.
+    #[pyo3(signature = (from, to, batch_size, oldest_first=false))]
+    pub fn commit_cursor(
+        &self,
+        from: &str,
+        to: &str,
+        batch_size: usize,
+        oldest_first: bool,
+    ) -> Result<CommitCursor> {
+        let from = chrono::DateTime::parse_from_str(from, DATETIME_FORMAT)?;
+        let to = chrono::DateTime::parse_from_str(to, DATETIME_FORMAT)?;
+        let mut selected: Vec<usize> = self.commits.within(from, to).collect();
+        if oldest_first {
+            selected.reverse();
+        }
+        Ok(CommitCursor::new(
+            self.commits.clone(),
+            selected,
+            batch_size,
+        ))
+    }
+
     pub fn ancestral_distance(&self, from_commit: &str, to_commit: &str) -> Result<usize> {
         self.wrapper.ancestral_distance(from_commit, to_commit)
     }
 
     pub fn has_commit(&self, commit_hash: &str) -> bool {
-        self.commits.iter().any(|c| c.hash == commit_hash)
+        self.commits.position(commit_hash).is_some()
+    }
+
+    /// Unix timestamps of the commits of `list_commits`, readable by NumPy
+    /// without a copy: `numpy.asarray(branchless.timestamps())`.
+    pub fn timestamps(&self) -> CommitColumn {
+        CommitColumn::timestamps(self.commits.clone())
+    }
+
+    /// Ids of the authors of the commits of `list_commits`, indexes into `authors`.
+    pub fn author_ids(&self) -> CommitColumn {
+        CommitColumn::author_ids(self.commits.clone())
+    }
+
+    /// Authors of the repository, in the order of their ids.
+    pub fn authors(&self) -> Vec<Author> {
+        self.commits.authors().to_vec()
     }
 
     pub fn commits_on_file(
@@ -221,9 +406,12 @@ impl Branchless {
 
     pub fn list_files(&self, pattern: &str, interval: (String, String)) -> Result<Vec<String>> {
         let (from, to) = interval;
-        self.commits_between(&from, &to, Pagination::all())?
+        let from = chrono::DateTime::parse_from_str(&from, DATETIME_FORMAT)?;
+        let to = chrono::DateTime::parse_from_str(&to, DATETIME_FORMAT)?;
+        let selected: Vec<usize> = self.commits.within(from, to).collect();
+        selected
             .par_iter()
-            .map(|c| self.list_files_on_commit(&c.hash, pattern))
+            .map(|&i| self.list_files_on_commit(&self.commits.hash(i), pattern))
             .try_reduce(Vec::new, |acc, paths| {
                 Ok(acc
                     .into_iter()
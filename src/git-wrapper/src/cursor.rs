@@ -0,0 +1,144 @@
+use pyo3::{pyclass, pymethods, PyRef, PyRefMut};
+use std::sync::Arc;
+
+use crate::store::CommitStore;
+use crate::wrapper::CommitMeta;
+
+/// Iterates over a selection of commits in batches.
+///
+/// The cursor shares the commits of the repository and only holds the
+/// positions of the selected ones, so a batch is converted to Python objects
+/// when it is requested rather than the whole selection upfront.
+#[pyclass]
+pub struct CommitCursor {
+    commits: Arc<CommitStore>,
+    selected: Vec<usize>,
+    position: usize,
+    batch_size: usize,
+}
+
+impl CommitCursor {
+    /// Select the commits of `commits` at `selected`, yielded in that order.
+    pub fn new(commits: Arc<CommitStore>, selected: Vec<usize>, batch_size: usize) -> Self {
+        Self {
+            commits,
+            selected,
+            position: 0,
+            batch_size: batch_size.max(1),
+        }
+    }
+
+    fn next_batch(&mut self) -> Option<Vec<CommitMeta>> {
+        if self.position >= self.selected.len() {
+            return None;
+        }
+        let end = (self.position + self.batch_size).min(self.selected.len());
+        let batch = self.selected[self.position..end]
+            .iter()
+            .map(|&i| self.commits.get(i))
+            .collect();
+        self.position = end;
+        Some(batch)
+    }
+}
+
+#[pymethods]
+impl CommitCursor {
+    fn __iter__(slf: PyRef<'_, Self>) -> PyRef<'_, Self> {
+        slf
+    }
+
+    fn __next__(mut slf: PyRefMut<'_, Self>) -> Option<Vec<CommitMeta>> {
+        slf.next_batch()
+    }
+
+    /// Total number of selected commits
+    fn __len__(&self) -> usize {
+        self.selected.len()
+    }
+
+    /// Number of selected commits that are not yielded yet
+    #[getter]
+    pub fn remaining(&self) -> usize {
+        self.selected.len() - self.position
+    }
+
+    #[getter]
+    pub fn batch_size(&self) -> usize {
+        self.batch_size
+    }
+
+    /// Change the size of the following batches
+    #[setter]
+    pub fn set_batch_size(&mut self, batch_size: usize) {
+        self.batch_size = batch_size.max(1);
+    }
+}
+
+#[cfg(test)]
+mod test {
+    use std::sync::Arc;
+
+    use chrono::DateTime;
+
+    use super::CommitCursor;
+    use crate::store::CommitStore;
+    use crate::wrapper::{Author, CommitMeta};
+
+    fn commits(n: usize) -> Arc<CommitStore> {
+        let commits = (0..n)
+            .map(|i| CommitMeta {
+                hash: format!("{i:040x}"),
+                author: Author {
+                    name: "user1".into(),
+                    email: "user1@test.com".into(),
+                },
+                date: DateTime::parse_from_rfc3339("2024-01-01T00:00:00+00:00").unwrap(),
+                message: format!("commit {i}"),
+            })
+            .collect();
+        Arc::new(CommitStore::from_commits(commits).unwrap())
+    }
+
+    // position of each commit of the batch
+    fn hashes(batch: Vec<CommitMeta>) -> Vec<String> {
+        batch
+            .into_iter()
+            .map(|c| u64::from_str_radix(&c.hash, 16).unwrap().to_string())
+            .collect()
+    }
+
+    #[test]
+    fn batches() {
+        let mut cursor = CommitCursor::new(commits(5), vec![0, 1, 2, 3, 4], 2);
+        assert_eq!(hashes(cursor.next_batch().unwrap()), vec!["0", "1"]);
+        assert_eq!(cursor.remaining(), 3);
+        assert_eq!(hashes(cursor.next_batch().unwrap()), vec!["2", "3"]);
+        assert_eq!(hashes(cursor.next_batch().unwrap()), vec!["4"]);
+        assert!(cursor.next_batch().is_none());
+        assert_eq!(cursor.remaining(), 0);
+    }
+
+    #[test]
+    fn selection_order() {
+        let mut cursor = CommitCursor::new(commits(5), vec![4, 2, 0], 10);
+        assert_eq!(hashes(cursor.next_batch().unwrap()), vec!["4", "2", "0"]);
+        assert!(cursor.next_batch().is_none());
+    }
+
+    #[test]
+    fn resize_batches() {
+        let mut cursor = CommitCursor::new(commits(5), vec![0, 1, 2, 3, 4], 0);
+        assert_eq!(cursor.batch_size(), 1);
+        assert_eq!(hashes(cursor.next_batch().unwrap()), vec!["0"]);
+        cursor.set_batch_size(3);
+        assert_eq!(hashes(cursor.next_batch().unwrap()), vec!["1", "2", "3"]);
+    }
+
+    #[test]
+    fn empty() {
+        let mut cursor = CommitCursor::new(commits(3), vec![], 2);
+        assert_eq!(cursor.remaining(), 0);
+        assert!(cursor.next_batch().is_none());
+    }
+}
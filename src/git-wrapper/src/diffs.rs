@@ -0,0 +1,382 @@
+use rayon::prelude::*;
+use std::collections::{HashMap, HashSet};
+use std::io::Write;
+use std::path::Path;
+use std::process::{Command, Stdio};
+use std::sync::Mutex;
+
+use crate::search::words;
+use crate::{GitError, Result};
+
+// commits diffed by one git process
+const CHUNK_SIZE: usize = 256;
+
+// lines added and removed by a commit, compared to its first parent
+#[derive(Debug, Default, PartialEq, Eq)]
+struct ChangedLines {
+    hash: String,
+    added: Vec<String>,
+    removed: Vec<String>,
+}
+
+// parses the output of `git log -p -U0 --format=%x1e%H`
+fn parse_log(log: &str) -> Vec<ChangedLines> {
+    let mut commits = Vec::new();
+    for entry in log.split('\x1e').filter(|entry| !entry.is_empty()) {
+        let mut lines = entry.lines();
+        let Some(hash) = lines.next() else {
+            continue;
+        };
+        let mut commit = ChangedLines {
+            hash: hash.trim().to_string(),
+            ..Default::default()
+        };
+        // file headers such as `--- a/path` only come before the first hunk
+        let mut in_hunk = false;
+        for line in lines {
+            if line.starts_with("diff --git ") {
+                in_hunk = false;
+            } else if line.starts_with("@@ ") {
+                in_hunk = true;
+            } else if in_hunk {
+                match line.as_bytes().first() {
+                    Some(b'+') => commit.added.push(line[1..].to_string()),
+                    Some(b'-') => commit.removed.push(line[1..].to_string()),
+                    _ => {}
+                }
+            }
+        }
+        commits.push(commit);
+    }
+    commits
+}
+
+// changed lines of the commits, in one git process
+fn changed_lines(dir: &Path, hashes: &[String]) -> Result<Vec<ChangedLines>> {
+    let mut child = Command::new("git")
+        .arg("log")
+        .arg("--no-walk=unsorted")
+        .arg("--stdin")
+        .arg("-p")
+        .arg("-U0")
+        .arg("--format=%x1e%H")
+        .arg("--no-color")
+        .arg("--no-ext-diff")
+        .arg("--diff-merges=first-parent")
+        .current_dir(dir)
+        .stdin(Stdio::piped())
+        .stdout(Stdio::piped())
+        .stderr(Stdio::piped())
+        .spawn()?;
+    // git reads all the revisions before writing anything
+    if let Some(mut stdin) = child.stdin.take() {
+        stdin.write_all(format!("{}\n", hashes.join("\n")).as_bytes())?;
+    }
+    let output = child.wait_with_output()?;
+
+    match output.status.success() {
+        false => {
+            let error_message = String::from_utf8_lossy(&output.stderr).to_string();
+            Err(GitError::GitCommandErr(error_message))
+        }
+        true => Ok(parse_log(&String::from_utf8_lossy(&output.stdout))),
+    }
+}
+
+// words of the lines added and removed by a commit
+type Words = (String, HashSet<String>, HashSet<String>);
+
+// words of the lines changed by the commits, the diffs are produced in parallel
+fn changed_words(dir: &Path, hashes: &[String]) -> Result<Vec<Words>> {
+    let changed: Vec<Vec<Words>> = hashes
+        .par_chunks(CHUNK_SIZE)
+        .map(|chunk| -> Result<Vec<Words>> {
+            Ok(changed_lines(dir, chunk)?
+                .into_iter()
+                .map(|commit| {
+                    let added = commit.added.iter().flat_map(|l| words(l)).collect();
+                    let removed = commit.removed.iter().flat_map(|l| words(l)).collect();
+                    (commit.hash, added, removed)
+                })
+                .collect())
+        })
+        .collect::<Result<_>>()?;
+    Ok(changed.into_iter().flatten().collect())
+}
+
+// commits adding and removing a term
+#[derive(Default)]
+struct Changes {
+    added: Vec<u32>,
+    removed: Vec<u32>,
+}
+
+/// Index of the words of the lines added and removed by each commit.
+///
+/// Diffs are expensive to produce, so commits are indexed the first time a
+/// search covers them rather than when the repository is loaded, and stay
+/// indexed across refreshes since they are identified by their hash.
+///
+/// On partial clones (`--filter=blob:none`) git fetches the blobs missing to
+/// diff a commit from the remote, in one request per commit, so the first
+/// search over a window pays a round trip for each of its commits that is not
+/// indexed yet. The fetched blobs are kept in the clone, later diffs of the same
+/// commits are produced locally.
+#[derive(Default)]
+pub struct DiffIndex {
+    // ids of the indexed commits
+    ids: HashMap<String, u32>,
+    terms: HashMap<String, u32>,
+    changes: Vec<Changes>,
+}
+
+impl DiffIndex {
+    pub fn new() -> Self {
+        Self::default()
+    }
+
+    fn term(&mut self, word: String) -> usize {
+        let next = self.changes.len() as u32;
+        let term = *self.terms.entry(word).or_insert(next);
+        if term == next {
+            self.changes.push(Changes::default());
+        }
+        term as usize
+    }
+
+    /// Index the commits of `hashes` that are not indexed yet, the diffs are
+    /// produced in parallel. Returns the number of commits indexed.
+    pub fn extend(&mut self, dir: &Path, hashes: &[String]) -> Result<usize> {
+        let missing = self.missing(hashes);
+        Ok(self.insert(changed_words(dir, &missing)?))
+    }
+
+    // the commits of `hashes` that are not indexed yet
+    fn missing(&self, hashes: &[String]) -> Vec<String> {
+        hashes
+            .iter()
+            .filter(|hash| !self.ids.contains_key(*hash))
+            .cloned()
+            .collect::<HashSet<_>>()
+            .into_iter()
+            .collect()
+    }
+
+    // index the words of commits, the ones indexed meanwhile are skipped.
+    // Returns the number of commits indexed.
+    fn insert(&mut self, indexed: Vec<Words>) -> usize {
+        let mut count = 0;
+        for (hash, added, removed) in indexed {
+            if self.ids.contains_key(&hash) {
+                continue;
+            }
+            let id = self.ids.len() as u32;
+            self.ids.insert(hash, id);
+            for word in added {
+                let term = self.term(word);
+                self.changes[term].added.push(id);
+            }
+            for word in removed {
+                let term = self.term(word);
+                self.changes[term].removed.push(id);
+            }
+            count += 1;
+        }
+        count
+    }
+
+    /// Ids of the indexed commits adding or removing every word.
+    fn changing(&self, words: &[String], added: bool, removed: bool) -> HashSet<u32> {
+        let mut matching: Option<HashSet<u32>> = None;
+        for word in words {
+            let Some(&term) = self.terms.get(word) else {
+                return HashSet::new();
+            };
+            let changes = &self.changes[term as usize];
+            let mut commits: HashSet<u32> = HashSet::new();
+            if added {
+                commits.extend(&changes.added);
+            }
+            if removed {
+                commits.extend(&changes.removed);
+            }
+            matching = Some(match matching {
+                Some(matching) => matching.intersection(&commits).copied().collect(),
+                None => commits,
+            });
+        }
+        matching.unwrap_or_default()
+    }
+}
+
+/// Positions in `hashes` of the commits adding (`added`) or removing
+/// (`removed`) `text`, in the order of `hashes`.
+///
+/// A single word is matched case-insensitively as a word of the changed
+/// lines. Longer texts are matched as they are within a changed line: the index
+/// narrows the commits down to the ones changing all of their words and
+/// only the diffs of those are read again. Only words are kept in memory, so
+/// every such query diffs its candidates again, locally but at the cost of a
+/// `git log -p` over them.
+///
+/// The commits not indexed yet are diffed without holding the lock of the
+/// index, searches of other sessions go on meanwhile. Commits diffed by two
+/// searches at the same time are indexed once.
+pub fn search(
+    index: &Mutex<DiffIndex>,
+    dir: &Path,
+    hashes: &[String],
+    text: &str,
+    added: bool,
+    removed: bool,
+) -> Result<Vec<usize>> {
+    let text = text.trim();
+    let query: Vec<String> = words(text).collect();
+    if query.is_empty() {
+        return Err(GitError::InvalidQuery(format!("no words in [{text}]")));
+    }
+
+    let missing = index
+        .lock()
+        .expect("diff index lock poisoned")
+        .missing(hashes);
+    let indexed = changed_words(dir, &missing)?;
+    let candidates: Vec<usize> = {
+        let mut index = index.lock().expect("diff index lock poisoned");
+        index.insert(indexed);
+        let changing = index.changing(&query, added, removed);
+        hashes
+            .iter()
+            .enumerate()
+            .filter(|(_, hash)| index.ids.get(*hash).is_some_and(|id| changing.contains(id)))
+            .map(|(i, _)| i)
+            .collect()
+    };
+    if query.len() == 1 && query[0] == text.to_lowercase() {
+        return Ok(candidates);
+    }
+
+    let candidate_hashes: Vec<String> = candidates.iter().map(|&i| hashes[i].clone()).collect();
+    let containing: HashSet<String> = candidate_hashes
+        .par_chunks(CHUNK_SIZE)
+        .map(|chunk| changed_lines(dir, chunk))
+        .collect::<Result<Vec<_>>>()?
+        .into_iter()
+        .flatten()
+        .filter(|commit| {
+            (added && commit.added.iter().any(|line| line.contains(text)))
+                || (removed && commit.removed.iter().any(|line| line.contains(text)))
+        })
+        .map(|commit| commit.hash)
+        .collect();
+    Ok(candidates
+        .into_iter()
+        .filter(|&i| containing.contains(&hashes[i]))
+        .collect())
+}
+
+#[cfg(test)]
+mod test {
+    use std::process::Command;
+    use std::sync::Mutex;
+
+    use temp_dir::TempDir;
+
+    use super::{parse_log, search, ChangedLines, DiffIndex};
+    use crate::{GitError, Result};
+
+    const LOG: &str = "\x1eaaaa
+
+diff --git a/f.txt b/f.txt
+index 422c2b7..1cf989d 100644
+--- a/f.txt
++++ b/f.txt
+@@ -2 +2,2 @@ a
+-b
++--- x
++c
+diff --git a/g.cfg b/g.cfg
+new file mode 100644
+--- /dev/null
++++ b/g.cfg
+@@ -0,0 +1 @@
++key=1
+\x1ebbbb
+";
+
+    #[test]
+    fn parse() {
+        assert_eq!(
+            parse_log(LOG),
+            vec![
+                ChangedLines {
+                    hash: "aaaa".into(),
+                    added: vec!["--- x".into(), "c".into(), "key=1".into()],
+                    removed: vec!["b".into()],
+                },
+                ChangedLines {
+                    hash: "bbbb".into(),
+                    ..Default::default()
+                },
+            ]
+        );
+    }
+
+    // the test repository and the hashes of its commits, by message
+    fn repository() -> Result<(TempDir, Vec<(String, String)>)> {
+        let dir = TempDir::new()?;
+        let output = Command::new("bash")
+            .arg("./setup_test_repo.sh")
+            .arg(dir.path())
+            .output()?;
+        if !output.status.success() {
+            let error_message = String::from_utf8_lossy(&output.stderr).to_string();
+            return Err(GitError::GitCommandErr(error_message));
+        }
+        let output = Command::new("git")
+            .args(["log", "--all", "--format=%H %s"])
+            .current_dir(dir.path())
+            .output()?;
+        let commits = String::from_utf8_lossy(&output.stdout)
+            .lines()
+            .filter_map(|line| line.split_once(' '))
+            .map(|(hash, message)| (hash.to_string(), message.to_string()))
+            .collect();
+        Ok((dir, commits))
+    }
+
+    #[test]
+    fn added_and_removed() -> Result<()> {
+        let (dir, commits) = repository()?;
+        let hashes: Vec<String> = commits.iter().map(|(hash, _)| hash.clone()).collect();
+        let index = Mutex::new(DiffIndex::new());
+        let messages = |found: Vec<usize>| -> Vec<String> {
+            let mut messages: Vec<String> =
+                found.into_iter().map(|i| commits[i].1.clone()).collect();
+            messages.sort();
+            messages
+        };
+
+        let found = search(&index, dir.path(), &hashes, "USER3", true, true)?;
+        assert_eq!(messages(found), vec!["fifth", "fourth"]);
+        // every commit is indexed once
+        assert_eq!(index.lock().unwrap().extend(dir.path(), &hashes)?, 0);
+
+        let found = search(&index, dir.path(), &hashes, "user1 in branch1", true, true)?;
+        assert_eq!(messages(found), vec!["third"]);
+        // all words are changed by the first commit but not next to each other
+        let found = search(&index, dir.path(), &hashes, "master in user1", true, true)?;
+        assert!(found.is_empty());
+        let found = search(&index, dir.path(), &hashes, "user3", false, true)?;
+        assert!(found.is_empty());
+        // only the given commits are searched
+        let found = search(&index, dir.path(), &hashes[..1], "repo", true, true)?;
+        assert_eq!(found, vec![0]);
+
+        assert!(matches!(
+            search(&index, dir.path(), &hashes, "--", true, true),
+            Err(GitError::InvalidQuery(_))
+        ));
+        Ok(())
+    }
+}
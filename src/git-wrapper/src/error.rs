@@ -27,6 +27,8 @@ pub enum GitError {
     BranchNotFound(String),
     #[error("No Author matched for this Author Query: {0}")]
     AuthorNotFound(String),
+    #[error("invalid search query: {0}")]
+    InvalidQuery(String),
 }
 pub type Result<T, E = GitError> = core::result::Result<T, E>;
 
@@ -1,6 +1,11 @@
 mod error;
 mod wrapper;
+mod authors;
 mod branchless;
+mod cursor;
+mod store;
+mod search;
+mod diffs;
 
 use error::BranchNotFoundErr;
 use pyo3::prelude::*;
@@ -8,6 +13,8 @@ use pyo3::prelude::*;
 pub use error::Result;
 pub use error::GitError;
 pub use branchless::Branchless;
+pub use cursor::CommitCursor;
+pub use store::CommitStore;
 pub use wrapper::Wrapper;
 pub use wrapper::Pagination;
 pub use wrapper::PaginationExt;
@@ -22,6 +29,9 @@ fn git_wrapper(py: Python, m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_class::<wrapper::AuthorQuery>()?;
     m.add_class::<wrapper::Pagination>()?;
     m.add_class::<branchless::Branchless>()?;
+    m.add_class::<cursor::CommitCursor>()?;
+    m.add_class::<store::CommitColumn>()?;
+    m.add_class::<search::MessageQuery>()?;
     m.add("BranchNotFoundErr", py.get_type::<BranchNotFoundErr>())?;
 
     Ok(())
@@ -0,0 +1,317 @@
+use chrono::{DateTime, FixedOffset};
+use pyo3::pyclass;
+use regex::RegexBuilder;
+use std::collections::{HashMap, HashSet};
+
+use crate::store::CommitStore;
+use crate::{GitError, Result};
+
+// BM25 parameters
+const K1: f64 = 1.2;
+const B: f64 = 0.75;
+// compiled size limit of regex queries
+const REGEX_SIZE_LIMIT: usize = 1 << 20;
+
+/// Query of the commit messages.
+#[derive(Debug, Clone)]
+#[pyclass]
+pub enum MessageQuery {
+    /// messages containing any of the words, ranked by BM25
+    Keywords(String),
+    /// messages containing the words in this order
+    Phrase(String),
+    /// messages matching the regular expression, case-insensitively
+    Regex(String),
+}
+
+// lowercased words of a text, runs of alphanumeric characters and underscores
+pub(crate) fn words(text: &str) -> impl Iterator<Item = String> + '_ {
+    text.split(|c: char| !(c.is_alphanumeric() || c == '_'))
+        .filter(|word| !word.is_empty())
+        .map(str::to_lowercase)
+}
+
+// commits containing a term, in store order, with the number of occurrences
+#[derive(Default)]
+struct Postings {
+    positions: Vec<u32>,
+    counts: Vec<u8>,
+}
+
+/// Inverted index of the words of the commit messages.
+///
+/// Built once when the commits are loaded, so a query only reads the
+/// postings of its words instead of scanning every message. Regex queries
+/// have no words to look up and scan the messages of the period.
+pub struct MessageIndex {
+    terms: HashMap<String, u32>,
+    postings: Vec<Postings>,
+    // number of words of each message
+    lengths: Vec<u32>,
+    average_length: f64,
+}
+
+impl MessageIndex {
+    pub fn new(commits: &CommitStore) -> Self {
+        let mut terms: HashMap<String, u32> = HashMap::new();
+        let mut postings: Vec<Postings> = Vec::new();
+        let mut lengths = Vec::with_capacity(commits.len());
+        // occurrences of the terms of the current message
+        let mut counts: HashMap<u32, u32> = HashMap::new();
+        for i in 0..commits.len() {
+            counts.clear();
+            let mut length = 0;
+            for word in words(commits.message(i)) {
+                length += 1;
+                let term = match terms.get(&word) {
+                    Some(&term) => term,
+                    None => {
+                        let term = postings.len() as u32;
+                        terms.insert(word, term);
+                        postings.push(Postings::default());
+                        term
+                    }
+                };
+                *counts.entry(term).or_default() += 1;
+            }
+            for (&term, &count) in &counts {
+                let posting = &mut postings[term as usize];
+                posting.positions.push(i as u32);
+                posting.counts.push(count.min(u8::MAX as u32) as u8);
+            }
+            lengths.push(length);
+        }
+        for posting in postings.iter_mut() {
+            posting.positions.shrink_to_fit();
+            posting.counts.shrink_to_fit();
+        }
+
+        let total: u64 = lengths.iter().map(|&l| l as u64).sum();
+        Self {
+            terms,
+            postings,
+            average_length: total as f64 / lengths.len().max(1) as f64,
+            lengths,
+        }
+    }
+
+    // BM25 score of a term occurring `count` times in the message at `position`
+    fn score(&self, term: u32, position: u32, count: u8) -> f64 {
+        let documents = self.lengths.len() as f64;
+        let frequency = self.postings[term as usize].positions.len() as f64;
+        let idf = (1.0 + (documents - frequency + 0.5) / (frequency + 0.5)).ln();
+        let count = count as f64;
+        let length = self.lengths[position as usize] as f64 / self.average_length.max(1.0);
+        idf * count * (K1 + 1.0) / (count + K1 * (1.0 - B + B * length))
+    }
+
+    // distinct known terms of a text, an error if it has no words
+    fn terms_of(&self, text: &str) -> Result<Vec<Option<u32>>> {
+        let mut words: Vec<String> = words(text).collect();
+        if words.is_empty() {
+            return Err(GitError::InvalidQuery(format!("no words in [{text}]")));
+        }
+        let mut seen = HashSet::new();
+        words.retain(|word| seen.insert(word.clone()));
+        Ok(words.iter().map(|w| self.terms.get(w).copied()).collect())
+    }
+
+    /// Positions of the commits within the period matching the query, best
+    /// matches first and newest first among equal ones.
+    pub fn search(
+        &self,
+        commits: &CommitStore,
+        query: &MessageQuery,
+        from: DateTime<FixedOffset>,
+        to: DateTime<FixedOffset>,
+    ) -> Result<Vec<usize>> {
+        let timestamps = commits.timestamps();
+        let (start, end) = (from.timestamp(), to.timestamp());
+        let within = |i: u32| (start..=end).contains(&timestamps[i as usize]);
+
+        let mut scored: Vec<(usize, f64)> = match query {
+            MessageQuery::Keywords(text) => {
+                let mut scores: HashMap<u32, f64> = HashMap::new();
+                for term in self.terms_of(text)?.into_iter().flatten() {
+                    let posting = &self.postings[term as usize];
+                    for (&i, &count) in posting.positions.iter().zip(&posting.counts) {
+                        if within(i) {
+                            *scores.entry(i).or_default() += self.score(term, i, count);
+                        }
+                    }
+                }
+                scores.into_iter().map(|(i, s)| (i as usize, s)).collect()
+            }
+            MessageQuery::Phrase(text) => {
+                let phrase: Vec<String> = words(text).collect();
+                // a word that is in no message matches nothing
+                let Some(terms) = self
+                    .terms_of(text)?
+                    .into_iter()
+                    .collect::<Option<Vec<u32>>>()
+                else {
+                    return Ok(Vec::new());
+                };
+                let posting = move |term: u32| &self.postings[term as usize];
+                let rarest = *terms
+                    .iter()
+                    .min_by_key(|&&t| posting(t).positions.len())
+                    .expect("a query has at least one word");
+                let count_in = |term: u32, i: u32| {
+                    let posting = posting(term);
+                    posting
+                        .positions
+                        .binary_search(&i)
+                        .ok()
+                        .map(|found| posting.counts[found])
+                };
+
+                let mut scored = Vec::new();
+                for &i in &posting(rarest).positions {
+                    if !within(i) {
+                        continue;
+                    }
+                    let Some(counts) = terms
+                        .iter()
+                        .map(|&t| count_in(t, i))
+                        .collect::<Option<Vec<u8>>>()
+                    else {
+                        continue;
+                    };
+                    // the words are all there, check that they follow each other
+                    let message: Vec<String> = words(commits.message(i as usize)).collect();
+                    if message.windows(phrase.len()).any(|w| w == phrase) {
+                        let score = terms
+                            .iter()
+                            .zip(counts)
+                            .map(|(&t, count)| self.score(t, i, count))
+                            .sum::<f64>();
+                        scored.push((i as usize, score));
+                    }
+                }
+                scored
+            }
+            MessageQuery::Regex(pattern) => {
+                let regex = RegexBuilder::new(pattern)
+                    .case_insensitive(true)
+                    .size_limit(REGEX_SIZE_LIMIT)
+                    .build()
+                    .map_err(|e| GitError::InvalidQuery(e.to_string()))?;
+                commits
+                    .within(from, to)
+                    .map(|i| (i, regex.find_iter(commits.message(i)).count() as f64))
+                    .filter(|&(_, matches)| matches > 0.0)
+                    .collect()
+            }
+        };
+
+        scored.sort_by(|a, b| b.1.total_cmp(&a.1).then(a.0.cmp(&b.0)));
+        Ok(scored.into_iter().map(|(i, _)| i).collect())
+    }
+}
+
+#[cfg(test)]
+mod test {
+    use chrono::DateTime;
+
+    use super::{MessageIndex, MessageQuery};
+    use crate::store::CommitStore;
+    use crate::wrapper::{Author, CommitMeta};
+    use crate::GitError;
+
+    fn commits() -> CommitStore {
+        let messages = [
+            "Fix null pointer in parser (PROJ-12)",
+            "parser: handle empty input",
+            "Null checks for the pointer of the lexer",
+            "Bump version",
+            "Fix NullPointerException in parser, parser tests",
+        ];
+        let commits = messages
+            .iter()
+            .enumerate()
+            .map(|(i, message)| CommitMeta {
+                hash: format!("{i:040x}"),
+                author: Author {
+                    name: "user1".into(),
+                    email: "user1@test.com".into(),
+                },
+                // newest first, one day apart
+                date: DateTime::parse_from_rfc3339(&format!(
+                    "2024-01-{:02}T00:00:00+00:00",
+                    10 - i
+                ))
+                .unwrap(),
+                message: message.to_string(),
+            })
+            .collect();
+        CommitStore::from_commits(commits).unwrap()
+    }
+
+    fn search(query: MessageQuery, from: u32, to: u32) -> Vec<usize> {
+        let commits = commits();
+        let index = MessageIndex::new(&commits);
+        let date = |day: u32| {
+            DateTime::parse_from_rfc3339(&format!("2024-01-{day:02}T00:00:00+00:00")).unwrap()
+        };
+        index
+            .search(&commits, &query, date(from), date(to))
+            .unwrap()
+    }
+
+    #[test]
+    fn keywords() {
+        let found = search(MessageQuery::Keywords("parser".into()), 1, 31);
+        assert_eq!(found.len(), 3);
+        // mentioned twice
+        assert_eq!(found[0], 4);
+        // more and rarer words rank first
+        let found = search(MessageQuery::Keywords("null pointer lexer".into()), 1, 31);
+        assert_eq!(found, vec![2, 0]);
+        assert!(search(MessageQuery::Keywords("missing".into()), 1, 31).is_empty());
+    }
+
+    #[test]
+    fn phrase() {
+        let found = search(MessageQuery::Phrase("NULL pointer".into()), 1, 31);
+        assert_eq!(found, vec![0]);
+        // punctuation is ignored
+        let found = search(MessageQuery::Phrase("proj 12".into()), 1, 31);
+        assert_eq!(found, vec![0]);
+        assert!(search(MessageQuery::Phrase("pointer null".into()), 1, 31).is_empty());
+        assert!(search(MessageQuery::Phrase("null missing".into()), 1, 31).is_empty());
+    }
+
+    #[test]
+    fn regex() {
+        let found = search(MessageQuery::Regex(r"null\s?pointer".into()), 1, 31);
+        assert_eq!(found, vec![0, 4]);
+        let found = search(MessageQuery::Regex(r"PROJ-\d+".into()), 1, 31);
+        assert_eq!(found, vec![0]);
+    }
+
+    #[test]
+    fn within_period() {
+        // commit 4 is dated on the 6th, commit 0 on the 10th
+        let found = search(MessageQuery::Keywords("parser".into()), 6, 8);
+        assert_eq!(found, vec![4]);
+        let found = search(MessageQuery::Regex("parser".into()), 9, 10);
+        assert_eq!(found, vec![0, 1]);
+    }
+
+    #[test]
+    fn invalid() {
+        let commits = commits();
+        let index = MessageIndex::new(&commits);
+        let date = DateTime::parse_from_rfc3339("2024-01-01T00:00:00+00:00").unwrap();
+        for query in [
+            MessageQuery::Keywords(" - ".into()),
+            MessageQuery::Regex("(".into()),
+        ] {
+            assert!(matches!(
+                index.search(&commits, &query, date, date),
+                Err(GitError::InvalidQuery(_))
+            ));
+        }
+    }
+}
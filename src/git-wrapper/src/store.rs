@@ -0,0 +1,369 @@
+use chrono::{DateTime, FixedOffset, TimeZone};
+use pyo3::exceptions::PyBufferError;
+use pyo3::{ffi, pyclass, pymethods, Bound, PyResult};
+use std::collections::HashMap;
+use std::ffi::CStr;
+use std::fmt::Write;
+use std::os::raw::{c_char, c_int, c_void};
+use std::ptr;
+use std::sync::Arc;
+
+use crate::wrapper::{Author, CommitMeta};
+use crate::{GitError, Result};
+
+/// Commits of a repository stored column by column.
+///
+/// Hashes are packed into bytes, authors are interned, dates are kept as
+/// unix timestamps next to their UTC offsets and all messages share one
+/// arena, so a commit costs a few dozen bytes besides its message instead of
+/// a handful of heap allocations. `CommitMeta`s are only built for the
+/// commits that are returned.
+pub struct CommitStore {
+    // `hash_width` bytes of each hash
+    hashes: Vec<u8>,
+    hash_width: usize,
+    // positions of the commits ordered by hash, for lookups
+    by_hash: Vec<u32>,
+    timestamps: Vec<i64>,
+    // seconds east of UTC of each date
+    offsets: Vec<i32>,
+    author_ids: Vec<u32>,
+    authors: Vec<Author>,
+    messages: String,
+    // end of each message in `messages`
+    message_ends: Vec<usize>,
+}
+
+// bytes of a hexadecimal hash
+fn unhex(hex: &str) -> Option<Vec<u8>> {
+    if hex.len() % 2 != 0 || !hex.bytes().all(|b| b.is_ascii_hexdigit()) {
+        return None;
+    }
+    (0..hex.len())
+        .step_by(2)
+        .map(|i| u8::from_str_radix(&hex[i..i + 2], 16).ok())
+        .collect()
+}
+
+impl CommitStore {
+    /// Store the commits in their order, hashes are expected to be hexadecimal
+    /// and of the same length (SHA-1 or SHA-256).
+    pub fn from_commits(commits: Vec<CommitMeta>) -> Result<Self> {
+        let len = commits.len();
+        let hash_width = commits.first().map_or(20, |c| c.hash.len() / 2);
+        let mut store = Self {
+            hashes: Vec::with_capacity(len * hash_width),
+            hash_width,
+            by_hash: Vec::new(),
+            timestamps: Vec::with_capacity(len),
+            offsets: Vec::with_capacity(len),
+            author_ids: Vec::with_capacity(len),
+            authors: Vec::new(),
+            messages: String::new(),
+            message_ends: Vec::with_capacity(len),
+        };
+
+        let mut ids: HashMap<Author, u32> = HashMap::new();
+        for commit in commits {
+            let hash = unhex(&commit.hash)
+                .filter(|hash| hash.len() == hash_width)
+                .ok_or_else(|| {
+                    GitError::MalFormedData(format!("unexpected commit hash: [{}]", commit.hash))
+                })?;
+            store.hashes.extend_from_slice(&hash);
+            store.timestamps.push(commit.date.timestamp());
+            store.offsets.push(commit.date.offset().local_minus_utc());
+            let id = match ids.get(&commit.author) {
+                Some(&id) => id,
+                None => {
+                    let id = store.authors.len() as u32;
+                    ids.insert(commit.author.clone(), id);
+                    store.authors.push(commit.author);
+                    id
+                }
+            };
+            store.author_ids.push(id);
+            store.messages.push_str(&commit.message);
+            store.message_ends.push(store.messages.len());
+        }
+        store.messages.shrink_to_fit();
+        store.authors.shrink_to_fit();
+
+        let mut by_hash: Vec<u32> = (0..len as u32).collect();
+        by_hash.sort_unstable_by(|&a, &b| {
+            store
+                .hash_bytes(a as usize)
+                .cmp(store.hash_bytes(b as usize))
+        });
+        store.by_hash = by_hash;
+        Ok(store)
+    }
+
+    pub fn len(&self) -> usize {
+        self.timestamps.len()
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.timestamps.is_empty()
+    }
+
+    fn hash_bytes(&self, i: usize) -> &[u8] {
+        &self.hashes[i * self.hash_width..(i + 1) * self.hash_width]
+    }
+
+    pub fn hash(&self, i: usize) -> String {
+        let mut hash = String::with_capacity(self.hash_width * 2);
+        for byte in self.hash_bytes(i) {
+            let _ = write!(hash, "{byte:02x}");
+        }
+        hash
+    }
+
+    pub fn date(&self, i: usize) -> DateTime<FixedOffset> {
+        FixedOffset::east_opt(self.offsets[i])
+            .and_then(|offset| offset.timestamp_opt(self.timestamps[i], 0).single())
+            .expect("dates of the store come from valid dates")
+    }
+
+    pub fn message(&self, i: usize) -> &str {
+        let start = if i == 0 { 0 } else { self.message_ends[i - 1] };
+        &self.messages[start..self.message_ends[i]]
+    }
+
+    pub fn author(&self, id: usize) -> &Author {
+        &self.authors[id]
+    }
+
+    /// Interned authors, indexed by the ids of `author_ids`
+    pub fn authors(&self) -> &[Author] {
+        &self.authors
+    }
+
+    /// Author id of each commit
+    pub fn author_ids(&self) -> &[u32] {
+        &self.author_ids
+    }
+
+    /// Unix timestamp of each commit
+    pub fn timestamps(&self) -> &[i64] {
+        &self.timestamps
+    }
+
+    /// The commit at position `i`, built from the columns.
+    pub fn get(&self, i: usize) -> CommitMeta {
+        CommitMeta {
+            hash: self.hash(i),
+            author: self.authors[self.author_ids[i] as usize].clone(),
+            date: self.date(i),
+            message: self.message(i).to_string(),
+        }
+    }
+
+    /// Position of the commit with the full hash `hash`.
+    pub fn position(&self, hash: &str) -> Option<usize> {
+        let hash = unhex(hash).filter(|hash| hash.len() == self.hash_width)?;
+        self.by_hash
+            .binary_search_by(|&i| self.hash_bytes(i as usize).cmp(&hash))
+            .ok()
+            .map(|found| self.by_hash[found] as usize)
+    }
+
+    /// Positions of the commits dated within the period, in store order.
+    pub fn within(
+        &self,
+        from: DateTime<FixedOffset>,
+        to: DateTime<FixedOffset>,
+    ) -> impl Iterator<Item = usize> + '_ {
+        let (from, to) = (from.timestamp(), to.timestamp());
+        self.timestamps
+            .iter()
+            .enumerate()
+            .filter(move |&(_, &t)| t >= from && t <= to)
+            .map(|(i, _)| i)
+    }
+}
+
+#[derive(Debug, Clone, Copy)]
+enum ColumnKind {
+    Timestamps,
+    AuthorIds,
+}
+
+/// A column of the commits exposed through the buffer protocol, so NumPy
+/// reads it without copying, e.g. `numpy.asarray(column)`.
+///
+/// Position `i` belongs to the `i`-th commit of `Branchless.list_commits`.
+/// The column keeps the commits it was taken from, a refresh of the
+/// repository does not change it.
+#[pyclass(frozen)]
+pub struct CommitColumn {
+    commits: Arc<CommitStore>,
+    kind: ColumnKind,
+    // number of items and size of an item, pointed to by the buffers
+    shape: [isize; 1],
+    strides: [isize; 1],
+}
+
+impl CommitColumn {
+    fn new(commits: Arc<CommitStore>, kind: ColumnKind) -> Self {
+        let itemsize = match kind {
+            ColumnKind::Timestamps => std::mem::size_of::<i64>(),
+            ColumnKind::AuthorIds => std::mem::size_of::<u32>(),
+        };
+        Self {
+            shape: [commits.len() as isize],
+            strides: [itemsize as isize],
+            commits,
+            kind,
+        }
+    }
+
+    /// Unix timestamps of the commits, as 64-bit integers.
+    pub fn timestamps(commits: Arc<CommitStore>) -> Self {
+        Self::new(commits, ColumnKind::Timestamps)
+    }
+
+    /// Author ids of the commits, as unsigned 32-bit integers.
+    pub fn author_ids(commits: Arc<CommitStore>) -> Self {
+        Self::new(commits, ColumnKind::AuthorIds)
+    }
+}
+
+#[pymethods]
+impl CommitColumn {
+    fn __len__(&self) -> usize {
+        self.commits.len()
+    }
+
+    unsafe fn __getbuffer__(
+        slf: Bound<'_, Self>,
+        view: *mut ffi::Py_buffer,
+        flags: c_int,
+    ) -> PyResult<()> {
+        if view.is_null() {
+            return Err(PyBufferError::new_err("view is null"));
+        }
+        if flags & ffi::PyBUF_WRITABLE == ffi::PyBUF_WRITABLE {
+            return Err(PyBufferError::new_err("commit columns are read-only"));
+        }
+        let column = slf.get();
+        let (buf, format): (*const c_void, &CStr) = match column.kind {
+            ColumnKind::Timestamps => (column.commits.timestamps.as_ptr().cast(), c"q"),
+            ColumnKind::AuthorIds => (column.commits.author_ids.as_ptr().cast(), c"I"),
+        };
+
+        let view = &mut *view;
+        view.buf = buf as *mut c_void;
+        view.len = column.shape[0] * column.strides[0];
+        view.itemsize = column.strides[0];
+        view.readonly = 1;
+        view.ndim = 1;
+        view.format = match flags & ffi::PyBUF_FORMAT == ffi::PyBUF_FORMAT {
+            true => format.as_ptr() as *mut c_char,
+            false => ptr::null_mut(),
+        };
+        view.shape = match flags & ffi::PyBUF_ND == ffi::PyBUF_ND {
+            true => column.shape.as_ptr() as *mut isize,
+            false => ptr::null_mut(),
+        };
+        view.strides = match flags & ffi::PyBUF_STRIDES == ffi::PyBUF_STRIDES {
+            true => column.strides.as_ptr() as *mut isize,
+            false => ptr::null_mut(),
+        };
+        view.suboffsets = ptr::null_mut();
+        view.internal = ptr::null_mut();
+        // the view holds a reference to the column, and so to its commits
+        view.obj = slf.into_any().into_ptr();
+        Ok(())
+    }
+}
+
+#[cfg(test)]
+mod test {
+    use chrono::DateTime;
+
+    use super::CommitStore;
+    use crate::wrapper::{Author, CommitMeta};
+    use crate::GitError;
+
+    fn commit(i: usize, name: &str, date: &str) -> CommitMeta {
+        CommitMeta {
+            hash: format!("{i:040x}"),
+            author: Author {
+                name: name.into(),
+                email: format!("{name}@test.com"),
+            },
+            date: DateTime::parse_from_rfc3339(date).unwrap(),
+            message: format!("commit {i}\n\nbody"),
+        }
+    }
+
+    fn commits() -> Vec<CommitMeta> {
+        vec![
+            commit(3, "user1", "2024-01-03T10:00:00+03:30"),
+            commit(2, "user2", "2024-01-02T00:00:00-05:00"),
+            commit(1, "user1", "2024-01-01T00:00:00+00:00"),
+        ]
+    }
+
+    #[test]
+    fn round_trip() {
+        let store = CommitStore::from_commits(commits()).unwrap();
+        assert_eq!(store.len(), 3);
+        for (i, commit) in commits().into_iter().enumerate() {
+            let stored = store.get(i);
+            assert_eq!(stored.hash, commit.hash);
+            assert_eq!(stored.author, commit.author);
+            assert_eq!(stored.message, commit.message);
+            // the offset of the date is kept too
+            assert_eq!(stored.date.to_rfc3339(), commit.date.to_rfc3339());
+        }
+    }
+
+    #[test]
+    fn interned_authors() {
+        let store = CommitStore::from_commits(commits()).unwrap();
+        assert_eq!(store.author_ids(), &[0, 1, 0]);
+        assert_eq!(store.authors().len(), 2);
+        assert_eq!(store.author(1).name, "user2");
+    }
+
+    #[test]
+    fn position() {
+        let store = CommitStore::from_commits(commits()).unwrap();
+        assert_eq!(store.position(&format!("{:040x}", 1)), Some(2));
+        assert_eq!(store.position(&format!("{:040x}", 3)), Some(0));
+        assert_eq!(store.position(&format!("{:040x}", 4)), None);
+        // abbreviated and malformed hashes are not found
+        assert_eq!(store.position("0000000003"), None);
+        assert_eq!(store.position("not a hash"), None);
+    }
+
+    #[test]
+    fn within() {
+        let store = CommitStore::from_commits(commits()).unwrap();
+        let date = |d: &str| DateTime::parse_from_rfc3339(d).unwrap();
+        let within = |from, to| store.within(date(from), date(to)).collect::<Vec<_>>();
+        assert_eq!(
+            within("2024-01-01T00:00:00+00:00", "2024-01-05T00:00:00+00:00"),
+            vec![0, 1, 2]
+        );
+        // 2024-01-02T00:00:00-05:00 is 05:00 in UTC
+        assert_eq!(
+            within("2024-01-02T05:00:00+00:00", "2024-01-03T06:30:00+00:00"),
+            vec![0, 1]
+        );
+        assert!(within("2024-01-04T00:00:00+00:00", "2024-01-05T00:00:00+00:00").is_empty());
+    }
+
+    #[test]
+    fn malformed_hash() {
+        let mut commits = commits();
+        commits[1].hash = "abc".into();
+        assert!(matches!(
+            CommitStore::from_commits(commits),
+            Err(GitError::MalFormedData(_))
+        ));
+        assert!(CommitStore::from_commits(Vec::new()).unwrap().is_empty());
+    }
+}
@@ -22,6 +22,8 @@ pub struct Wrapper {
     dir: TempDir,
     default_branch: String,
     pub branches: Vec<String>,
+    // `commits_on_file` follows the renames of the file
+    follow_renames: bool,
 }
 
 impl Wrapper {
@@ -49,6 +51,7 @@ impl Wrapper {
                     dir,
                     default_branch,
                     branches: vec![],
+                    follow_renames: true,
                 };
                 w.branches = w.fetch_branches()?;
                 Ok(w)
@@ -124,18 +127,26 @@ impl Wrapper {
 
 #[pymethods]
 impl Wrapper {
+    /// Clone the repository into a temporary directory.
+    ///
+    /// When a `filter` (e.g. `blob:none`) is given, a partial clone without a
+    /// work tree is made: commits and trees are fetched upfront while blobs are
+    /// fetched from the remote on demand by the commands that read them.
     #[new]
-    pub fn new(repo_url: &str) -> Result<Self> {
+    #[pyo3(signature = (repo_url, filter=None))]
+    pub fn new(repo_url: &str, filter: Option<&str>) -> Result<Self> {
         let dir = TempDir::new()?;
 
         let dir_path = dir.path();
 
         // Run git clone command
-        let output = Command::new("git")
-            .arg("clone")
-            .arg(repo_url)
-            .arg(dir_path)
-            .output()?;
+        let mut cmd = Command::new("git");
+        cmd.arg("clone");
+        if let Some(filter) = filter {
+            // none of the git commands used by the wrapper need a work tree
+            cmd.arg(format!("--filter={filter}")).arg("--no-checkout");
+        }
+        let output = cmd.arg(repo_url).arg(dir_path).output()?;
 
         // Check if the command was successful
         if !output.status.success() {
@@ -170,6 +181,56 @@ impl Wrapper {
         self.branches.clone()
     }
 
+    /// Whether `commits_on_file` follows the renames of the file (the default).
+    ///
+    /// Rename detection compares the contents of the files added and removed
+    /// by each commit, which on partial clones fetches their blobs from the
+    /// remote commit by commit. Without it the history of a file stops at its
+    /// last rename, and its older commits are only found under the old path.
+    pub fn set_follow_renames(&mut self, follow: bool) {
+        self.follow_renames = follow;
+    }
+
+    pub fn follows_renames(&self) -> bool {
+        self.follow_renames
+    }
+
+    /// Fetch new commits and branches from the origin remote.
+    ///
+    /// The local default branch is only fast-forwarded: if it diverged from
+    /// the remote one it is left as is.
+    pub fn refresh(&mut self) -> Result<()> {
+        self.branches = self.fetch()?;
+        Ok(())
+    }
+
+    /// Fetch new commits and branches from the origin remote like `refresh`,
+    /// returning the branches rather than keeping them.
+    pub fn fetch(&self) -> Result<Vec<String>> {
+        let output = Command::new("git")
+            .arg("fetch")
+            .arg("--prune")
+            .arg("origin")
+            .current_dir(self.dir.path())
+            .output()?;
+
+        if !output.status.success() {
+            let error_message = String::from_utf8_lossy(&output.stderr).to_string();
+            return Err(GitError::GitCommandErr(error_message));
+        }
+
+        let default_branch = &self.default_branch;
+        Command::new("git")
+            .arg("fetch")
+            .arg("--update-head-ok")
+            .arg("origin")
+            .arg(format!("{default_branch}:{default_branch}"))
+            .current_dir(self.dir.path())
+            .output()?;
+
+        self.fetch_branches()
+    }
+
     pub fn authors_of_branch(&self, branch: &str) -> Result<Vec<Author>> {
         if !self.has_branch(branch) {
             return Err(GitError::BranchNotFound(branch.to_string()));
@@ -191,7 +252,15 @@ impl Wrapper {
         if !self.has_branch(branch) {
             return Err(GitError::BranchNotFound(branch.to_string()));
         }
+        self.commits_of_fetched_branch(branch, pagination)
+    }
 
+    /// Commits of a branch returned by `fetch`, which may not be tracked yet.
+    pub fn commits_of_fetched_branch(
+        &self,
+        branch: &str,
+        pagination: Pagination,
+    ) -> Result<Vec<CommitMeta>> {
         if branch == self.default_branch || branch == format!("origin/{}", self.default_branch) {
             self.commits_from_git_log(vec![&self.default_branch], pagination)
         } else {
@@ -348,6 +417,8 @@ impl Wrapper {
         Ok(count1 + count2)
     }
 
+    /// Commits changing `file_path` on `branch`, following its renames unless
+    /// disabled with `set_follow_renames`.
     pub fn commits_on_file(
         &self,
         file_path: &str,
@@ -357,7 +428,11 @@ impl Wrapper {
         if !self.has_branch(branch) {
             return Err(GitError::BranchNotFound(branch.to_string()));
         }
-        self.commits_from_git_log(vec!["--follow", branch, "--", file_path], pagination)
+        let mut args = vec![branch, "--", file_path];
+        if self.follow_renames {
+            args.insert(0, "--follow");
+        }
+        self.commits_from_git_log(args, pagination)
     }
 }
 
@@ -701,7 +776,7 @@ mod test {
 
     #[test]
     fn list_branches() -> Result<()> {
-        let w = Wrapper::new(REPO_URL)?;
+        let w = Wrapper::new(REPO_URL, None)?;
         let branches = w.list_branches();
         assert!(branches.contains(&"origin/b1".into()));
         assert!(branches.contains(&"origin/master".into()));
@@ -779,7 +854,7 @@ mod test {
 
     #[test]
     fn commits_on_file() -> Result<()> {
-        let w = new_mock_wrapper()?;
+        let mut w = new_mock_wrapper()?;
         let p = Pagination::all();
 
         let commits = w.commits_on_file("OTHER.md", "master", p)?;
@@ -798,6 +873,10 @@ mod test {
             commit_messages
         );
 
+        // the file was never renamed
+        w.set_follow_renames(false);
+        assert_eq!(w.commits_on_file("README.md", "master", p)?.len(), 3);
+
         Ok(())
     }
 
@@ -852,4 +931,54 @@ mod test {
         assert_eq!(distance, 4);
         Ok(())
     }
+
+    #[test]
+    fn refresh() -> Result<()> {
+        let origin = new_mock_wrapper()?;
+        let url = format!("file://{}", origin.dir().display());
+        let mut w = Wrapper::new(&url, None)?;
+        let before = w.commits_of_branch("master", Pagination::all())?.len();
+
+        Command::new("git")
+            .args(["commit", "--allow-empty", "-m", "seventh"])
+            .current_dir(origin.dir())
+            .output()?;
+        Command::new("git")
+            .args(["branch", "branch2"])
+            .current_dir(origin.dir())
+            .output()?;
+        w.refresh()?;
+
+        let commits = w.commits_of_branch("master", Pagination::all())?;
+        assert_eq!(commits.len(), before + 1);
+        assert_eq!(commits[0].message, "seventh");
+        assert!(w.list_branches().contains(&"origin/branch2".into()));
+        Ok(())
+    }
+
+    #[test]
+    fn filtered_clone() -> Result<()> {
+        let origin = new_mock_wrapper()?;
+        // allow partial clones from the mock repo
+        Command::new("git")
+            .args(["config", "uploadpack.allowFilter", "true"])
+            .current_dir(origin.dir())
+            .output()?;
+
+        let url = format!("file://{}", origin.dir().display());
+        let w = Wrapper::new(&url, Some("blob:none"))?;
+
+        let output = Command::new("git")
+            .args(["config", "remote.origin.promisor"])
+            .current_dir(w.dir())
+            .output()?;
+        assert_eq!(String::from_utf8_lossy(&output.stdout).trim(), "true");
+
+        // blobs are fetched lazily when a diff needs them
+        let commits = w.commits_of_branch("master", Pagination::all())?;
+        let diff = w.commit_diff(commits[0].hash.clone())?;
+        assert_eq!(diff, origin.commit_diff(commits[0].hash.clone())?);
+
+        Ok(())
+    }
 }
@@ -1,15 +1,28 @@
+import os
+
 from src.issue_wrapper.wrapper import Wrapper
 from src.issue_wrapper.jira import JiraIssueWrapper
 from src.issue_wrapper.github import GitHubIssueWrapper
+from src.issue_wrapper.fetcher import IssueFetcher
+from src.issue_wrapper.snapshot import (
+    SNAPSHOT_ENV,
+    IssueSnapshot,
+    SnapshotIssueWrapper,
+    load_snapshot,
+)
 
 
-def wrapper_for(url: str) -> Wrapper:
+def wrapper_for(url: str, fetcher: IssueFetcher | None = None) -> Wrapper:
     """
-    creates a new Wrapper based on the given url
+    creates a new Wrapper based on the given url.
+    all wrappers created with the same fetcher share its connections and cache.
+    if `GIT_ANCHOR_ISSUE_SNAPSHOT` is set, the issue is served from that snapshot file.
     """
-    if "jira" in url.lower():
-        return JiraIssueWrapper(url)
+    if SNAPSHOT_ENV in os.environ:
+        return SnapshotIssueWrapper(url, load_snapshot(os.environ[SNAPSHOT_ENV]))
+    elif "jira" in url.lower():
+        return JiraIssueWrapper(url, fetcher)
     elif "github.com" in url.lower():
-        return GitHubIssueWrapper(url)
+        return GitHubIssueWrapper(url, fetcher)
     else:
         raise ValueError("Unsupported issue URL format.")
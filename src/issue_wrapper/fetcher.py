@@ -0,0 +1,367 @@
+import os
+import re
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.anchor.metrics import Metrics
+from src import trace
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+GITHUB_API_URL = "https://api.github.com"
+
+JIRA_ISSUE_PATTERN = re.compile(r"^(?P<base>.+)/rest/api/2/issue/(?P<key>[^/?#]+)")
+GITHUB_ISSUE_PATTERN = re.compile(r"github\.com/([^/]+)/([^/]+)/issues/(\d+)")
+
+GITHUB_ISSUE_QUERY = """
+{alias}: repository(owner: "{owner}", name: "{repo}") {{
+  issue(number: {number}) {{
+    number
+    title
+    body
+    createdAt
+    closedAt
+    author {{ login }}
+    assignees(first: 100) {{ nodes {{ login }} }}
+    comments(first: 100) {{
+      pageInfo {{ hasNextPage }}
+      nodes {{ author {{ login }} body createdAt }}
+    }}
+  }}
+}}
+"""
+
+
+def parse_jira_url(url: str) -> Tuple[str, str]:
+    """
+    Split a Jira REST issue url into the Jira base url and the issue key.
+    """
+    match = JIRA_ISSUE_PATTERN.search(url)
+    if not match:
+        raise ValueError("Invalid Jira issue URL format.")
+    return (match.group("base"), match.group("key"))
+
+
+def parse_github_url(url: str) -> Tuple[str, str, int]:
+    """
+    Split a GitHub issue url into owner, repository name and issue number.
+    """
+    match = GITHUB_ISSUE_PATTERN.search(url)
+    if not match:
+        raise ValueError("Invalid GitHub issue URL format.")
+    return (match.group(1), match.group(2), int(match.group(3)))
+
+
+def batched(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+class IssueFetcher:
+    """
+    IssueFetcher downloads raw issue data over a pool of keep-alive connections.
+
+    Jira issues that live on the same Jira instance are fetched in bulk through
+    the search API and GitHub issues through batched GraphQL queries (REST is
+    used when no GitHub token is available). Every fetched issue and comment
+    thread is cached, so building a wrapper for an already fetched issue costs
+    no network round trip.
+    """
+
+    def __init__(
+        self,
+        github_token: str | None = None,
+        github_api_url: str = GITHUB_API_URL,
+        batch_size: int = 50,
+        pool_size: int = 16,
+        timeout: float = 30.0,
+        metrics: Metrics | None = None,
+    ):
+        """Initialize the IssueFetcher instance.
+        Args:
+            github_token (str): GitHub token. if not provided, `GITHUB_TOKEN` env variable is used.
+            github_api_url (str): base url of the GitHub API, can be pointed to a local stand-in.
+            batch_size (int): maximum number of issues requested in a single query.
+            pool_size (int): number of keep-alive connections kept per host.
+            timeout (float): timeout of each HTTP request in seconds.
+            metrics (Metrics): if provided, every HTTP request is counted as an API call.
+        """
+        if github_token is None:
+            github_token = os.environ.get("GITHUB_TOKEN", "")
+        self.github_token = github_token
+        self.github_api_url = github_api_url.rstrip("/")
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.metrics = metrics
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504]
+            ),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.cache: Dict[str, Dict[str, Any]] = {}
+        self.comments: Dict[str, List[Dict[str, Any]]] = {}
+        self.pending: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="issue-prefetch"
+        )
+
+    def fetch(self, url: str) -> Dict[str, Any]:
+        """
+        Return the raw data of a single issue, waiting for a pending prefetch if there is one.
+        """
+        with self.lock:
+            if url in self.cache:
+                return self.cache[url]
+            future = self.pending.get(url)
+
+        if future is not None:
+            try:
+                future.result()
+            except Exception as e:
+                logger.warning(f"prefetch failed, fetching {url} directly: {e}")
+
+        return self.fetch_many([url])[url]
+
+    def fetch_many(self, urls: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch all given issues using as few requests as possible.
+        Returns a mapping from issue url to its raw data.
+        """
+        urls = list(dict.fromkeys(urls))
+        with self.lock:
+            missing = [url for url in urls if url not in self.cache]
+
+        jira: Dict[str, Dict[str, str]] = {}
+        github: List[str] = []
+        for url in missing:
+            if "jira" in url.lower():
+                base, key = parse_jira_url(url)
+                jira.setdefault(base, {})[key] = url
+            elif "github.com" in url.lower():
+                github.append(url)
+            else:
+                raise ValueError("Unsupported issue URL format.")
+
+        for base, keys in jira.items():
+            self._fetch_jira(base, keys)
+        if github:
+            self._fetch_github(github)
+
+        with self.lock:
+            return {url: self.cache[url] for url in urls}
+
+    def prefetch(self, urls: Iterable[str]) -> Future:
+        """
+        Fetch the given issues in the background.
+        Later calls to `fetch` for these issues wait for the prefetch instead of refetching them.
+        """
+        with self.lock:
+            urls = [
+                url
+                for url in dict.fromkeys(urls)
+                if url not in self.cache and url not in self.pending
+            ]
+            future = self.executor.submit(self.fetch_many, urls)
+            for url in urls:
+                self.pending[url] = future
+
+        def clear_pending(_: Future):
+            with self.lock:
+                for url in urls:
+                    self.pending.pop(url, None)
+
+        future.add_done_callback(clear_pending)
+        return future
+
+    def github_comments(self, url: str) -> List[Dict[str, Any]]:
+        """
+        Return all comments of a GitHub issue.
+        Comments are fetched only once, either along with the issue or through the REST API.
+        """
+        with self.lock:
+            if url in self.comments:
+                return self.comments[url]
+
+        owner, repo, number = parse_github_url(url)
+        comments = []
+        next_url: str | None = (
+            f"{self.github_api_url}/repos/{owner}/{repo}/issues/{number}/comments"
+        )
+        params: Dict[str, Any] | None = {"per_page": 100}
+        while next_url:
+            response = self._get(
+                "github.rest",
+                next_url,
+                params=params,
+                headers=self._github_headers(),
+            )
+            response.raise_for_status()
+            comments.extend(response.json())
+            next_url = response.links.get("next", {}).get("url")
+            # the next link already carries the query parameters
+            params = None
+
+        with self.lock:
+            self.comments[url] = comments
+        return comments
+
+    def _fetch_jira(self, base: str, keys: Dict[str, str]):
+        for chunk in batched(list(keys), self.batch_size):
+            response = self._get(
+                "jira.search",
+                f"{base}/rest/api/2/search",
+                params={
+                    "jql": f"key in ({','.join(chunk)})",
+                    "fields": "*all",
+                    "maxResults": len(chunk),
+                    # unknown keys should not fail the whole batch
+                    "validateQuery": "warn",
+                },
+            )
+            if not response.ok:
+                logger.warning(
+                    f"jira search failed with {response.status_code}, falling back to single fetches"
+                )
+                continue
+            with self.lock:
+                for issue in response.json().get("issues", []):
+                    url = keys.get(issue["key"])
+                    if url is not None:
+                        self.cache[url] = issue
+
+        # issues that were moved to another project are not returned under their old key
+        for url in keys.values():
+            if url in self.cache:
+                continue
+            response = self._get("jira.issue", url)
+            response.raise_for_status()
+            with self.lock:
+                self.cache[url] = response.json()
+
+    def _fetch_github(self, urls: List[str]):
+        if not self.github_token:
+            for url in urls:
+                self._fetch_github_rest(url)
+            return
+
+        # issues the GraphQL API does not return, e.g. pull requests
+        unresolved = []
+        for chunk in batched(urls, self.batch_size):
+            aliases = {f"i{i}": url for i, url in enumerate(chunk)}
+            query = ""
+            for alias, url in aliases.items():
+                owner, repo, number = parse_github_url(url)
+                query += GITHUB_ISSUE_QUERY.format(
+                    alias=alias, owner=owner, repo=repo, number=number
+                )
+            self._count("github.graphql")
+            with trace.span("github.graphql", "issue", issues=len(chunk)):
+                response = self.session.post(
+                    f"{self.github_api_url}/graphql",
+                    json={"query": f"query {{{query}}}"},
+                    headers=self._github_headers(),
+                    timeout=self.timeout,
+                )
+            response.raise_for_status()
+            data = response.json().get("data") or {}
+            with self.lock:
+                for alias, url in aliases.items():
+                    issue = (data.get(alias) or {}).get("issue")
+                    if issue is None:
+                        unresolved.append(url)
+                        continue
+                    self.cache[url] = self._from_graphql(issue)
+                    # longer threads are paged through lazily by `github_comments`
+                    if not issue["comments"]["pageInfo"]["hasNextPage"]:
+                        self.comments[url] = [
+                            self._comment_from_graphql(comment)
+                            for comment in issue["comments"]["nodes"]
+                        ]
+
+        # fetched one by one so that a missing issue does not fail the others
+        for url in unresolved:
+            logger.warning(
+                f"GitHub issue not found over GraphQL, fetching {url} directly"
+            )
+            self._fetch_github_rest(url)
+
+    def _fetch_github_rest(self, url: str):
+        owner, repo, number = parse_github_url(url)
+        response = self._get(
+            "github.rest",
+            f"{self.github_api_url}/repos/{owner}/{repo}/issues/{number}",
+            headers=self._github_headers(),
+        )
+        response.raise_for_status()
+        issue = response.json()
+        with self.lock:
+            self.cache[url] = issue
+            # the issue carries its comment count, empty threads need no request
+            if issue.get("comments") == 0:
+                self.comments[url] = []
+
+    def _get(self, kind: str, url: str, **kwargs) -> requests.Response:
+        self._count(kind)
+        with trace.span(kind, "issue", url=url):
+            return self.session.get(url, timeout=self.timeout, **kwargs)
+
+    def _count(self, kind: str):
+        if self.metrics:
+            self.metrics.api_call(kind)
+
+    def _github_headers(self) -> Dict[str, str]:
+        headers = {"Accept": "application/vnd.github+json"}
+        if self.github_token:
+            headers["Authorization"] = f"Bearer {self.github_token}"
+        return headers
+
+    @staticmethod
+    def _from_graphql(issue: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Convert a GraphQL issue node to the shape returned by the REST API.
+        """
+        return {
+            "number": issue["number"],
+            "title": issue["title"],
+            "body": issue["body"],
+            "created_at": issue["createdAt"],
+            "closed_at": issue["closedAt"],
+            "user": {"login": (issue.get("author") or {}).get("login", "ghost")},
+            "assignees": issue["assignees"]["nodes"],
+        }
+
+    @staticmethod
+    def _comment_from_graphql(comment: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "user": {"login": (comment.get("author") or {}).get("login", "ghost")},
+            "body": comment["body"],
+            "created_at": comment["createdAt"],
+        }
+
+
+_default_fetcher: IssueFetcher | None = None
+
+
+def default_fetcher() -> IssueFetcher:
+    """
+    Return the process wide fetcher, so every wrapper shares the same connection pool.
+    """
+    global _default_fetcher
+    if _default_fetcher is None:
+        _default_fetcher = IssueFetcher()
+    return _default_fetcher
@@ -1,61 +1,67 @@
-import re
 from typing import List
-from github import Github
-from datetime import datetime
+from datetime import datetime, timezone
+from dateutil.parser import parse as date_parse
 
 from src.issue_wrapper.wrapper import Wrapper, Pagination, CommentMeta
+from src.issue_wrapper.fetcher import IssueFetcher, default_fetcher, parse_github_url
 
 
 class GitHubIssueWrapper(Wrapper):
-    def __init__(self, url: str):
-        match = re.search(r"github\.com/([^/]+)/([^/]+)/issues/(\d+)", url)
-        if not match:
-            raise ValueError("Invalid GitHub issue URL format.")
+    def __init__(self, url: str, fetcher: IssueFetcher | None = None):
+        # validate the url before hitting the network
+        parse_github_url(url)
 
-        owner = match.group(1)
-        repo_name = match.group(2)
-        issue_number = int(match.group(3))
-
-        self.issue_data = (
-            Github().get_repo(f"{owner}/{repo_name}").get_issue(number=issue_number)
-        )
+        self.url = url
+        self.fetcher = fetcher or default_fetcher()
+        self.issue_data = self.fetcher.fetch(url)
+        self.comments: List[CommentMeta] | None = None
 
     def issue_title(self) -> str:
-        return self.issue_data.title
+        return self.issue_data["title"]
 
     def issue_key(self) -> str:
-        return str(self.issue_data.number)
+        return str(self.issue_data["number"])
 
     def issue_description(self) -> str:
-        return self.issue_data.body
+        return self.issue_data["body"] or ""
 
     def issue_author(self) -> str:
-        return self.issue_data.user.login
+        return self.issue_data["user"]["login"]
 
     def issue_created_at(self) -> datetime:
-        return self.issue_data.created_at
+        return date_parse(self.issue_data["created_at"])
 
     def issue_closed_at(self) -> datetime:
-        return self.issue_data.closed_at
+        date_str = self.issue_data.get("closed_at")
+        if date_str is None:
+            return datetime.now(timezone.utc)
+        else:
+            return date_parse(date_str)
 
     def issue_comments(self, pagination: Pagination) -> List[CommentMeta]:
-        comments = self.issue_data.get_comments()
-        comments = comments[pagination.offset : pagination.offset + pagination.limit]
-        comment_meta_list = []
-        for comment in comments:
-            comment_meta = CommentMeta(
-                author=comment.user.login,
-                body=comment.body,
-                created_at=str(comment.created_at),
-            )
-            comment_meta_list.append(comment_meta)
-        return comment_meta_list
+        comments = self.all_comments()
+        return comments[pagination.offset : pagination.offset + pagination.limit]
 
     def issue_participants(self) -> List[str]:
         participants = set()
-        for assignee in self.issue_data.assignees:
-            participants.add(assignee.login)
-        for comment in self.issue_data.get_comments():
-            participants.add(comment.user.login)
+        for assignee in self.issue_data["assignees"]:
+            participants.add(assignee["login"])
+        for comment in self.all_comments():
+            participants.add(comment.author)
         participants.add(self.issue_author())
         return list(participants)
+
+    def all_comments(self) -> List[CommentMeta]:
+        """
+        Load the comment thread once and serve every later query from memory.
+        """
+        if self.comments is None:
+            self.comments = [
+                CommentMeta(
+                    author=comment["user"]["login"],
+                    body=comment["body"],
+                    created_at=comment["created_at"],
+                )
+                for comment in self.fetcher.github_comments(self.url)
+            ]
+        return self.comments
@@ -1,16 +1,14 @@
 from typing import List
-import requests
 from datetime import datetime, timezone
 from dateutil.parser import parse as date_parse
 
 from src.issue_wrapper.wrapper import Wrapper, Pagination, CommentMeta
+from src.issue_wrapper.fetcher import IssueFetcher, default_fetcher
 
 
 class JiraIssueWrapper(Wrapper):
-    def __init__(self, url: str):
-        response = requests.get(url)
-        response.raise_for_status()
-        self.issue_data = response.json()
+    def __init__(self, url: str, fetcher: IssueFetcher | None = None):
+        self.issue_data = (fetcher or default_fetcher()).fetch(url)
 
     def issue_title(self) -> str:
         return self.issue_data["fields"]["summary"]
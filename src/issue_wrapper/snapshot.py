@@ -0,0 +1,108 @@
+import os
+import sys
+import gzip
+import json
+from functools import lru_cache
+from typing import Any, Dict, List
+from datetime import datetime
+from dateutil.parser import parse as date_parse
+
+from src.issue_wrapper.wrapper import Wrapper, Pagination, CommentMeta
+
+# when set, `wrapper_for` serves issues from the snapshot at this path instead of the network
+SNAPSHOT_ENV = "GIT_ANCHOR_ISSUE_SNAPSHOT"
+
+
+class IssueSnapshot:
+    """
+    IssueSnapshot is an offline copy of a set of issues, keyed by issue url.
+    It is stored as a single gzipped JSON file.
+    """
+
+    def __init__(self, issues: Dict[str, Dict[str, Any]] | None = None):
+        self.issues: Dict[str, Dict[str, Any]] = issues or {}
+
+    @classmethod
+    def load(cls, path: str) -> "IssueSnapshot":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def save(self, path: str):
+        # written next to the target and moved over it, so an interrupted save
+        # leaves the previous snapshot intact
+        partial = path + ".partial"
+        try:
+            with gzip.open(partial, "wt", encoding="utf-8") as f:
+                json.dump(self.issues, f, separators=(",", ":"))
+            os.replace(partial, path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+
+    def add(self, url: str, wrapper: Wrapper):
+        """
+        Materialise everything the agent can ask about an issue from the given wrapper.
+        """
+        comments = wrapper.issue_comments(Pagination(offset=0, limit=sys.maxsize))
+        self.issues[url] = {
+            "key": wrapper.issue_key(),
+            "title": wrapper.issue_title(),
+            "description": wrapper.issue_description(),
+            "created_at": wrapper.issue_created_at().isoformat(),
+            "closed_at": wrapper.issue_closed_at().isoformat(),
+            "author": wrapper.issue_author(),
+            "participants": sorted(wrapper.issue_participants()),
+            "comments": [comment.model_dump() for comment in comments],
+        }
+
+    def get(self, url: str) -> Dict[str, Any]:
+        if url not in self.issues:
+            raise ValueError(f"issue not found in snapshot: {url}")
+        return self.issues[url]
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.issues
+
+    def __len__(self) -> int:
+        return len(self.issues)
+
+
+@lru_cache(maxsize=None)
+def load_snapshot(path: str) -> IssueSnapshot:
+    """
+    Load the snapshot at the given path once per process.
+    """
+    return IssueSnapshot.load(path)
+
+
+class SnapshotIssueWrapper(Wrapper):
+    def __init__(self, url: str, snapshot: IssueSnapshot):
+        self.issue_data = snapshot.get(url)
+        self.comments = [
+            CommentMeta(**comment) for comment in self.issue_data["comments"]
+        ]
+
+    def issue_title(self) -> str:
+        return self.issue_data["title"]
+
+    def issue_key(self) -> str:
+        return self.issue_data["key"]
+
+    def issue_description(self) -> str:
+        return self.issue_data["description"]
+
+    def issue_author(self) -> str:
+        return self.issue_data["author"]
+
+    def issue_created_at(self) -> datetime:
+        return date_parse(self.issue_data["created_at"])
+
+    def issue_closed_at(self) -> datetime:
+        return date_parse(self.issue_data["closed_at"])
+
+    def issue_comments(self, pagination: Pagination) -> List[CommentMeta]:
+        return self.comments[pagination.offset : pagination.offset + pagination.limit]
+
+    def issue_participants(self) -> List[str]:
+        return list(self.issue_data["participants"])
@@ -1,15 +1,23 @@
 from src.anchor.anchor import GitAnchor
-from src.anchor.extractor import GitSourceType
+from src.anchor.extractor import Extractor, GitSourceType, Serialized
+from src.anchor import replay
+from src.anchor.budget import TokenBudget
+from src.anchor.cascade import Cascade
 from src.schema.git import TOOLS as GIT_TOOLS
 from src.schema.code import TOOLS as CODE_TOOLS
 from src.schema.issue import TOOLS as ISSUE_TOOLS
 from src.schema.control import TOOLS as CONTROL_TOOLS
 from src.term import Color
 from src import term
+from src import trace
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List
 import logging
 import argparse
+import json
 import os
+import time
 
 
 def parse_arguments():
@@ -23,13 +31,154 @@ def parse_arguments():
         "--from-local", help="Path to local git repository", type=str
     )
 
-    parser.add_argument("--issue", help="Link of the issue", type=str, required=True)
+    issue_group = parser.add_mutually_exclusive_group(required=True)
+    issue_group.add_argument("--issue", help="Link of the issue", type=str)
+    issue_group.add_argument(
+        "--issues",
+        help="File with the links of many issues of the repository, one per line. "
+        "Results are written to stdout as JSON lines as each issue finishes",
+        type=str,
+    )
+    parser.add_argument(
+        "--concurrency",
+        help="Number of issues of --issues linked concurrently",
+        type=int,
+        default=4,
+    )
+
+    parser.add_argument(
+        "--full-clone",
+        help="Clone all blobs of the --git repository upfront instead of fetching them on demand",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--cascade",
+        help="Models tried from the cheapest to the strongest, as a comma separated list of "
+        "MODEL[:MAX_ITERATIONS[:MAX_NEXT]]. A session escalates to the next model after "
+        "MAX_ITERATIONS iterations or MAX_NEXT calls to Next on a model, or when it gives up",
+        type=Cascade.parse,
+    )
+
+    parser.add_argument(
+        "--digests",
+        help="Show the files, functions and types changed by each commit of a batch, "
+        "computing the next batch in the background",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--speculative",
+        help="Explore the start, the end and the best matching commits of the issue "
+        "lifespan in concurrent sessions, the first one finding the commit cancels the others",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--token-budget",
+        help="Maximum number of tokens spent on an issue by all of its sessions",
+        type=int,
+    )
+    parser.add_argument(
+        "--session-token-budget",
+        help="Maximum number of tokens spent by a session. A session running low on "
+        "tokens compacts old tool results, then shrinks its batches of commits, and "
+        "is asked for a final answer once a request no longer fits",
+        type=int,
+    )
+    parser.add_argument(
+        "--run-token-budget",
+        help="Maximum number of tokens spent on all the issues of --issues",
+        type=int,
+    )
 
     parser.add_argument("--debug", help="Enable debug mode", action="store_true")
 
     parser.add_argument("--interactive", help="Show advanced UI", action="store_true")
 
-    return parser.parse_args()
+    parser.add_argument(
+        "--trace",
+        help="Write a trace of the session in the Chrome trace event format to this file",
+        type=str,
+    )
+
+    args = parser.parse_args()
+    if args.issues and args.interactive:
+        parser.error("--interactive can not be used with --issues")
+    if args.speculative and args.interactive:
+        parser.error("--interactive can not be used with --speculative")
+    if args.run_token_budget is not None and not args.issues:
+        parser.error("--run-token-budget can only be used with --issues")
+    return args
+
+
+def read_issues(path: str) -> List[str]:
+    """Read issue links from a file, skipping empty lines and # comments."""
+    with open(path) as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def link_issues(
+    extractor: Extractor,
+    issue_urls: List[str],
+    concurrency: int,
+    cascade: Cascade | None = None,
+    speculative: bool = False,
+    token_budget: int | None = None,
+    inline_digests: bool = False,
+    session_token_budget: int | None = None,
+    run_token_budget: int | None = None,
+):
+    """Link many issues of the repository of `extractor` and print a JSON line per issue.
+    Args:
+        extractor (Extractor): extractor of the repository shared by all issues.
+        issue_urls (List[str]): links of the issues.
+        concurrency (int): number of issues linked at the same time.
+        cascade (Cascade | None): models tried from cheapest to strongest.
+        speculative (bool): explore parts of the lifespan of each issue concurrently.
+        token_budget (int | None): maximum number of tokens spent on each issue.
+        inline_digests (bool): show the digests of the commits with each batch.
+        session_token_budget (int | None): maximum number of tokens of each session.
+        run_token_budget (int | None): maximum number of tokens spent on all issues,
+        the issues linked once it is exhausted stop without a commit.
+    """
+    logger = logging.getLogger(__name__)
+    # the code wrapper checks out commits in a single work tree
+    extractor.code_wrapper = Serialized(extractor.code_wrapper)
+    extractor.identity_index()
+    client = replay.openai_client()
+    run_budget = TokenBudget(run_token_budget)
+
+    def link(issue_url: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        ga = GitAnchor(
+            extractor.with_issue(issue_url),
+            client=client,
+            cascade=cascade,
+            inline_digests=inline_digests,
+            session_token_budget=session_token_budget,
+        )
+        ga.register_tools(GIT_TOOLS)
+        ga.register_tools(CODE_TOOLS)
+        ga.register_tools(ISSUE_TOOLS)
+        ga.register_tools(CONTROL_TOOLS)
+        result, token_used = ga.find_link(speculative, token_budget, run_budget)
+        return {
+            "issue": issue_url,
+            "commit": result,
+            "tokens": token_used,
+            "seconds": time.perf_counter() - start,
+            "tiers": [usage.model_dump() for usage in ga.agent.usage],
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {executor.submit(link, url): url for url in issue_urls}
+        for future in as_completed(futures):
+            try:
+                line = future.result()
+            except Exception as e:
+                logger.error(f"Error linking {futures[future]}: {e}")
+                line = {"issue": futures[future], "error": str(e)}
+            print(json.dumps(line), flush=True)
 
 
 def main():
@@ -54,12 +203,50 @@ def main():
         os.environ["GIT_ANCHOR_INTERACTIVE"] = "TRUE"
         logger.info("Interactive mode enabled")
 
+    if args.trace:
+        trace.enable(args.trace)
+
+    if args.issues:
+        if args.from_local:
+            extractor = Extractor.new_for_repo(args.from_local, GitSourceType.LOCAL)
+        else:
+            extractor = Extractor.new_for_repo(
+                args.git,
+                GitSourceType.REMOTE,
+                clone_filter=None if args.full_clone else "blob:none",
+            )
+        link_issues(
+            extractor,
+            read_issues(args.issues),
+            args.concurrency,
+            args.cascade,
+            args.speculative,
+            args.token_budget,
+            args.digests,
+            args.session_token_budget,
+            args.run_token_budget,
+        )
+        return
+
     if args.from_local:
         ga = GitAnchor.from_urls(
-            args.issue, args.from_local, source_type=GitSourceType.LOCAL
+            args.issue,
+            args.from_local,
+            source_type=GitSourceType.LOCAL,
+            cascade=args.cascade,
+            inline_digests=args.digests,
+            session_token_budget=args.session_token_budget,
         )
     else:
-        ga = GitAnchor.from_urls(args.issue, args.git, source_type=GitSourceType.REMOTE)
+        ga = GitAnchor.from_urls(
+            args.issue,
+            args.git,
+            source_type=GitSourceType.REMOTE,
+            clone_filter=None if args.full_clone else "blob:none",
+            cascade=args.cascade,
+            inline_digests=args.digests,
+            session_token_budget=args.session_token_budget,
+        )
 
     ga.register_tools(GIT_TOOLS)
     ga.register_tools(CODE_TOOLS)
@@ -67,7 +254,14 @@ def main():
     ga.register_tools(CONTROL_TOOLS)
 
     logger.info("Finding link between issue and code...")
-    (result, token_used) = ga.find_link()
+    (result, token_used) = ga.find_link(args.speculative, args.token_budget)
+    for usage in ga.agent.usage:
+        escalation = f", escalated on {usage.escalation}" if usage.escalation else ""
+        logger.info(
+            f"{usage.model}: {usage.calls} calls, {usage.tokens} tokens "
+            f"({usage.prompt_tokens} prompt, {usage.cached_tokens} cached, "
+            f"{usage.completion_tokens} completion), {usage.seconds:.1f}s{escalation}"
+        )
 
     if args.interactive:
         term.log(
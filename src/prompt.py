@@ -1,28 +1,45 @@
 from typing import Any, List
 from git_wrapper import CommitMeta
+from code_wrapper import CommitDigest
 from openai.types.chat import ChatCompletionSystemMessageParam as SystemMessage
 from openai.types.chat import ChatCompletionUserMessageParam as UserMessage
 from openai.types.chat import ChatCompletionToolMessageParam as ToolMessage
 from openai.types.chat import ParsedFunctionToolCall as ToolCall
+from src.schema.shaping import shape_text
 
+# number of commits shown to the agent in each batch
+COMMIT_BATCH_SIZE = 100
+# smallest batch a session running out of tokens shrinks its batches to
+MIN_COMMIT_BATCH_SIZE = 10
 
-def problem_explanation() -> SystemMessage:
-    """
-    The initial prompt that explains the role of the agent and its goals.
-    """
-    return SystemMessage(role="system", content=PROBLEM_EXPLANATION_PROMPT_TEXT)
+# content of the tool results dropped to save tokens
+COMPACTED_OUTPUT = "<COMPACTED_OUTPUT>"
 
 
-def show_commits(commits: List[CommitMeta]) -> SystemMessage:
+def problem_explanation(batch_size: int = COMMIT_BATCH_SIZE) -> SystemMessage:
     """
-    Show the commits to the agent.
+    The initial prompt that explains the role of the agent and its goals.
     """
     return SystemMessage(
         role="system",
-        content=f"current batch of commits to be analyzed consisting of {len(commits)} items:\n{commits}",
+        content=PROBLEM_EXPLANATION_PROMPT_TEXT.format(batch_size=batch_size),
     )
 
 
+def show_commits(
+    commits: List[CommitMeta], digests: List[CommitDigest] | None = None
+) -> SystemMessage:
+    """
+    Show the commits to the agent, with the files, functions and types they change if
+    their digests are given.
+    """
+    content = f"current batch of commits to be analyzed consisting of {len(commits)} items:\n{commits}"
+    if digests:
+        summaries = "\n".join(str(digest) for digest in digests)
+        content += f"\nfiles changed by each commit, with the functions and types they touch:\n{summaries}"
+    return SystemMessage(role="system", content=content)
+
+
 def should_call_function() -> SystemMessage:
     """
     The prompt that tells the agent that it should call a function.
@@ -34,6 +51,22 @@ def should_call_function() -> SystemMessage:
     )
 
 
+def escalation() -> SystemMessage:
+    """
+    The prompt that tells a stronger model it takes over the conversation of a weaker one.
+    """
+    return SystemMessage(
+        role="system",
+        content="The conversation so far was held by a weaker model which did not find "
+        "the commit. You take over from here: reuse the information gathered so far, "
+        "but do not trust its conclusions without checking them.",
+    )
+
+
+# result of a `GiveUp` call that escalated the session to a stronger model
+ESCALATED_RESULT = "a stronger model takes over, keep looking for the commit"
+
+
 def user_initial_prompt(issue_title: str) -> UserMessage:
     """
     The initial prompt that user provides to the agent.
@@ -46,11 +79,40 @@ def user_initial_prompt(issue_title: str) -> UserMessage:
 def function_call_result(tool_call: ToolCall, result: Any) -> ToolMessage:
     """
     Prompt for sending the results of a tool call back to the agent.
+    Results are shaped by the tools, the ones that are not are cut to the size budget.
     """
     return ToolMessage(
         role="tool",
         tool_call_id=tool_call.id,
-        content=f"{result}",
+        content=shape_text(f"{result}"),
+    )
+
+
+def compact(messages: List[Any], keep: int) -> int:
+    """
+    Replace the content of all tool results but the last `keep` ones with
+    `COMPACTED_OUTPUT`. Returns the number of results compacted.
+    """
+    results = [
+        m for m in messages if isinstance(m, dict) and m.get("role") == "tool"
+    ]
+    compacted = 0
+    for m in results[: max(0, len(results) - keep)]:
+        if m["content"] != COMPACTED_OUTPUT:
+            m["content"] = COMPACTED_OUTPUT
+            compacted += 1
+    return compacted
+
+
+def budget_exhausted() -> SystemMessage:
+    """
+    The prompt that asks the agent for a final answer when the session runs out of tokens.
+    """
+    return SystemMessage(
+        role="system",
+        content="The token budget of this session is exhausted, this is your last turn. "
+        "Call `Finish` with the commit you found if you are confident it resolves the "
+        "issue, call `GiveUp` otherwise.",
     )
 
 
@@ -75,11 +137,11 @@ Role & Goals:
 You are an intelligent agent specialized in identifying and linking software issues directly to the specific commit hashes that resolve them. Your primary objective is to determine and provide the exact commit hash responsible for resolving a given issue.
 To accomplish this goal, you will iteratively leverage the provided functions to gather relevant repository information. 
 
-At each iteration (except the first one) you are provided with a list of 100 commits. 
+At each iteration (except the first one) you are provided with a list of {batch_size} commits. 
 Each time you can use the data extraction tools provided to you to gather data about commits that you suspect might be the target commit and analyze them. 
 When you are done analyzing you can either:
 1. Call `Finish` function with the commit_hash of the commit that resolves the issue to signal the end of the process 
-2. Call `Next` function to get the next batch of 100 commits and you can start from the first step again.
+2. Call `Next` function to get the next batch of {batch_size} commits and you can start from the first step again.
 
 you keep the above steps until you either find the commit that you are fully sure it resolves the commit or the iteration finishes and there are no commits returned by calling the `Next` function.
 
@@ -104,6 +166,7 @@ Rules you SHOULD follow:
 4. Only the project's source code is important. Therefore, if you find yourself needing to call one of the codebase functions related to a dependency or external library, avoid making such calls. Instead, rely on your existing knowledge about the dependency or library.
 
 5. Some functions have a pagination parameter. You can use it to limit the number of results returned by the function. You can use limits upto 100 in the pagination.
+Results too large to be returned at once are cut: they start with the total number of items and end with how to get the items left out or how to narrow the query down.
 
 6. sometimes the description in issue title is not enough, make sure to incorporate the issue description and comments in your reasoning. You can use the `IssueDescription` and `IssueComments` function to get the description and comments of the issue.
 
@@ -116,10 +179,10 @@ If you found out that the commit is from another repository, you can try to find
 In each iteration, you SHOULD provide feedback about EACH of the function calls that is requested from you by calling `feedback` function with the id of previous function calls. the value of the feedback is either `Discard` or `Preserve`. if the value is `Discard`, the response of that function call is replaced with <USELESS> token to save tokens. each function response has a `call_id` attribute that you can use to submit feedback in the form of calling feedback function. for example:
 # iteration 1: 
 calling CommitsBetween(args...) 
-response = {
+response = {{
 call_id: 12345,
 data: ...
-}
+}}
 # iteration 2:
 calling Feedback(call_id=12345, feedback="Discard")
 
@@ -1,6 +1,12 @@
 from typing import List
 from pydantic import BaseModel, Field
+from code_wrapper import FetchTarget
 from src.anchor.extractor import Extractor
+from src.schema.shaping import shape
+
+
+# how to fetch a part of a definition too large to be returned
+NARROW_DEFINITION = "fetch a part of it with FetchLinesOfFile"
 
 
 class FetchFunctionDefinition(BaseModel):
@@ -17,8 +23,13 @@ class FetchFunctionDefinition(BaseModel):
         ..., description="file path of the file in repo to fetch the function from"
     )
 
-    def __call__(self, extractor: Extractor) -> List[str]:
-        return extractor.fetch_definition(self.name, self.commit, self.file_path)
+    def __call__(self, extractor: Extractor) -> str:
+        return shape(
+            extractor.fetch_definition(self.name, self.commit, self.file_path),
+            "definitions",
+            narrow=NARROW_DEFINITION,
+            render=str,
+        )
 
 
 class FetchFunctionDocumentation(BaseModel):
@@ -35,8 +46,12 @@ class FetchFunctionDocumentation(BaseModel):
         ..., description="file path of the file in repo to fetch the function from"
     )
 
-    def __call__(self, extractor: Extractor) -> List[str]:
-        return extractor.fetch_documentation(self.name, self.commit, self.file_path)
+    def __call__(self, extractor: Extractor) -> str:
+        return shape(
+            extractor.fetch_documentation(self.name, self.commit, self.file_path),
+            "documentation comments",
+            render=str,
+        )
 
 
 class FetchClassDefinition(BaseModel):
@@ -53,8 +68,13 @@ class FetchClassDefinition(BaseModel):
         ..., description="file path of the file in repo to fetch the class from"
     )
 
-    def __call__(self, extractor: Extractor) -> List[str]:
-        return extractor.fetch_definition(self.name, self.commit, self.file_path)
+    def __call__(self, extractor: Extractor) -> str:
+        return shape(
+            extractor.fetch_definition(self.name, self.commit, self.file_path),
+            "definitions",
+            narrow=NARROW_DEFINITION,
+            render=str,
+        )
 
 
 class FetchClassDocumentation(BaseModel):
@@ -71,8 +91,12 @@ class FetchClassDocumentation(BaseModel):
         ..., description="file path of the file in repo to fetch the class from"
     )
 
-    def __call__(self, extractor: Extractor) -> List[str]:
-        return extractor.fetch_documentation(self.name, self.commit, self.file_path)
+    def __call__(self, extractor: Extractor) -> str:
+        return shape(
+            extractor.fetch_documentation(self.name, self.commit, self.file_path),
+            "documentation comments",
+            render=str,
+        )
 
 
 class FetchLinesOfFile(BaseModel):
@@ -87,16 +111,78 @@ class FetchLinesOfFile(BaseModel):
     start: int = Field(..., description="start line number")
     end: int = Field(..., description="end line number")
 
-    def __call__(self, extractor: Extractor) -> List[str]:
-        return extractor.fetch_lines_of_file(
+    def __call__(self, extractor: Extractor) -> str:
+        lines: List[str] = extractor.fetch_lines_of_file(
             self.commit, self.file_path, self.start, self.end
         )
+        return shape(
+            lines,
+            "lines",
+            offset=self.start,
+            continuation=lambda start: f"start {start}",
+            render=str,
+            counted="requested",
+        )
+
+
+class CodeTarget(BaseModel):
+    """a definition or a range of lines of a file at a commit"""
+
+    commit: str = Field(..., description="commit hash of the commit to fetch from")
+    file_path: str = Field(
+        ..., description="file path of the file in repo to fetch from"
+    )
+    name: str | None = Field(
+        ...,
+        description="'<TYPE>.<FUNCTION>()' for methods, '<FUNCTION>()' for standalone "
+        "functions or the name of a type. null to fetch lines",
+    )
+    start: int | None = Field(
+        ..., description="start line number. null to fetch a definition"
+    )
+    end: int | None = Field(
+        ..., description="end line number. null to fetch a definition"
+    )
+
+
+class FetchMany(BaseModel):
+    """Fetch many function definitions, class definitions and lines of files at once.
+    Prefer it over several calls to FetchFunctionDefinition, FetchClassDefinition and
+    FetchLinesOfFile. Results are returned in the order of the targets and may be cut
+    when they are too large
+    """
+
+    targets: List[CodeTarget] = Field(
+        ..., description="definitions and lines to fetch"
+    )
+
+    def __call__(self, extractor: Extractor) -> str:
+        return extractor.fetch_many(
+            [
+                FetchTarget(t.commit, t.file_path, t.name, t.start, t.end)
+                for t in self.targets
+            ]
+        )
+
+
+class CommitDigest(BaseModel):
+    """Summarize a commit: the files it changes with their added and deleted lines,
+    and the functions and types it touches in the format of FetchFunctionDefinition.
+    Cheaper than CommitDiff to judge whether a commit is worth a closer look
+    """
+
+    commit_hash: str = Field(..., description="commit hash. could be short or long")
+
+    def __call__(self, extractor: Extractor) -> str:
+        return str(extractor.commit_digest(self.commit_hash))
 
 
 TOOLS = [
+    CommitDigest,
     FetchFunctionDefinition,
     FetchFunctionDocumentation,
     FetchClassDefinition,
     FetchClassDocumentation,
     FetchLinesOfFile,
+    FetchMany,
 ]
@@ -1,14 +1,15 @@
-from typing import List, Tuple
+from typing import Any, List
 from enum import Enum
 from dateutil.parser import parse as date_parse
 from pydantic import BaseModel, Field
 from git_wrapper import (
     Author,
-    CommitMeta,
     AuthorQuery,
+    MessageQuery,
     Pagination as wrapperPagination,
 )
 from src.anchor.extractor import Extractor
+from src.schema.shaping import shape, shape_text
 
 
 class AuthorQueryType(str, Enum):
@@ -16,6 +17,18 @@ class AuthorQueryType(str, Enum):
     NAME = "name"
 
 
+class MessageQueryType(str, Enum):
+    KEYWORDS = "keywords"
+    PHRASE = "phrase"
+    REGEX = "regex"
+
+
+class ChangeType(str, Enum):
+    ADDED = "added"
+    REMOVED = "removed"
+    ANY = "any"
+
+
 class Pagination(BaseModel):
     """pagination for listing commits"""
 
@@ -28,56 +41,132 @@ class Pagination(BaseModel):
     def to_wrapper_pagination(self) -> wrapperPagination:
         return wrapperPagination(offset=self.offset, limit=self.limit)
 
+    def shape_page(
+        self, items: List[Any], total: int | None = None, noun: str = "commits"
+    ) -> str:
+        """
+        a page of a paginated result, with the total number of items if it is known,
+        see `shape`
+        """
+        return shape(
+            items,
+            noun,
+            total,
+            self.offset,
+            continuation=lambda offset: f"pagination offset {offset}",
+            counted="in total" if total is not None else "on this page",
+        )
+
 
 class ListCommits(BaseModel):
     """listing all commits in the repo.
-    Returns a paginated list of commits as well as the total number of commits
+    Returns a paginated list of commits
     """
 
     pagination: Pagination = Field(
         ..., description="pagination from offset to atleast offset + limit"
     )
 
-    def __call__(self, extractor: Extractor) -> Tuple[int, List[CommitMeta]]:
-        return extractor.list_commits(self.pagination.to_wrapper_pagination())
+    def __call__(self, extractor: Extractor) -> str:
+        return self.pagination.shape_page(
+            extractor.list_commits(self.pagination.to_wrapper_pagination())
+        )
 
 
 class ListAuthors(BaseModel):
     """listing all authors in the repo"""
 
-    def __call__(self, extractor: Extractor) -> List[Author]:
-        return extractor.list_authors(extractor.issue_lifespan_safe())
+    def __call__(self, extractor: Extractor) -> str:
+        authors: List[Author] = extractor.list_authors(extractor.issue_lifespan_safe())
+        return shape(
+            authors,
+            "authors",
+            narrow="look authors up with CommitsOfParticipants or CommitsOfAuthor",
+        )
 
 
 class CommitsOfAuthor(BaseModel):
     """listing all commits of an author in the repo.
-    Returns a paginated list of commits as well as the total number of commits
+    Returns a paginated list of commits
     """
 
     query_type: AuthorQueryType = Field(
         ..., description="weather search by name or email"
     )
-    query: str = Field(..., description="author's name or email")
+    query: str = Field(
+        ...,
+        description="author's name or email, matched case-insensitively or partially if no author matches exactly",
+    )
     pagination: Pagination = Field(
         ..., description="pagination from offset to atleast offset + limit"
     )
 
-    def __call__(self, extractor: Extractor) -> Tuple[int, List[CommitMeta]]:
+    def __call__(self, extractor: Extractor) -> str:
         if self.query_type == AuthorQueryType.NAME:
             query = AuthorQuery.Name(self.query)
         else:
             query = AuthorQuery.Email(self.query)
 
-        return extractor.commits_of(
-            query,
-            extractor.issue_lifespan_safe(),
-            self.pagination.to_wrapper_pagination(),
+        return self.pagination.shape_page(
+            extractor.commits_of(
+                query,
+                extractor.issue_lifespan_safe(),
+                self.pagination.to_wrapper_pagination(),
+            )
         )
 
 
+class CommitsOfParticipants(BaseModel):
+    """listing the commits of the issue participants (issue author, assignees and commenters)
+    within the issue lifespan. Participants are matched to git authors by their name,
+    the local part of the email and the other names of the matched emails, or else
+    to the authors committing around the times they were active on the issue,
+    so there is no need to guess authors with ListAuthors and CommitsOfAuthor.
+    Returns for each participant the matched git authors with the confidence of
+    the match (0 when no author matched) and their newest commits
+    """
+
+    limit: int = Field(
+        ..., description="maximum number of commits listed per participant"
+    )
+
+    def __call__(self, extractor: Extractor) -> str:
+        index = extractor.identity_index()
+        interval = extractor.issue_lifespan_safe()
+        activity = extractor.participant_activity()
+        # commits mentioning the issue are the ones most likely made around the
+        # activity of its participants
+        lifespan = extractor.commits_between(*interval, wrapperPagination.all())
+        key = extractor.issue_key_pattern()
+        mentioning = [c for c in lifespan if key.search(c.message)]
+        results = []
+        for participant in sorted(extractor.issue_participants()):
+            score, authors = index.matched(
+                participant, activity.get(participant), mentioning or lifespan
+            )
+            commits = {}
+            for author in authors:
+                try:
+                    found = extractor.commits_of(
+                        AuthorQuery.Email(author.email),
+                        interval,
+                        wrapperPagination.all(),
+                    )
+                except ValueError:
+                    # no commits of this identity within the issue lifespan
+                    continue
+                commits.update((c.hash, c) for c in found)
+            newest = sorted(
+                commits.values(), key=lambda c: date_parse(c.date), reverse=True
+            )
+            identity = index.identity(participant, score, authors)
+            results.append((identity, newest[: self.limit]))
+        return shape(results, "participants", narrow="lower the limit")
+
+
 class CommitsOnFile(BaseModel):
     """listing all commits on a file path.
-    Returns a paginated list of commits as well as the total number of commits
+    Returns a paginated list of commits
     """
 
     file_path: str = Field(..., description="file path")
@@ -85,17 +174,25 @@ class CommitsOnFile(BaseModel):
         ..., description="pagination from offset to atleast offset + limit"
     )
 
-    def __call__(self, extractor: Extractor) -> Tuple[int, List[CommitMeta]]:
-        return extractor.commits_on_file(
-            self.file_path,
-            extractor.issue_lifespan_safe(),
-            self.pagination.to_wrapper_pagination(),
+    def __call__(self, extractor: Extractor) -> str:
+        result = self.pagination.shape_page(
+            extractor.commits_on_file(
+                self.file_path,
+                extractor.issue_lifespan_safe(),
+                self.pagination.to_wrapper_pagination(),
+            )
         )
+        if not extractor.follows_renames():
+            result += (
+                "\n[renames are not followed, the history stops at the last rename"
+                " of the file: look older commits up under its previous path]"
+            )
+        return result
 
 
 class CommitsBetween(BaseModel):
     """listing all commits between two timestamps.
-    Returns a paginated list of commits as well as the total number of commits
+    Returns a paginated list of commits
     """
 
     start_date: str = Field(..., description="start date in 'Y-m-d H:M:S z' format")
@@ -104,12 +201,80 @@ class CommitsBetween(BaseModel):
         ..., description="pagination from offset to atleast offset + limit"
     )
 
-    def __call__(self, extractor: Extractor) -> Tuple[int, List[CommitMeta]]:
+    def __call__(self, extractor: Extractor) -> str:
         start = date_parse(self.start_date).strftime("%Y-%m-%d %H:%M:%S %z")
         end = date_parse(self.end_date).strftime("%Y-%m-%d %H:%M:%S %z")
-        return extractor.commits_between(
-            start, end, self.pagination.to_wrapper_pagination()
+        return self.pagination.shape_page(
+            extractor.commits_between(
+                start, end, self.pagination.to_wrapper_pagination()
+            )
+        )
+
+
+class SearchCommitMessages(BaseModel):
+    """searching the messages of the commits within the issue lifespan.
+    Returns a paginated list of the matching commits, best matches first, as well as
+    the total number of matching commits
+    """
+
+    query_type: MessageQueryType = Field(
+        ...,
+        description="keywords: messages containing any of the words, the ones with more and rarer words first. "
+        "phrase: messages containing the words in this order. "
+        "regex: messages matching a regular expression, case-insensitively",
+    )
+    query: str = Field(
+        ...,
+        description="words, phrase or regular expression, e.g. an error message, an identifier or the issue key",
+    )
+    pagination: Pagination = Field(
+        ..., description="pagination from offset to atleast offset + limit"
+    )
+
+    def __call__(self, extractor: Extractor) -> str:
+        if self.query_type == MessageQueryType.KEYWORDS:
+            query = MessageQuery.Keywords(self.query)
+        elif self.query_type == MessageQueryType.PHRASE:
+            query = MessageQuery.Phrase(self.query)
+        else:
+            query = MessageQuery.Regex(self.query)
+
+        total, commits = extractor.search_messages(
+            query,
+            extractor.issue_lifespan_safe(),
+            self.pagination.to_wrapper_pagination(),
         )
+        return self.pagination.shape_page(commits, total)
+
+
+class SearchDiffs(BaseModel):
+    """searching the changes of the commits within the issue lifespan for a text,
+    e.g. an error message, a config key or an identifier named in the issue.
+    Returns a paginated list of the commits whose diffs add or remove the text, newest first,
+    as well as the total number of matching commits
+    """
+
+    text: str = Field(
+        ...,
+        description="a single word is matched case-insensitively as a word of the changed lines, "
+        "a longer text is matched exactly as a part of a changed line",
+    )
+    change: ChangeType = Field(
+        ..., description="whether the text is added, removed or either of them"
+    )
+    pagination: Pagination = Field(
+        ..., description="pagination from offset to atleast offset + limit"
+    )
+
+    def __call__(self, extractor: Extractor) -> str:
+        total, commits = extractor.search_diffs(
+            self.text,
+            extractor.issue_lifespan_safe(),
+            self.pagination.to_wrapper_pagination(),
+            added=self.change != ChangeType.REMOVED,
+            removed=self.change != ChangeType.ADDED,
+        )
+        return self.pagination.shape_page(commits, total)
 
 
 class CommitDiff(BaseModel):
@@ -118,7 +283,11 @@ class CommitDiff(BaseModel):
     commit_hash: str = Field(..., description="commit hash. could be short or long")
 
     def __call__(self, extractor: Extractor) -> str:
-        return extractor.commit_diff(self.commit_hash)
+        return shape_text(
+            extractor.commit_diff(self.commit_hash),
+            narrow="use CommitDigest to see which files and functions it changes "
+            "and FetchLinesOfFile to read them",
+        )
 
 
 class CommitMetadata(BaseModel):
@@ -140,14 +309,25 @@ class ListFiles(BaseModel):
         description="pattern to match the file names. Use '' (empty string) to match all files. Try using the file name WITHOUT the extension. For example, if you want to match all files with the name 'SomeClass.java', use 'SomeClass' as the pattern. Make sure that your pattern is not too generic so that you can minimize the result",
     )
 
-    def __call__(self, extractor: Extractor) -> List[str]:
-        return extractor.list_files(self.pattern, extractor.issue_lifespan_safe())
+    def __call__(self, extractor: Extractor) -> str:
+        files: List[str] = extractor.list_files(
+            self.pattern, extractor.issue_lifespan_safe()
+        )
+        return shape(
+            files,
+            "files",
+            narrow="use a more specific pattern, e.g. with a part of the directory",
+            render=str,
+        )
 
 
 TOOLS = [
     ListAuthors,
     CommitsOfAuthor,
+    CommitsOfParticipants,
     CommitsOnFile,
+    SearchCommitMessages,
+    SearchDiffs,
     CommitDiff,
     CommitMetadata,
     ListFiles,
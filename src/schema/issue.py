@@ -1,8 +1,10 @@
 from datetime import datetime
+import sys
 from typing import List
 from pydantic import BaseModel, Field
 from src.anchor.extractor import Extractor
 from src.issue_wrapper.wrapper import Pagination, CommentMeta
+from src.schema.shaping import shape, shape_text
 
 
 class IssueTitle(BaseModel):
@@ -16,7 +18,7 @@ class IssueDescription(BaseModel):
     """Retrieving the issue description"""
 
     def __call__(self, extractor: Extractor) -> str:
-        return extractor.issue_description()
+        return shape_text(extractor.issue_description())
 
 
 class IssueAuthor(BaseModel):
@@ -47,8 +49,20 @@ class IssueComments(BaseModel):
         ..., description="pagination from offset to at least offset + limit"
     )
 
-    def __call__(self, extractor: Extractor) -> List[CommentMeta]:
-        return extractor.issue_comments(self.pagination)
+    def __call__(self, extractor: Extractor) -> str:
+        # the comments are loaded at once, the whole thread gives the total
+        comments: List[CommentMeta] = extractor.issue_comments(
+            Pagination(offset=0, limit=sys.maxsize)
+        )
+        offset, limit = self.pagination.offset, self.pagination.limit
+        return shape(
+            comments[offset : offset + limit],
+            "comments",
+            len(comments),
+            offset,
+            continuation=lambda offset: f"pagination offset {offset}",
+            render=str,
+        )
 
 
 class IssueParticipants(BaseModel):
@@ -57,8 +71,8 @@ class IssueParticipants(BaseModel):
     This includes the issue creator and all comment authors.
     """
 
-    def __call__(self, extractor: Extractor) -> List[str]:
-        return extractor.issue_participants()
+    def __call__(self, extractor: Extractor) -> str:
+        return shape(extractor.issue_participants(), "participants", render=str)
 
 
 TOOLS = [
@@ -0,0 +1,78 @@
+from typing import Any, Callable, Sequence
+
+from src.anchor.tokens import estimate_tokens, truncate_tokens
+
+# tokens a tool result may add to the conversation, every later request
+# carries it until it is compacted
+RESULT_TOKEN_BUDGET = 8000
+
+
+def shape(
+    items: Sequence[Any],
+    noun: str,
+    total: int | None = None,
+    offset: int = 0,
+    continuation: Callable[[int], str] | None = None,
+    narrow: str = "",
+    render: Callable[[Any], str] = repr,
+    counted: str = "in total",
+    budget: int = RESULT_TOKEN_BUDGET,
+) -> str:
+    """
+    Render the page of `items` starting at `offset` of `total` items, one item per
+    line, keeping the items that fit in `budget` tokens.
+    Args:
+        noun (str): what the items are, e.g. "commits".
+        total (int | None): number of items of all pages, `len(items)` if not given.
+        continuation (Callable[[int], str] | None): how to get the items from an
+        offset on, e.g. the pagination to call the tool again with.
+        narrow (str): how to narrow the query down, for results that can not be continued.
+        render (Callable[[Any], str]): text of an item.
+        counted (str): what the count of the header counts, e.g. "on this page" for
+        pages whose total is unknown.
+    """
+    total = len(items) if total is None else total
+    lines = [f"{total} {noun} {counted}"]
+    used = estimate_tokens(lines[0])
+    shown = 0
+    for item in items:
+        line = render(item)
+        tokens = estimate_tokens(line)
+        if used + tokens > budget:
+            # cut the first item that does not fit rather than returning nothing,
+            # it counts as shown so that continuing moves past it
+            if shown == 0:
+                lines.append(truncate_tokens(line, max(0, budget - used)) + " [cut]")
+                shown = 1
+            break
+        lines.append(line)
+        used += tokens
+        shown += 1
+
+    if shown < len(items):
+        end = offset + shown
+        note = f"[{len(items) - shown} more {noun} left out over {budget} tokens"
+        if continuation is not None:
+            note += f", continue with {continuation(end)}"
+        elif narrow:
+            note += f", {narrow}"
+        lines.append(note + "]")
+    if shown > 0:
+        lines[0] += f", showing {offset} to {offset + shown - 1}:"
+    return "\n".join(lines)
+
+
+def shape_text(text: str, narrow: str = "", budget: int = RESULT_TOKEN_BUDGET) -> str:
+    """
+    `text` cut to `budget` tokens, with a note on how to narrow the query down
+    if it is cut.
+    """
+    # a token is at least a character long
+    if len(text) <= budget:
+        return text
+    tokens = estimate_tokens(text)
+    if tokens <= budget:
+        return text
+    note = f"[cut at {budget} of {tokens} tokens"
+    note += f", {narrow}]" if narrow else "]"
+    return truncate_tokens(text, budget) + "\n" + note
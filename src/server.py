@@ -0,0 +1,385 @@
+# long running link server keeping the repositories it serves warm
+#
+#   POST /link   {"issue": <issue url>, "repo": <repository url>}
+#   POST /repos  {"repo": <repository url>}  clone a repository upfront
+#   GET  /repos  warm repositories
+#   GET  /health
+
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from src.anchor.agent import DEFAULT_MODEL
+from src.anchor.anchor import GitAnchor
+from src.anchor.extractor import Extractor, GitSourceType, Serialized
+from src.anchor import replay
+from src.anchor.cascade import Cascade
+from src.schema.git import TOOLS as GIT_TOOLS
+from src.schema.code import TOOLS as CODE_TOOLS
+from src.schema.issue import TOOLS as ISSUE_TOOLS
+from src.schema.control import TOOLS as CONTROL_TOOLS
+from src import prompt
+
+logger = logging.getLogger(__name__)
+
+TOOLS = GIT_TOOLS + CODE_TOOLS + ISSUE_TOOLS + CONTROL_TOOLS
+
+DEFAULT_REFRESH_INTERVAL = 300
+DEFAULT_WORKERS = 8
+
+
+class RWLock:
+    """
+    Lock shared by readers and held exclusively by a writer.
+    A waiting writer blocks new readers so it is not starved.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self.condition:
+            while self.writer or self.waiting_writers:
+                self.condition.wait()
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.readers -= 1
+                self.condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self.condition:
+            self.waiting_writers += 1
+            while self.writer or self.readers:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writer = True
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.writer = False
+                self.condition.notify_all()
+
+
+class ReadLocked:
+    """
+    Proxy holding a lock for reading during each call of a wrapper, so swapping
+    in refreshed commits only waits for the calls in flight, not for the sessions.
+    """
+
+    def __init__(self, wrapper: Any, lock: RWLock):
+        self.wrapper = wrapper
+        self.lock = lock
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.wrapper, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self.lock.read():
+                return attr(*args, **kwargs)
+
+        return call
+
+
+class Repository:
+    """
+    Warm extractor of a repository. Calls of link sessions to its git wrapper
+    hold it for reading, swapping in refreshed commits holds it exclusively.
+    """
+
+    def __init__(self, url: str, clone_filter: str | None):
+        self.url = url
+        self.lock = RWLock()
+        self.extractor = Extractor.new_for_repo(
+            url, GitSourceType.REMOTE, clone_filter=clone_filter
+        )
+        self.git_wrapper = self.extractor.git_wrapper
+        self.extractor.git_wrapper = ReadLocked(self.git_wrapper, self.lock)
+        self.extractor.code_wrapper = Serialized(self.extractor.code_wrapper)
+        self.extractor.identity_index()
+        self.refreshed_at = time.time()
+
+    def refresh(self) -> int:
+        # sessions keep running on the previous commits while the new ones are
+        # fetched and indexed, only the swap waits for their calls in flight
+        added = self.extractor.fetch()
+        with self.lock.write():
+            self.git_wrapper.refresh()
+        self.extractor.identities = None
+        self.extractor.identity_index()
+        self.refreshed_at = time.time()
+        logger.info(f"refreshed {self.url}: {added} new commits")
+        return added
+
+    def issue(self, issue_url: str) -> Extractor:
+        """extractor of an issue, it sees the commits swapped in by later refreshes"""
+        return self.extractor.with_issue(issue_url)
+
+    def status(self) -> Dict[str, Any]:
+        return {"repo": self.url, "refreshed_at": self.refreshed_at}
+
+
+class LinkServer:
+    """
+    Links issues to commits of the repositories it keeps warm.
+
+    Args:
+        clone_filter (str | None): object filter of the clones, full clones if not given.
+        refresh_interval (float): seconds between two fetches of the repositories, never if 0.
+        workers (int): maximum number of concurrent link sessions.
+        model (str): name of the OpenAI model used by the agents.
+        batch_size (int): number of commits shown to the agents in each batch.
+        cascade (Cascade | None): models tried from cheapest to strongest, overrides `model`.
+    """
+
+    def __init__(
+        self,
+        clone_filter: str | None = "blob:none",
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+        workers: int = DEFAULT_WORKERS,
+        model: str = DEFAULT_MODEL,
+        batch_size: int = prompt.COMMIT_BATCH_SIZE,
+        cascade: Cascade | None = None,
+    ):
+        self.clone_filter = clone_filter
+        self.refresh_interval = refresh_interval
+        self.model = model
+        self.batch_size = batch_size
+        self.cascade = cascade
+        # one client, and its connection pool, for all sessions
+        self.client = replay.openai_client()
+        self.sessions = threading.BoundedSemaphore(max(1, workers))
+
+        self.repositories: Dict[str, Repository] = {}
+        self.loading: Dict[str, threading.Lock] = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def repository(self, url: str) -> Repository:
+        """the warm repository at `url`, cloned on first use"""
+        with self.lock:
+            if url in self.repositories:
+                return self.repositories[url]
+            loading = self.loading.setdefault(url, threading.Lock())
+
+        # clone outside of the server lock so other repositories stay available
+        with loading:
+            if url not in self.repositories:
+                logger.info(f"warming up {url}")
+                repository = Repository(url, self.clone_filter)
+                with self.lock:
+                    self.repositories[url] = repository
+        return self.repositories[url]
+
+    def link(self, issue_url: str, repo_url: str) -> Dict[str, Any]:
+        repository = self.repository(repo_url)
+        with self.sessions:
+            start = time.perf_counter()
+            ga = GitAnchor(
+                repository.issue(issue_url),
+                model=self.model,
+                batch_size=self.batch_size,
+                client=self.client,
+                cascade=self.cascade,
+            )
+            ga.register_tools(TOOLS)
+            commit, tokens = ga.find_link()
+        return {
+            "issue": issue_url,
+            "repo": repo_url,
+            "commit": commit,
+            "tokens": tokens,
+            "seconds": time.perf_counter() - start,
+            "tiers": [usage.model_dump() for usage in ga.agent.usage],
+        }
+
+    def status(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            repositories = list(self.repositories.values())
+        return [repository.status() for repository in repositories]
+
+    def refresh_forever(self):
+        """fetch new commits of all warm repositories every `refresh_interval` seconds"""
+        while not self.stopped.wait(self.refresh_interval):
+            with self.lock:
+                repositories = list(self.repositories.values())
+            for repository in repositories:
+                try:
+                    repository.refresh()
+                except Exception as e:
+                    logger.error(f"failed to refresh {repository.url}: {e}")
+
+    def start_refreshing(self) -> threading.Thread | None:
+        if self.refresh_interval <= 0:
+            return None
+        thread = threading.Thread(
+            target=self.refresh_forever, name="refresh", daemon=True
+        )
+        thread.start()
+        return thread
+
+
+class LinkHandler(BaseHTTPRequestHandler):
+    server_state: LinkServer
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path == "/health":
+            return self.respond(200, {"status": "ok"})
+        if path == "/repos":
+            return self.respond(200, self.server_state.status())
+        self.respond(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        # required fields and handler of each route
+        routes: Dict[str, Tuple[List[str], Callable[[Dict[str, str]], Any]]] = {
+            "/link": (
+                ["issue", "repo"],
+                lambda body: self.server_state.link(body["issue"], body["repo"]),
+            ),
+            "/repos": (
+                ["repo"],
+                lambda body: self.server_state.repository(body["repo"]).status(),
+            ),
+        }
+        route = routes.get(self.path.rstrip("/"))
+        if route is None:
+            return self.respond(404, {"error": f"unknown path {self.path}"})
+        fields, handle = route
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as e:
+            return self.respond(400, {"error": f"malformed request: {e}"})
+        if not isinstance(body, dict):
+            return self.respond(400, {"error": "request body must be an object"})
+        missing = [f for f in fields if not isinstance(body.get(f), str)]
+        if missing:
+            return self.respond(400, {"error": f"missing fields: {missing}"})
+
+        try:
+            result = handle(body)
+        except Exception as e:
+            logger.error(f"failed to handle {self.path}: {e}")
+            return self.respond(500, {"error": str(e)})
+        self.respond(200, result)
+
+    def respond(self, status: int, body: Any):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class ThreadingUnixHTTPServer(
+    socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    daemon_threads = True
+
+
+def serve(
+    state: LinkServer,
+    host: str = "127.0.0.1",
+    port: int = 8643,
+    socket_path: str | None = None,
+) -> socketserver.BaseServer:
+    """
+    Create an HTTP server for `state`, listening on a Unix socket if `socket_path` is given.
+    """
+    handler = type("Handler", (LinkHandler,), {"server_state": state})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Git Anchor - link server")
+    parser.add_argument(
+        "--repo",
+        action="append",
+        default=[],
+        help="repository to clone at startup, can be repeated. others are cloned on first use",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8643)
+    parser.add_argument("--socket", help="listen on this Unix socket instead of TCP")
+    parser.add_argument(
+        "--refresh-interval",
+        type=float,
+        default=DEFAULT_REFRESH_INTERVAL,
+        help="seconds between fetches of new commits, 0 disables them",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="maximum number of concurrent link sessions",
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--batch-size", type=int, default=prompt.COMMIT_BATCH_SIZE)
+    parser.add_argument(
+        "--cascade",
+        type=Cascade.parse,
+        help="models tried from the cheapest to the strongest, see src.main --cascade",
+    )
+    parser.add_argument(
+        "--full-clone",
+        action="store_true",
+        help="clone all blobs upfront instead of fetching them on demand",
+    )
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.debug else logging.WARNING,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    state = LinkServer(
+        clone_filter=None if args.full_clone else "blob:none",
+        refresh_interval=args.refresh_interval,
+        workers=args.workers,
+        model=args.model,
+        batch_size=args.batch_size,
+        cascade=args.cascade,
+    )
+    for url in args.repo:
+        state.repository(url)
+    state.start_refreshing()
+
+    server = serve(state, args.host, args.port, args.socket)
+    address = args.socket or f"http://{args.host}:{args.port}"
+    print(f"serving link requests on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        state.stopped.set()
+        server.server_close()
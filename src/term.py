@@ -6,6 +6,8 @@ import threading
 import time
 import sys
 
+from src import trace
+
 
 class Color(enum.Enum):
     RED = "\033[91m"
@@ -35,6 +37,11 @@ def wait():
     if "GIT_ANCHOR_INTERACTIVE" not in os.environ:
         return
 
+    with trace.span("term.wait", "interactive"):
+        wait_for_input()
+
+
+def wait_for_input():
     q = []
     t = threading.Thread(target=lambda: q.append(input()), daemon=True)
     t.start()
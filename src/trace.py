@@ -0,0 +1,110 @@
+# span based tracing of sessions, exported in the Chrome trace event format
+# (open the trace file in chrome://tracing or https://ui.perfetto.dev)
+
+from contextlib import contextmanager, nullcontext
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List
+
+# when set, spans are recorded and written to this path on exit
+TRACE_ENV = "GIT_ANCHOR_TRACE"
+
+
+class Tracer:
+    def __init__(self, path: str):
+        self.path = path
+        self.events: List[Dict[str, Any]] = []
+        self.threads: set[int] = set()
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def now(self) -> float:
+        """current time in microseconds"""
+        return time.perf_counter_ns() / 1000
+
+    def add(self, name: str, cat: str, start: float, end: float, args: Dict[str, Any]):
+        tid = threading.get_ident()
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": start,
+            "dur": end - start,
+            "pid": self.pid,
+            "tid": tid,
+            "args": args,
+        }
+        with self.lock:
+            if tid not in self.threads:
+                self.threads.add(tid)
+                self.events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": self.pid,
+                        "tid": tid,
+                        "args": {"name": threading.current_thread().name},
+                    }
+                )
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, name: str, cat: str, args: Dict[str, Any]):
+        start = self.now()
+        try:
+            yield args
+        finally:
+            self.add(name, cat, start, self.now(), args)
+
+    def save(self):
+        with self.lock:
+            events = list(self.events)
+        with open(self.path, "w") as f:
+            json.dump(
+                {"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str
+            )
+
+
+tracer: Tracer | None = None
+
+
+def enable(path: str):
+    """
+    Start recording spans, they are written to `path` when the process exits.
+    """
+    global tracer
+    if tracer is not None:
+        tracer.path = path
+        return
+    tracer = Tracer(path)
+    atexit.register(tracer.save)
+
+
+def enabled() -> bool:
+    return tracer is not None
+
+
+def span(name: str, cat: str = "", **args: Any):
+    """
+    Record the enclosed block as a span. The yielded dict holds the arguments
+    of the span and can be extended within the block.
+    Does nothing unless tracing is enabled.
+    """
+    if tracer is None:
+        return nullcontext(args)
+    return tracer.span(name, cat, args)
+
+
+def save():
+    """
+    Write the spans recorded so far.
+    """
+    if tracer is not None:
+        tracer.save()
+
+
+if TRACE_ENV in os.environ:
+    enable(os.environ[TRACE_ENV])
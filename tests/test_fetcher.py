@@ -0,0 +1,161 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from src.issue_wrapper.fetcher import IssueFetcher
+
+JIRA_KEYS = ["A-1", "A-2", "A-3"]
+# moved to another project, the search does not return it under its old key
+MOVED_KEY = "A-3"
+# issue numbers the GraphQL API does not return, the REST API serves the first
+PULL_REQUEST = 3
+MISSING = 4
+
+ALIAS = re.compile(
+    r'(i\d+): repository\(owner: "[^"]+", name: "[^"]+"\) \{\s*issue\(number: (\d+)\)'
+)
+
+
+def github_issue(number: int) -> dict:
+    return {
+        "number": number,
+        "title": f"issue {number}",
+        "body": "",
+        "createdAt": "2024-01-01T00:00:00Z",
+        "closedAt": None,
+        "author": {"login": "user1"},
+        "assignees": {"nodes": []},
+        "comments": {"pageInfo": {"hasNextPage": False}, "nodes": []},
+    }
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Jira and GitHub APIs serving made up issues, recording the requests"""
+
+    requests: list = []
+
+    def reply(self, status: int, body: object):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.requests.append(("GET", url.path))
+        if url.path == "/jira/rest/api/2/search":
+            jql = parse_qs(url.query)["jql"][0]
+            keys = re.search(r"key in \((.*)\)", jql).group(1).split(",")
+            issues = [{"key": key} for key in keys if key != MOVED_KEY]
+            return self.reply(200, {"issues": issues})
+        if url.path.startswith("/jira/rest/api/2/issue/"):
+            return self.reply(200, {"key": url.path.rsplit("/", 1)[1]})
+        match = re.fullmatch(r"/repos/o/r/issues/(\d+)", url.path)
+        if match and int(match.group(1)) != MISSING:
+            issue = {"number": int(match.group(1)), "comments": 0}
+            return self.reply(200, issue)
+        self.reply(404, {"message": "Not Found"})
+
+    def do_POST(self):
+        self.requests.append(("POST", self.path))
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        data = {}
+        for alias, number in ALIAS.findall(body["query"]):
+            found = int(number) not in (PULL_REQUEST, MISSING)
+            data[alias] = {"issue": github_issue(int(number)) if found else None}
+        self.reply(200, {"data": data})
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in():
+    StandIn.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def github(number: int) -> str:
+    return f"https://github.com/o/r/issues/{number}"
+
+
+def test_jira_search_batches(stand_in):
+    fetcher = IssueFetcher(batch_size=2)
+    urls = [f"{stand_in}/jira/rest/api/2/issue/{key}" for key in JIRA_KEYS]
+
+    issues = fetcher.fetch_many(urls)
+
+    assert [issues[url]["key"] for url in urls] == JIRA_KEYS
+    # two searches of at most 2 keys, and the moved issue on its own
+    assert StandIn.requests == [
+        ("GET", "/jira/rest/api/2/search"),
+        ("GET", "/jira/rest/api/2/search"),
+        ("GET", f"/jira/rest/api/2/issue/{MOVED_KEY}"),
+    ]
+
+
+def test_github_graphql_batches(stand_in):
+    fetcher = IssueFetcher(github_token="token", github_api_url=stand_in, batch_size=2)
+    urls = [github(number) for number in (1, 2, 5)]
+
+    issues = fetcher.fetch_many(urls)
+
+    assert [issues[url]["number"] for url in urls] == [1, 2, 5]
+    assert StandIn.requests == [("POST", "/graphql")] * 2
+    # short threads come with the issues
+    assert fetcher.github_comments(urls[0]) == []
+    assert len(StandIn.requests) == 2
+
+
+def test_github_rest_without_token(stand_in):
+    fetcher = IssueFetcher(github_token="", github_api_url=stand_in)
+
+    issues = fetcher.fetch_many([github(1), github(2)])
+
+    assert issues[github(2)]["number"] == 2
+    assert StandIn.requests == [
+        ("GET", "/repos/o/r/issues/1"),
+        ("GET", "/repos/o/r/issues/2"),
+    ]
+    # the issues have no comments
+    assert fetcher.github_comments(github(1)) == []
+    assert len(StandIn.requests) == 2
+
+
+def test_prefetch(stand_in):
+    fetcher = IssueFetcher(github_token="token", github_api_url=stand_in)
+
+    fetcher.prefetch([github(1), github(2)]).result()
+
+    assert fetcher.fetch(github(2))["number"] == 2
+    assert StandIn.requests == [("POST", "/graphql")]
+
+
+def test_missing_issue_in_batch(stand_in):
+    fetcher = IssueFetcher(github_token="token", github_api_url=stand_in)
+    urls = [github(number) for number in (1, PULL_REQUEST, 2)]
+
+    # issues left out by GraphQL are fetched one by one
+    issues = fetcher.fetch_many(urls)
+    assert [issues[url]["number"] for url in urls] == [1, PULL_REQUEST, 2]
+    assert StandIn.requests == [
+        ("POST", "/graphql"),
+        ("GET", f"/repos/o/r/issues/{PULL_REQUEST}"),
+    ]
+
+    # an issue that does not exist only fails on its own
+    with pytest.raises(requests.HTTPError):
+        fetcher.fetch_many([github(5), github(MISSING)])
+    assert fetcher.fetch(github(5))["number"] == 5
+    assert len(StandIn.requests) == 4
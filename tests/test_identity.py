@@ -0,0 +1,64 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+# the index takes the authors of the native git wrapper, built with maturin
+pytest.importorskip("git_wrapper")
+
+from src.anchor import identity  # noqa: E402
+from src.anchor.identity import IdentityIndex  # noqa: E402
+
+
+def author(name: str, email: str) -> SimpleNamespace:
+    return SimpleNamespace(name=name, email=email)
+
+
+def commit(day: int, author: SimpleNamespace) -> SimpleNamespace:
+    return SimpleNamespace(date=f"2024-01-{day:02} 12:00:00 +0000", author=author)
+
+
+def names(authors) -> list:
+    return sorted(f"{a.name} <{a.email}>" for a in authors)
+
+
+def test_clusters_by_email_only():
+    index = IdentityIndex(
+        [
+            author("root", "alice@a.com"),
+            author("root", "bob@b.com"),
+            author("Alice Doe", "alice@a.com"),
+        ]
+    )
+
+    score, authors = index.matched("Alice Doe")
+
+    assert score == identity.EXACT_NAME
+    assert names(authors) == ["Alice Doe <alice@a.com>", "root <alice@a.com>"]
+
+
+def test_ambiguous_partial_match():
+    johns = [author(f"John {i}", f"j{i}@test.com") for i in range(5)]
+    index = IdentityIndex(johns + [author("Mary Major", "mary@test.com")])
+
+    assert index.matched("john") == (0.0, [])
+    assert index.matched("major")[0] == identity.PARTIAL
+
+
+def test_co_occurrence():
+    alice, bob = author("A. L.", "al@a.com"), author("B. O.", "bo@b.com")
+    index = IdentityIndex([alice, bob])
+    commits = [commit(2, alice), commit(2, bob), commit(9, bob)]
+    activity = [
+        datetime(2024, 1, 2, 15, tzinfo=timezone.utc),
+        datetime(2024, 1, 9, 10, tzinfo=timezone.utc),
+    ]
+
+    # bob committed around both comments of the participant
+    score, authors = index.matched("qwerty", activity, commits)
+    assert score == identity.CO_OCCURRENCE
+    assert names(authors) == ["B. O. <bo@b.com>"]
+    # a name that matches wins over co-occurrence
+    assert names(index.matched("al", activity, commits)[1]) == ["A. L. <al@a.com>"]
+    # nobody committed around
+    assert index.matched("qwerty", activity[:1], commits[2:]) == (0.0, [])
@@ -0,0 +1,46 @@
+import threading
+import time
+
+from src.anchor.metrics import Metrics
+
+
+def test_rust_time_of_other_threads_is_not_credited():
+    metrics = Metrics()
+    with metrics.tool("ListCommits"):
+        metrics.rust_call(0.5)
+        # e.g. digests computed in the background meanwhile
+        background = threading.Thread(target=metrics.rust_call, args=(10.0,))
+        background.start()
+        background.join()
+
+    assert [e.rust_s for e in metrics.current_executions] == [0.5]
+
+
+def test_concurrent_sessions():
+    metrics = Metrics()
+    sessions = [metrics.concurrent() for _ in range(2)]
+
+    def run(session: Metrics, tool: str):
+        with session.tool(tool):
+            session.rust_call(1.0)
+            time.sleep(0.05)
+        session.api_call("github.graphql")
+
+    threads = [
+        threading.Thread(target=run, args=(session, tool))
+        for session, tool in zip(sessions, ["ListCommits", "CommitDiff"])
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [e.tool for e in sessions[1].current_executions] == ["CommitDiff"]
+    assert metrics.current_executions == []
+    assert metrics.api_calls == {"github.graphql": 2}
+
+    for session in sessions:
+        metrics.merge(session)
+    metrics.flush()
+    assert metrics.report_executions()["CommitDiff"]["rust_s"] == 1.0
+    assert metrics.report_sessions()[0]["executions"] == 2
@@ -0,0 +1,66 @@
+import os
+import subprocess
+
+import pytest
+
+from bench import repos
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://github.com/apache/Kafka.git",
+        "http://github.com/apache/kafka/",
+        "https://user@github.com/apache/kafka",
+        "git@github.com:apache/kafka.git",
+        "ssh://git@github.com/apache/kafka",
+    ],
+)
+def test_normalize_url(url):
+    assert repos.normalize_url(url) == "github.com/apache/kafka"
+
+
+def test_normalize_url_keeps_ports():
+    assert repos.normalize_url("https://host:8443/a/b") == "host:8443/a/b"
+
+
+@pytest.fixture
+def origin(tmp_path):
+    """a repository with one commit to clone from"""
+    path = tmp_path / "origins" / "project"
+    path.mkdir(parents=True)
+    for args in (
+        ["init", "-q"],
+        ["-c", "user.name=u", "-c", "user.email=u@test.com"]
+        + ["commit", "-q", "--allow-empty", "-m", "first"],
+    ):
+        subprocess.run(["git", *args], cwd=path, check=True)
+    return str(path)
+
+
+def test_existing_clones_are_kept(tmp_path, origin):
+    repos_dir = str(tmp_path / "repos")
+    path = repos.clone_repository(origin, repos_dir, filter=None)
+    marker = os.path.join(path, "marker")
+    open(marker, "w").close()
+
+    # the same repository written differently
+    assert repos.clone_repository(origin + ".git/", repos_dir, filter=None) == path
+    # another repository with the same name
+    with pytest.raises(RuntimeError, match="is a clone of"):
+        repos.clone_repository(
+            "https://example.com/other/project", repos_dir, filter=None
+        )
+    assert os.path.exists(marker)
+
+
+def test_jobs_by_path(tmp_path, origin):
+    repos_dir = str(tmp_path / "repos")
+    other = "https://example.com/other/project"
+    paths = repos.provision_repositories(
+        [origin, origin + "/", other], repos_dir, filter=None
+    )
+    assert paths == {
+        origin: os.path.join(repos_dir, "project"),
+        origin + "/": os.path.join(repos_dir, "project"),
+    }
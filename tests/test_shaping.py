@@ -0,0 +1,74 @@
+from src.schema.shaping import shape, shape_text
+
+
+def continuation(offset: int) -> str:
+    return f"pagination offset {offset}"
+
+
+def test_everything_fits():
+    assert shape([], "files") == "0 files in total"
+    assert shape(["a", "b"], "files", render=str) == (
+        "2 files in total, showing 0 to 1:\na\nb"
+    )
+
+
+def test_page_of_total():
+    text = shape(["a", "b"], "commits", total=50, offset=10, render=str)
+    assert text.startswith("50 commits in total, showing 10 to 11:")
+
+
+def test_page_without_total():
+    text = shape(["a"], "commits", offset=5, render=str, counted="on this page")
+    assert text.startswith("1 commits on this page, showing 5 to 5:")
+
+
+def test_left_out_items_continue():
+    items = [f"file{i:04}" for i in range(1000)]
+    text = shape(
+        items, "files", offset=20, continuation=continuation, render=str, budget=100
+    )
+    lines = text.split("\n")
+    shown = len(lines) - 2
+    assert 0 < shown < len(items)
+    assert lines[0] == f"1000 files in total, showing 20 to {20 + shown - 1}:"
+    assert lines[-1] == (
+        f"[{len(items) - shown} more files left out over 100 tokens, "
+        f"continue with pagination offset {20 + shown}]"
+    )
+
+
+def test_left_out_items_narrow():
+    items = [f"file{i:04}" for i in range(1000)]
+    text = shape(items, "files", narrow="use a longer pattern", render=str, budget=100)
+    assert text.endswith("files left out over 100 tokens, use a longer pattern]")
+
+
+def test_cut_item_is_continued_past():
+    text = shape(
+        ["x" * 10000, "y"],
+        "lines",
+        offset=3,
+        continuation=lambda start: f"start {start}",
+        render=str,
+        counted="requested",
+        budget=50,
+    )
+    lines = text.split("\n")
+    assert lines[0] == "2 lines requested, showing 3 to 3:"
+    assert lines[1].endswith(" [cut]")
+    assert lines[2] == "[1 more lines left out over 50 tokens, continue with start 4]"
+
+
+def test_cut_only_item():
+    text = shape(["x" * 10000], "definitions", render=str, budget=50)
+    lines = text.split("\n")
+    assert lines[0] == "1 definitions in total, showing 0 to 0:"
+    assert lines[1].endswith(" [cut]")
+    assert len(lines) == 2
+
+
+def test_shape_text():
+    assert shape_text("short") == "short"
+    text = shape_text("word " * 1000, narrow="use CommitDigest", budget=10)
+    assert text.endswith("use CommitDigest]")
+    assert text.split("\n")[-1].startswith("[cut at 10 of ")
@@ -0,0 +1,16 @@
+import os
+
+import pytest
+
+from src.issue_wrapper.snapshot import IssueSnapshot
+
+
+def test_failed_save_keeps_previous(tmp_path):
+    path = str(tmp_path / "issues.snapshot.json.gz")
+    IssueSnapshot({"url": {"key": "A-1"}}).save(path)
+
+    with pytest.raises(TypeError):
+        IssueSnapshot({"url": {"key": object()}}).save(path)
+
+    assert IssueSnapshot.load(path).issues == {"url": {"key": "A-1"}}
+    assert os.listdir(tmp_path) == ["issues.snapshot.json.gz"]
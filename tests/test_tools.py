@@ -0,0 +1,168 @@
+import re
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+# the tools import the native wrappers, built with maturin
+pytest.importorskip("git_wrapper")
+pytest.importorskip("code_wrapper")
+
+from src.anchor.identity import IdentityIndex  # noqa: E402
+from src.issue_wrapper.wrapper import CommentMeta  # noqa: E402
+from src.schema import code, git, issue  # noqa: E402
+
+LIFESPAN = ("2024-01-01 00:00:00 +0000", "2024-02-01 00:00:00 +0000")
+
+
+def commit(i: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        hash=f"{i:040x}",
+        date=f"2024-01-{i % 28 + 1:02} 00:00:00 +0000",
+        author=SimpleNamespace(name=f"user{i % 3}", email=f"user{i % 3}@test.com"),
+        message=f"fix #{i}",
+    )
+
+
+def page(items, pagination):
+    return items[pagination.offset : pagination.offset + pagination.limit]
+
+
+class Extractor:
+    """extractor serving the same made up repository and issue to every tool"""
+
+    commits = [commit(i) for i in range(30)]
+
+    def issue_lifespan_safe(self):
+        return LIFESPAN
+
+    def list_commits(self, pagination):
+        return page(self.commits, pagination)
+
+    def list_authors(self, interval):
+        return [f"user{i} <user{i}@test.com>" for i in range(3)]
+
+    def commits_of(self, query, interval, pagination):
+        return page(self.commits, pagination)
+
+    def commits_on_file(self, file_path, interval, pagination):
+        return page(self.commits, pagination)
+
+    def follows_renames(self):
+        return True
+
+    def commits_between(self, start, end, pagination):
+        return page(self.commits, pagination)
+
+    def search_messages(self, query, interval, pagination):
+        return (len(self.commits), page(self.commits, pagination))
+
+    def search_diffs(self, text, interval, pagination, added, removed):
+        return (len(self.commits), page(self.commits, pagination))
+
+    def commit_diff(self, commit_hash):
+        return "+line\n" * 100000
+
+    def list_files(self, pattern, interval):
+        return [f"src/{pattern}{i}.py" for i in range(5)]
+
+    def identity_index(self):
+        return IdentityIndex([c.author for c in self.commits])
+
+    def issue_participants(self):
+        return ["user1", "dev"]
+
+    def participant_activity(self):
+        return {"dev": [datetime(2024, 1, 3, tzinfo=timezone.utc)]}
+
+    def issue_key_pattern(self):
+        return re.compile(r"#2\b")
+
+    def fetch_definition(self, name, commit, file_path):
+        return [f"def {name}: pass"]
+
+    def fetch_documentation(self, name, commit, file_path):
+        return [f"documentation of {name}"]
+
+    def fetch_lines_of_file(self, commit, file_path, start, end):
+        return [f"line {i}" for i in range(start, end + 1)]
+
+    def issue_description(self):
+        return "description"
+
+    def issue_comments(self, pagination):
+        comments = [
+            CommentMeta(author="user1", body=f"comment {i}", created_at="2024-01-02")
+            for i in range(12)
+        ]
+        return page(comments, pagination)
+
+
+PAGINATION = git.Pagination(offset=2, limit=10)
+DEFINITION = dict(name="f()", commit="c", file_path="f.py")
+# header of a page of commits whose total is unknown
+PAGE = "10 commits on this page, showing 2 to 11:"
+
+
+@pytest.mark.parametrize(
+    "tool, header",
+    [
+        (git.ListCommits(pagination=PAGINATION), PAGE),
+        (
+            git.CommitsOfAuthor(
+                query_type=git.AuthorQueryType.NAME,
+                query="user1",
+                pagination=PAGINATION,
+            ),
+            PAGE,
+        ),
+        (git.CommitsOnFile(file_path="f.py", pagination=PAGINATION), PAGE),
+        (
+            git.CommitsBetween(
+                start_date=LIFESPAN[0], end_date=LIFESPAN[1], pagination=PAGINATION
+            ),
+            PAGE,
+        ),
+        (
+            git.SearchCommitMessages(
+                query_type=git.MessageQueryType.KEYWORDS,
+                query="fix",
+                pagination=PAGINATION,
+            ),
+            "30 commits in total, showing 2 to 11:",
+        ),
+        (
+            git.SearchDiffs(
+                text="fix", change=git.ChangeType.ANY, pagination=PAGINATION
+            ),
+            "30 commits in total, showing 2 to 11:",
+        ),
+        (git.ListAuthors(), "3 authors in total, showing 0 to 2:"),
+        (
+            git.CommitsOfParticipants(limit=5),
+            "2 participants in total, showing 0 to 1:",
+        ),
+        (git.ListFiles(pattern="main"), "5 files in total, showing 0 to 4:"),
+        (code.FetchFunctionDefinition(**DEFINITION), "1 definitions in total"),
+        (code.FetchFunctionDocumentation(**DEFINITION), "1 documentation comments"),
+        (code.FetchClassDefinition(**DEFINITION), "1 definitions in total"),
+        (code.FetchClassDocumentation(**DEFINITION), "1 documentation comments"),
+        (
+            code.FetchLinesOfFile(commit="c", file_path="f.py", start=5, end=9),
+            "5 lines requested, showing 5 to 9:",
+        ),
+        (
+            issue.IssueComments(pagination=issue.Pagination(offset=10, limit=10)),
+            "12 comments in total, showing 10 to 11:",
+        ),
+        (issue.IssueParticipants(), "2 participants in total, showing 0 to 1:"),
+    ],
+)
+def test_shaped(tool, header):
+    assert tool(Extractor()).startswith(header)
+
+
+def test_cut_text():
+    text = git.CommitDiff(commit_hash="c")(Extractor())
+    assert text.split("\n")[-1].startswith("[cut at ")
+    assert issue.IssueDescription()(Extractor()) == "description"